@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+SnipIt - Headless keystroke-replay benchmark
+
+Replays synthetic or recorded keystroke streams through process_key() with
+the keyboard and pyperclip modules replaced by in-process fakes, so it runs
+on a machine without a display or keyboard (e.g. a Linux CI box).
+
+Reports per-key hook latency (p50, p99, max), end-to-end expansion latency
+and expansions per second, plus micro-benchmarks of check_for_snippets(),
+get_replacement() and replace_flags(), sweeping the snippet library size,
+the length of the typed text before each snippet and the replacement size.
+
+    python benchmark.py                      # default sweep
+    python benchmark.py --quick              # small sweep for CI
+    python benchmark.py --sizes 10 100000 --json
+    python benchmark.py --trace typed.txt    # replay a recorded stream
+"""
+
+import argparse
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+import types
+
+
+def install_fakes():
+    """Register in-process fakes for keyboard and pyperclip before snipit is imported"""
+    keyboard = types.ModuleType("keyboard")
+    keyboard.sent = 0
+
+    def press_and_release(keys, *args, **kwargs):
+        keyboard.sent += 1
+
+    def write(text, *args, **kwargs):
+        keyboard.sent += len(text)
+
+    def noop(*args, **kwargs):
+        return None
+
+    keyboard.press_and_release = press_and_release
+    keyboard.send = press_and_release
+    keyboard.write = write
+    keyboard.is_pressed = lambda key: False
+    for name in ("add_hotkey", "on_press", "on_release", "hook", "unhook_all", "wait"):
+        setattr(keyboard, name, noop)
+
+    pyperclip = types.ModuleType("pyperclip")
+    pyperclip.content = ""
+
+    def copy(text):
+        pyperclip.content = text
+
+    pyperclip.copy = copy
+    pyperclip.paste = lambda: pyperclip.content
+
+    sys.modules["keyboard"] = keyboard
+    sys.modules["pyperclip"] = pyperclip
+
+
+install_fakes()
+
+import snipit  # noqa: E402  (must come after the fakes are installed)
+from sub.replace_flags import replace_flags  # noqa: E402
+from sub.snippet_store import SnippetStore  # noqa: E402
+
+FILLER_ALPHABET = string.ascii_lowercase + "      "
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def summarize(samples_ns):
+    values = sorted(samples_ns)
+    return {
+        "count": len(values),
+        "p50_us": percentile(values, 0.50) / 1000.0,
+        "p99_us": percentile(values, 0.99) / 1000.0,
+        "max_us": (values[-1] / 1000.0) if values else 0.0,
+    }
+
+
+def make_keys(count, rng):
+    """Return count unique synthetic snippet keys"""
+    keys = set()
+    while len(keys) < count:
+        length = rng.randint(3, 10)
+        keys.add("".join(rng.choice(string.ascii_lowercase) for _ in range(length)))
+    return sorted(keys)
+
+
+def make_body(size, rng):
+    """Return a replacement body of roughly size characters with a few flags"""
+    flags = "%dd.%MM.%yyyy %HH:%mm "
+    filler = "".join(rng.choice(string.ascii_letters + " ") for _ in range(max(size - len(flags), 0)))
+    return (flags + filler)[:max(size, 1)]
+
+
+def write_library(path, keys, body_size, rng):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write("[Strings]\n")
+        for key in keys:
+            f.write(f"{key}={make_body(body_size, rng)}\n")
+        # The fake target processes input instantly
+        f.write("[Settings]\nSoundSetting=0\nTypeThreshold=16\nClipboardRestoreDelay=0\nPacingProfile=instant\n")
+
+
+def load_library(directory, size, body_size, rng):
+    """Point snipit at a synthetic Input.ini in directory and load it"""
+    input_file = os.path.join(directory, f"Input-{size}-{body_size}.ini")
+    keys = make_keys(size, rng)
+    write_library(input_file, keys, body_size, rng)
+    snipit.input_file = input_file
+    snipit.list_file = os.path.join(directory, "List.txt")
+    snipit.cache_file = os.path.join(directory, f"Input-{size}-{body_size}.cache")
+    snipit.usage_log.path = os.path.join(directory, "Usage.log")
+    snipit.snippet_store = SnippetStore(input_file)
+    snipit.read_ini_file()
+    return keys
+
+
+def synthetic_stream(keys, buffer_length, expansions, rng):
+    """Yield lists of keys: filler text of buffer_length characters, then a snippet"""
+    for _ in range(expansions):
+        filler = [rng.choice(FILLER_ALPHABET) for _ in range(buffer_length)]
+        # A trailing space keeps the filler from running into the snippet
+        yield [("space" if char == " " else char) for char in filler] + ["space"] + list(rng.choice(keys))
+
+
+def trace_stream(path):
+    """Yield the keys of a recorded stream, one line per burst"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if line:
+                yield [("space" if char == " " else "tab" if char == "\t" else char) for char in line]
+
+
+def wait_for_worker(timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while snipit.expansion_worker.busy():
+        if time.perf_counter() > deadline:
+            raise RuntimeError("expansion worker did not finish")
+        time.sleep(0)
+
+
+def replay(bursts):
+    """Feed bursts of keys through process_key() and time every call"""
+    key_samples = []
+    expansion_samples = []
+    expansions = 0
+    expansion_time_ns = 0
+    worker = snipit.expansion_worker
+    worker.start()
+    snipit.usage_log.start()
+    for burst in bursts:
+        # Let the input timeout pass between bursts without sleeping
+        snipit.last_key_time = time.monotonic()
+        for key in burst:
+            start = time.perf_counter_ns()
+            snipit.process_key(key)
+            key_samples.append(time.perf_counter_ns() - start)
+            if worker.pending is not None:
+                # Wait for the injection so the next key is not ignored
+                wait_for_worker()
+                elapsed = time.perf_counter_ns() - start
+                expansion_samples.append(elapsed)
+                expansion_time_ns += elapsed
+                expansions += 1
+    return key_samples, expansion_samples, expansions, expansion_time_ns
+
+
+def time_calls(function, args_list, repeat=1):
+    samples = []
+    for _ in range(repeat):
+        for args in args_list:
+            start = time.perf_counter_ns()
+            function(*args)
+            samples.append(time.perf_counter_ns() - start)
+    return samples
+
+
+def micro_benchmarks(keys, rng, calls=2000):
+    """Time the individual pipeline stages in isolation"""
+    results = {}
+    sample_keys = [rng.choice(keys) for _ in range(calls)]
+
+    def fill_and_check(key):
+        with snipit.log_lock:
+            snipit.log.clear()
+            for char in key:
+                snipit.log.append(char)
+        snipit.check_for_snippets()
+
+    results["check_for_snippets"] = summarize(time_calls(fill_and_check, [(key,) for key in sample_keys]))
+    results["get_replacement"] = summarize(time_calls(snipit.get_replacement, [(key,) for key in sample_keys]))
+    bodies = [snipit.snippet_store.get(key) for key in sample_keys[:200]]
+    results["replace_flags"] = summarize(time_calls(replace_flags, [(body,) for body in bodies]))
+    templates = [snipit.get_template(key) for key in sample_keys[:200]]
+    results["template_expand"] = summarize(time_calls(lambda t: t.expand(), [(t,) for t in templates]))
+    with snipit.log_lock:
+        snipit.log.clear()
+    return results
+
+
+def run_case(directory, size, buffer_length, body_size, expansions, seed, trace=None):
+    rng = random.Random(seed)
+    load_start = time.perf_counter()
+    keys = load_library(directory, size, body_size, rng)
+    load_seconds = time.perf_counter() - load_start
+    bursts = trace_stream(trace) if trace else synthetic_stream(keys, buffer_length, expansions, rng)
+    key_samples, expansion_samples, count, expansion_time_ns = replay(bursts)
+    return {
+        "library_size": size,
+        "buffer_length": buffer_length,
+        "replacement_size": body_size,
+        "load_seconds": load_seconds,
+        "per_key": summarize(key_samples),
+        "per_expansion": summarize(expansion_samples),
+        "expansions": count,
+        "expansions_per_second": (count / (expansion_time_ns / 1e9)) if expansion_time_ns else 0.0,
+        "stages": micro_benchmarks(keys, rng),
+    }
+
+
+def print_table(results):
+    header = f"{'size':>7} {'buf':>5} {'repl':>6} | {'key p50':>8} {'key p99':>8} {'key max':>9} | {'exp p50':>9} {'exp/s':>8} | {'check p50':>9} {'get p50':>8} {'flags p50':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        stages = r["stages"]
+        print(f"{r['library_size']:>7} {r['buffer_length']:>5} {r['replacement_size']:>6} | "
+              f"{r['per_key']['p50_us']:>8.1f} {r['per_key']['p99_us']:>8.1f} {r['per_key']['max_us']:>9.1f} | "
+              f"{r['per_expansion']['p50_us']:>9.1f} {r['expansions_per_second']:>8.0f} | "
+              f"{stages['check_for_snippets']['p50_us']:>9.2f} {stages['get_replacement']['p50_us']:>8.2f} "
+              f"{stages['replace_flags']['p50_us']:>9.2f}")
+    print("(latencies in microseconds)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless keystroke-replay benchmark for SnipIt")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000, 100000],
+                        help="snippet library sizes to sweep")
+    parser.add_argument("--buffer-lengths", type=int, nargs="+", default=[0, 32, 256],
+                        help="characters typed before each snippet")
+    parser.add_argument("--replacement-sizes", type=int, nargs="+", default=[8, 256, 4096],
+                        help="replacement body sizes in characters")
+    parser.add_argument("--expansions", type=int, default=200, help="expansions per case")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--trace", help="replay a recorded stream (one burst per line) instead of synthetic input")
+    parser.add_argument("--quick", action="store_true", help="small sweep suitable for CI")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        args.sizes = [10, 1000, 10000]
+        args.buffer_lengths = [0, 64]
+        args.replacement_sizes = [8, 1024]
+        args.expansions = 50
+
+    # Keep benchmark output clean
+    snipit.debugging = False
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="snipit-bench-") as directory:
+        for size in args.sizes:
+            for body_size in args.replacement_sizes:
+                for buffer_length in args.buffer_lengths:
+                    results.append(run_case(directory, size, buffer_length, body_size,
+                                            args.expansions, args.seed, args.trace))
+                    if not args.json:
+                        print(f"done: size={size} replacement={body_size} buffer={buffer_length}", file=sys.stderr)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+
+if __name__ == "__main__":
+    main()
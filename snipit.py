@@ -6,106 +6,463 @@ SnipIt - Text replacement tool
 import os
 import sys
 import time
-import configparser
-import keyboard
+
+# Created first so the imports below are timed for --profile-startup
+from sub.stats import latency, startup
+
 import datetime
-import re
 import threading
-import json
-import pyperclip
-from pathlib import Path
+import argparse
 import traceback
+startup.mark("import stdlib")
+
+# Expanding documents needs neither the keyboard hook nor the clipboard,
+# so `snipit.py expand` runs before keyboard is imported
+if __name__ == "__main__" and sys.argv[1:2] == ["expand"]:
+    from sub.library import expand_main
+    sys.exit(expand_main(sys.argv[2:], os.path.join(os.path.dirname(os.path.abspath(__file__)), "Input.ini")))
 
-# Import helper modules
+import keyboard
+startup.mark("import keyboard")
+
+# Import helper modules; tkinter (GUI), pyperclip (clipboard), sqlite3
+# (--db), configparser, asyncio and json (control socket) are imported
+# when they are first needed. re is not deferred: argparse, traceback and
+# keyboard have loaded it by now, and [Patterns] are compiled at startup
 from sub.replace_flags import replace_flags
-from sub.gui import setup_gui
+from sub.file_cache import include_cache
+from sub.matcher import SnippetMatcher
+from sub.patterns import PatternMatcher, PatternMatch, PATTERN_WINDOW, scan_patterns, strip_patterns
+from sub.library import find_trigger
+from sub.snippet_store import SnippetStore, LazySnippetStore, file_signature, scan_ini
+from sub.ring_buffer import RingBuffer
+from sub.expansion_worker import ExpansionWorker
+from sub.output_backends import OutputPolicy, TypingBackend, ClipboardBackend
+from sub.clipboard_manager import ClipboardManager
+from sub.ini_watcher import IniWatcher
+from sub.ini_writer import IniTransaction, check_snippet_body, check_snippet_key, normalize_body
+from sub.library_cache import content_hash, load_cache, save_cache
+from sub.modifiers import ModifierState, CTRL
+from sub.pacing import InjectionPacer
+from sub.usage_log import UsageLog, read_usage, format_report
+startup.mark("import snipit modules")
 
 # Initialize variables
 script_dir = os.path.dirname(os.path.abspath(__file__))
 input_file = os.path.join(script_dir, "Input.ini")
 list_file = os.path.join(script_dir, "List.txt")
+usage_file = os.path.join(script_dir, "Usage.log")
+cache_file = os.path.join(script_dir, "Input.cache")
+default_database_file = os.path.join(script_dir, "Input.db")
+database_file = None  # set with --db to keep the snippets in SQLite instead of Input.ini
+socket_path = None  # control socket for snipitctl.py; snipit.sock next to the script by default
 
 # Initialize arrays
 key_array = []
-log = ""
+matcher = SnippetMatcher()
+pattern_matcher = PatternMatcher()
+snippet_store = SnippetStore(input_file)
+log = RingBuffer(16)  # resized from the longest snippet in read_ini_file()
 sound_setting = 0
-last_key_time = time.time()
+type_threshold = 16  # replacements up to this length are typed instead of pasted
+clipboard_restore_delay = 0.5  # seconds after the last paste before the clipboard is restored
+body_cache_kb = 1024  # memory budget for replacement bodies when LazyBodies=1
+include_cache_kb = 8192  # memory budget for files included with {file:...}
+pacing_settings = None  # (PacingProfile, PacingDelayMs, RemoteApps) last applied
+last_key_time = time.monotonic()
 input_timeout = 2.0  # 2 seconds timeout for keyboard input
 debugging = False  # Set to True to enable debug messages
+stats_format = "table"  # how dump_stats() prints latency statistics: "table" or "json"
 version = "v1.0.4" # updated
+min_log_capacity = 16  # smallest keystroke buffer, in characters
 
 # Initialize lock for thread safety
 log_lock = threading.Lock()
+reload_lock = threading.RLock()
 
 def read_ini_file():
     """Read the Input.ini file and load snippets into key_array"""
-    global key_array, sound_setting
+    global key_array, matcher, snippet_store
+    
+    # Serialize with hot reloads from the file watcher
+    with reload_lock:
+        if database_file:
+            read_database()
+            return
+        try:
+            # Check if the file exists
+            if not os.path.exists(input_file):
+                create_default_ini()
+            
+            # Remember the file's mtime and size before reading so a concurrent
+            # edit is picked up by the next staleness check
+            signature = file_signature(input_file)
+            data = read_ini_bytes()
+            digest = content_hash(data)
+            load_patterns(data)
+            
+            # Use the precompiled library if the INI content did not change
+            cached = load_cache(cache_file, digest)
+            if cached is None:
+                # Index the file without decoding the bodies; in lazy mode
+                # only the keys and their byte ranges stay in memory
+                entries, settings = scan_ini(data)
+                lazy = lazy_bodies_enabled(settings)
+            if cached is not None:
+                settings = cached["settings"]
+                snippets = cached["keys"]
+                snippet_store = select_store(False)
+                snippet_store.load_compiled(cached["bodies"], cached["templates"], signature)
+                new_matcher = cached["matcher"]
+                if debugging:
+                    print(f"Loaded {len(snippets)} snippets from {cache_file}")
+            elif lazy:
+                snippets = sorted(entries, key=len, reverse=True)
+                snippet_store = select_store(True)
+                snippet_store.load_index(entries, signature)
+                new_matcher = SnippetMatcher(snippets)
+            else:
+                # Read the file - disable interpolation to handle % characters
+                config = parse_ini_bytes(data)
+                
+                # Check if required sections exist
+                if "Strings" not in config:
+                    config["Strings"] = {}
+                if "Settings" not in config:
+                    config["Settings"] = {"SoundSetting": "0"}
+                    with IniTransaction(input_file) as transaction:
+                        transaction.set_setting("SoundSetting", 0)
+                    signature = file_signature(input_file)
+                    digest = content_hash(read_ini_bytes())
+                
+                settings = dict(config["Settings"])
+                
+                # Get snippets from the config
+                snippets = []
+                for key in config["Strings"]:
+                    snippets.append(key)
+                
+                # Sort snippets by length in descending order so longer snippets are checked first
+                snippets.sort(key=len, reverse=True)
+                
+                # Load and compile the bodies, then build the matcher once per load
+                snippet_store = select_store(False)
+                snippet_store.load(config["Strings"], signature)
+                new_matcher = SnippetMatcher(snippets)
+            
+            # Publish the keys and the matcher
+            apply_settings(settings)
+            key_array = snippets
+            matcher = new_matcher
+            resize_log()
+            
+            # The cache holds all bodies, so it is only used in eager mode
+            if cached is None and not lazy:
+                save_library_cache(digest, settings)
+            
+            # Write snippets to list file for reference (optional)
+            write_list_file(snippets)
+            
+            if debugging:
+                print("Loaded snippets:", key_array)
+            
+        except Exception as e:
+            print(f"Error reading Input.ini: {e}")
+            traceback.print_exc()
+            # Create a default ini file in case of error
+            key_array = ["ttime", "ddate"]  # Fallback to basic snippets
+            matcher = SnippetMatcher(key_array)
+            resize_log()
+
+def read_database():
+    """Load the snippet keys and settings from the SQLite database"""
+    global key_array, matcher, snippet_store
     
+    with reload_lock:
+        try:
+            store = select_database_store()
+            settings = store.load()
+            
+            # Seed a new database from Input.ini the first time it is used
+            if not store and not settings and os.path.exists(input_file):
+                count = store.import_ini(input_file)
+                print(f"Imported {count} snippets from Input.ini into {os.path.basename(database_file)}")
+                settings = store.load()
+            
+            # Pattern triggers stay in Input.ini
+            if os.path.exists(input_file):
+                load_patterns(read_ini_bytes())
+            
+            snippets = sorted(store.keys(), key=len, reverse=True)
+            snippet_store = store
+            new_matcher = SnippetMatcher(snippets)
+            
+            # Publish the keys and the matcher
+            apply_settings(settings)
+            key_array = snippets
+            matcher = new_matcher
+            resize_log()
+            write_list_file(snippets)
+            
+            if debugging:
+                print("Loaded snippets:", key_array)
+        except Exception as e:
+            print(f"Error reading {database_file}: {e}")
+            traceback.print_exc()
+            key_array = ["ttime", "ddate"]  # Fallback to basic snippets
+            matcher = SnippetMatcher(key_array)
+            resize_log()
+
+def select_database_store():
+    """Return the SQLite store for database_file, reusing the current one if possible"""
+    if is_database_store(snippet_store) and snippet_store.path == database_file:
+        return snippet_store
+    from sub.sqlite_store import SqliteSnippetStore
+    return SqliteSnippetStore(database_file, body_cache_kb * 1024)
+
+def is_database_store(store):
+    """Return True for the SQLite store, without importing sqlite3 when it is not used"""
+    module = sys.modules.get("sub.sqlite_store")
+    return module is not None and isinstance(store, module.SqliteSnippetStore)
+
+def open_transaction():
+    """Return a transaction for edits to the current snippet storage"""
+    if is_database_store(snippet_store):
+        return snippet_store.transaction()
+    return IniTransaction(input_file)
+
+def read_ini_bytes():
+    """Return the raw content of Input.ini"""
+    with open(input_file, 'rb') as f:
+        return f.read()
+
+def parse_ini_bytes(data):
+    """Parse the raw content of Input.ini into a ConfigParser"""
+    import configparser
+    config = configparser.ConfigParser(interpolation=None)
+    # Decode as utf-8 to properly handle special characters
+    config.read_string(strip_patterns(data.decode('utf-8').replace('\r\n', '\n')))
+    return config
+
+def save_library_cache(digest, settings):
+    """Store the loaded library in the cache file for the next start"""
     try:
-        # Read the sound setting - disable interpolation to handle % characters
-        config = configparser.ConfigParser(interpolation=None)
-        
-        # Check if the file exists
-        if not os.path.exists(input_file):
-            create_default_ini()
-        
-        # Read the file with utf-8 encoding to properly handle special characters
-        with open(input_file, 'r', encoding='utf-8') as f:
-            config.read_file(f)
-        
-        # Check if required sections exist
-        if "Strings" not in config:
-            config["Strings"] = {}
-        if "Settings" not in config:
-            config["Settings"] = {"SoundSetting": "0"}
-            with open(input_file, 'w', encoding='utf-8') as f:
-                config.write(f)
-        
-        sound_setting = int(config.get("Settings", "SoundSetting", fallback="0"))
-        
-        # Delete the list txt file if it exists
-        if os.path.exists(list_file):
-            try:
-                os.remove(list_file)
-            except:
-                pass  # Ignore if file can't be deleted
-        
-        # Get snippets from the config
-        snippets = []
-        for key in config["Strings"]:
-            snippets.append(key)
-        
-        # Sort snippets by length in descending order so longer snippets are checked first
-        snippets.sort(key=len, reverse=True)
-        
-        # Store in global key_array
-        key_array = snippets
-        
-        # Write snippets to list file for reference (optional)
-        with open(list_file, 'w', encoding='utf-8') as f:
-            for key in snippets:
-                f.write(key + "\n")
-        
-        # Hide list file (not perfect equivalent, just make it hidden on Windows)
+        save_cache(cache_file, digest, {
+            "settings": settings,
+            "keys": key_array,
+            "bodies": snippet_store.bodies,
+            "templates": snippet_store.templates,
+            "matcher": matcher,
+        })
+    except Exception as e:
+        print(f"Error writing snippet cache: {e}")
+        if debugging:
+            traceback.print_exc()
+
+def load_patterns(data):
+    """Compile the [Patterns] section of Input.ini if it changed"""
+    global pattern_matcher
+    
+    # A broken pattern must never keep the [Strings] snippets from loading
+    try:
+        patterns = scan_patterns(data)
+        if patterns == pattern_matcher.sources:
+            return
+        new_matcher = PatternMatcher(patterns)
+    except Exception as e:
+        print(f"Error loading [Patterns]: {e}")
+        if debugging:
+            traceback.print_exc()
+        return
+    for error in new_matcher.errors:
+        print(f"Skipping pattern {error}")
+    pattern_matcher = new_matcher
+    resize_log()
+    if debugging:
+        print(f"Loaded {len(new_matcher)} patterns")
+
+def lazy_bodies_enabled(settings):
+    """Return True if the settings ask to keep only the snippet keys in memory"""
+    return settings.get("lazybodies", "0").strip() == "1"
+
+def select_store(lazy):
+    """Return a snippet store of the right kind, reusing the current one if possible"""
+    if lazy:
+        if isinstance(snippet_store, LazySnippetStore):
+            return snippet_store
+        return LazySnippetStore(input_file, body_cache_kb * 1024)
+    if isinstance(snippet_store, SnippetStore):
+        return snippet_store
+    return SnippetStore(input_file)
+
+def apply_settings(settings):
+    """Apply the [Settings] section of Input.ini, given as a dict with lowercase keys"""
+    global sound_setting, type_threshold, clipboard_restore_delay, body_cache_kb, include_cache_kb
+    
+    sound_setting = int(settings.get("soundsetting", "0"))
+    type_threshold = int(settings.get("typethreshold", str(type_threshold)))
+    output_policy.type_threshold = type_threshold
+    clipboard_restore_delay = float(settings.get("clipboardrestoredelay", str(clipboard_restore_delay)))
+    clipboard_manager.settle_delay = clipboard_restore_delay
+    body_cache_kb = int(settings.get("bodycachekb", str(body_cache_kb)))
+    include_cache_kb = int(settings.get("includecachekb", str(include_cache_kb)))
+    include_cache.budget = include_cache_kb * 1024
+    apply_pacing_settings(settings)
+    usage_log.enabled = settings.get("usagelog", "1").strip() != "0"
+    if isinstance(snippet_store, LazySnippetStore) or is_database_store(snippet_store):
+        snippet_store.cache_budget = body_cache_kb * 1024
+
+def apply_pacing_settings(settings):
+    """Configure the injection pacer; calibration is only reset when the settings change"""
+    global pacing_settings
+    
+    current = (settings.get("pacingprofile", "auto").strip().lower(),
+               settings.get("pacingdelayms", "").strip(),
+               settings.get("remoteapps", "").strip())
+    if current == pacing_settings:
+        return
+    pacing_settings = current
+    mode, delay_ms, remote_apps = current
+    injection_pacer.configure(
+        mode,
+        remote_apps.split(",") if remote_apps else None,
+        float(delay_ms) / 1000.0 if delay_ms else None,
+    )
+
+def write_list_file(snippets):
+    """Write the snippet keys to List.txt for reference"""
+    # Delete the list txt file if it exists
+    if os.path.exists(list_file):
         try:
-            if os.name == 'nt':
-                os.system(f'attrib +h "{list_file}"')
+            os.remove(list_file)
         except:
-            pass  # Just continue if we can't hide the file
+            pass  # Ignore if file can't be deleted
+    
+    # Write snippets to list file for reference (optional)
+    with open(list_file, 'w', encoding='utf-8') as f:
+        for key in snippets:
+            f.write(key + "\n")
+    
+    # Hide list file on Windows; set the attribute directly rather than
+    # starting attrib.exe on every reload
+    try:
+        if os.name == 'nt':
+            import ctypes
+            FILE_ATTRIBUTE_HIDDEN = 0x02
+            ctypes.windll.kernel32.SetFileAttributesW(list_file, FILE_ATTRIBUTE_HIDDEN)
+    except:
+        pass  # Just continue if we can't hide the file
+
+def reload_ini_file():
+    """Apply changes in Input.ini to the live matcher and store without a full rebuild"""
+    global key_array
+    
+    with reload_lock:
+        if is_database_store(snippet_store):
+            reload_database()
+            return
+        try:
+            signature = file_signature(input_file)
+            if signature is None or signature == snippet_store.signature:
+                return
             
-        if debugging:
-            print("Loaded snippets:", key_array)
+            data = read_ini_bytes()
+            load_patterns(data)
+            lazy = isinstance(snippet_store, LazySnippetStore)
+            if lazy:
+                entries, settings = scan_ini(data)
+            else:
+                config = parse_ini_bytes(data)
+                if "Strings" not in config:
+                    config["Strings"] = {}
+                settings = dict(config["Settings"]) if "Settings" in config else {}
             
-    except Exception as e:
-        print(f"Error reading Input.ini: {e}")
-        traceback.print_exc()
-        # Create a default ini file in case of error
-        key_array = ["ttime", "ddate"]  # Fallback to basic snippets
+            # Switching the storage mode needs a full load
+            if lazy_bodies_enabled(settings) != lazy:
+                read_ini_file()
+                return
+            
+            apply_settings(settings)
+            
+            if lazy:
+                # Bodies are read on demand, so only the key set can differ;
+                # the new index replaces the old one in a single swap
+                added, removed = snippet_store.reindex(entries, signature)
+                changed = []
+                for key in removed:
+                    matcher.remove(key)
+                for key in added:
+                    matcher.add(key)
+            else:
+                # Only the difference is applied. New bodies go into the store
+                # before their keys reach the matcher, and removed keys leave the
+                # matcher first, so a match always finds its body
+                added, changed, removed = snippet_store.diff(config["Strings"])
+                for key in removed:
+                    matcher.remove(key)
+                snippet_store.apply({**added, **changed}, removed, signature)
+                for key in added:
+                    matcher.add(key)
+            
+            if added or removed:
+                update_key_array(added, removed)
+            
+            if added or changed or removed:
+                print(f"Input.ini changed: {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+            
+            # Keep the startup cache in line with the live library
+            if not lazy:
+                save_library_cache(content_hash(data), settings)
+        except Exception as e:
+            print(f"Error reloading Input.ini: {e}")
+            if debugging:
+                traceback.print_exc()
+
+def reload_database():
+    """Apply changes in the SQLite database to the live matcher"""
+    with reload_lock:
+        try:
+            if not snippet_store.is_stale():
+                return
+            added, removed, settings = snippet_store.refresh()
+            apply_settings(settings)
+            # New keys only reach the matcher once their bodies are readable,
+            # and removed keys leave it before anything else
+            for key in removed:
+                matcher.remove(key)
+            for key in added:
+                matcher.add(key)
+            if added or removed:
+                update_key_array(added, removed)
+                print(f"{os.path.basename(database_file)} changed: {len(added)} added, {len(removed)} removed")
+        except Exception as e:
+            print(f"Error reloading {database_file}: {e}")
+            if debugging:
+                traceback.print_exc()
+
+def update_key_array(added, removed):
+    """Publish a new key_array after snippets were added or removed"""
+    global key_array
+    
+    gone = set(removed)
+    snippets = [key for key in key_array if key not in gone] + list(added)
+    snippets.sort(key=len, reverse=True)
+    key_array = snippets
+    resize_log()
+    write_list_file(snippets)
+
+def resize_log():
+    """Size the keystroke buffer from the longest snippet"""
+    # Twice the longest key leaves room to backspace over a typo and still
+    # match the snippet typed before it
+    capacity = max(2 * matcher.max_len, min_log_capacity, PATTERN_WINDOW if pattern_matcher else 0)
+    with log_lock:
+        if log.capacity != capacity:
+            log.resize(capacity)
 
 def create_default_ini():
     """Create a default Input.ini file"""
-    config = configparser.ConfigParser(interpolation=None)
-    config["Strings"] = {
+    strings = {
         "ttime": "%HH%mm%ss_",
         "ddate": "%yy%MM%dd_",
         "date2": "%dd.%MM.%yyyy",
@@ -113,10 +470,11 @@ def create_default_ini():
         "bbb": "Best regards.{n}John Doe",
         "kkind": "Kind regards.{n}John Doe"
     }
-    config["Settings"] = {"SoundSetting": "0"}
     
-    with open(input_file, 'w', encoding='utf-8') as f:
-        config.write(f)
+    with IniTransaction(input_file) as transaction:
+        for key, body in strings.items():
+            transaction.set(key, body)
+        transaction.set_setting("SoundSetting", 0)
 
 def play_sound():
     """Play a system beep sound if sound_setting is enabled"""
@@ -128,70 +486,85 @@ def play_sound():
             # Fallback for non-Windows systems
             print('\a')  # Terminal bell
 
-def check_timeout():
-    """Check if enough time has passed to reset the input log"""
+def check_timeout(current_time):
+    """Reset the input log if the previous key arrived too long ago"""
     global log, last_key_time, log_lock
     
-    while True:
-        try:
-            current_time = time.time()
-            with log_lock:
-                if log and (current_time - last_key_time) > input_timeout:
-                    if log and debugging:
-                        print(f"Input buffer cleared (timeout) - [{datetime.datetime.now().strftime('%H:%M:%S')}]")
-                    log = ""
-            # Check every 100ms
-            time.sleep(0.1)
-        except Exception as e:
+    # The deadline is only checked when the next key arrives, so no thread
+    # has to wake up and take the lock while the keyboard is idle
+    with log_lock:
+        if log and (current_time - last_key_time) > input_timeout:
             if debugging:
-                print(f"Error in timeout thread: {e}")
-            # Continue checking even if an error occurs
-            time.sleep(0.1)
+                print(f"Input buffer cleared (timeout) - [{datetime.datetime.now().strftime('%H:%M:%S')}]")
+            log.clear()
 
 def get_replacement(snippet):
-    """Get the replacement text for a snippet from the config file"""
+    """Get the replacement text for a snippet from the in-memory store"""
+    started = latency.start()
     try:
-        config = configparser.ConfigParser(interpolation=None)
-        with open(input_file, 'r', encoding='utf-8') as f:
-            config.read_file(f)
+        # Only re-read Input.ini if its mtime or size changed since the last load
+        if snippet_store.is_stale():
+            if debugging:
+                print("Input.ini changed on disk, reloading snippets")
+            reload_ini_file()
         
-        if "Strings" in config and snippet in config["Strings"]:
-            return config["Strings"][snippet]
-        return None
+        replacement = snippet_store.get(snippet)
+        latency.record("get_replacement", started)
+        return replacement
     except Exception as e:
         print(f"Error getting replacement for '{snippet}': {e}")
         return None
 
+def get_template(snippet):
+    """Get the compiled template for a snippet from the in-memory store"""
+    return snippet_store.get_template(snippet)
+
 def check_for_snippets():
-    """Check if the current input buffer contains any snippet"""
+    """
+    Check if the current input buffer ends with any snippet
+    
+    Returns the snippet key, a PatternMatch or None. [Strings] snippets take
+    precedence: the patterns are only tried when no snippet ends the buffer.
+    """
     global log, log_lock
     
+    started = latency.start()
     with log_lock:
-        current_log = log
+        # Print current buffer for debugging
+        if debugging:
+            print(f"Current buffer: '{log}'")
         
-    # Clean the log by removing any control characters or invisible space
-    clean_log = current_log.strip()
-    
-    # Print current buffer for debugging
-    if debugging:
-        print(f"Current buffer: '{clean_log}'")
-    
-    # Check each snippet
-    for snippet in key_array:
-        # Check if the snippet is in the buffer
-        # Try both exact matching and checking if it's at the end of the buffer
-        if snippet == clean_log or clean_log.endswith(snippet):
-            return snippet
-            
-    return None
+        # Walk the reversed-suffix trie over the buffer tail in place; the
+        # longest snippet ending the buffer wins. Otherwise the combined
+        # pattern regex is searched once over the whole buffer
+        snippet = find_trigger(matcher, pattern_matcher, log)
+    latency.record("check_for_snippets", started)
+    return snippet
 
 def process_key(key):
     """Process each keystroke and check for snippet matches"""
-    global log, last_key_time, log_lock
+    global log, last_key_time, log_lock, gui_focused
     
     try:
-        # Update the last key time
-        last_key_time = time.time()
+        started = latency.start()
+        
+        # Expire the input log if the timeout passed, then update the last key time
+        current_time = time.monotonic()
+        check_timeout(current_time)
+        last_key_time = current_time
+        
+        # Keys seen while the worker injects are its own synthetic keystrokes;
+        # the pacer waits for them to come through here
+        if expansion_worker.injecting.is_set():
+            injection_pacer.note_echo(key)
+            return
+        
+        # Keys typed into the settings GUI edit snippets and are not expanded;
+        # the flag is dropped if the GUI went away without clearing it
+        if gui_focused:
+            if gui_process is not None and gui_process.poll() is None:
+                return
+            gui_focused = False
         
         # Filter out special keys that should not be part of snippets
         if len(key) > 1 and key not in ['space', 'backspace', 'tab']:
@@ -202,91 +575,353 @@ def process_key(key):
             key = ' '
         elif key == 'tab':
             key = '\t'
-        elif key == 'backspace' and log:
+        elif key == 'backspace':
+            # A quick correction means the last expansion may have lost keys
+            injection_pacer.note_correction()
             with log_lock:
-                log = log[:-1]  # Remove last character
+                log.pop()  # Remove last character in place
                 if debugging:
                     print(f"Backspace pressed, new log: '{log}'")
+            expansion_worker.note_backspace()
             return
         
         # Add the key to the log
         with log_lock:
-            log += key
+            log.append(key)
             if debugging:
                 print(f"Key pressed: '{key}', current log: '{log}'")
+        latency.record("buffer", started)
+        
+        # Keys typed while an expansion waits are replayed after it
+        if expansion_worker.note_key(key):
+            return
         
         # Check for any snippet matches
         snippet = check_for_snippets()
-        if snippet:
-            # Get the replacement value
-            replacement = get_replacement(snippet)
-            
-            if replacement:
-                # Print confirmation to terminal
-                if debugging:
-                    print(f"Replacing '{snippet}' - [{datetime.datetime.now().strftime('%H:%M:%S')}]")
-                
-                try:
-                    # Replace flags in the replacement text
-                    replacement = replace_flags(replacement)
-                    
-                    # Save the current clipboard content
-                    try:
-                        original_clipboard = pyperclip.paste()
-                    except:
-                        original_clipboard = ""
-                    
-                    # Handle multi-line replacement by converting {n} to actual newlines
-                    if isinstance(replacement, list):
-                        replacement = "\n".join(replacement)
-                    else:
-                        replacement = replacement.replace("{n}", "\n")
-                    
-                    # Copy the replacement to clipboard
-                    pyperclip.copy(replacement)
-                    
-                    # Calculate how much to delete - we delete the whole snippet
-                    delete_count = len(snippet)
-                    for _ in range(delete_count):
-                        keyboard.press_and_release('backspace')
-                    
-                    # Small delay to ensure backspaces are processed
-                    time.sleep(0.05)
-                    
-                    # Paste the replacement
-                    keyboard.press_and_release('ctrl+v')
-                    
-                    # Restore original clipboard after a short delay
-                    def restore_clipboard():
-                        try:
-                            pyperclip.copy(original_clipboard)
-                        except:
-                            pass
-                    threading.Timer(0.5, restore_clipboard).start()
-                    
-                    # Play confirmation sound
-                    play_sound()
-                except Exception as e:
-                    print(f"Error during replacement: {e}")
-                    if debugging:
-                        traceback.print_exc()
-                
-                # Reset the log
-                with log_lock:
-                    log = ""
+        if isinstance(snippet, PatternMatch):
+            with log_lock:
+                log.clear()
+            expansion_worker.submit(snippet.text, snippet)
+        elif snippet and snippet_store.has_body(snippet):
+            # Hand the expansion to the worker and reset the log right away,
+            # so the hook returns without touching the clipboard or the disk
+            with log_lock:
+                log.clear()
+            expansion_worker.submit(snippet)
     except Exception as e:
         print(f"Error processing key: {e}")
         if debugging:
             traceback.print_exc()
 
-def main():
-    """Main function to start the snippet runner"""
-    global log
+def expand_snippet(job):
+    """Replace a matched snippet in the target window (runs on the expansion worker)"""
+    snippet = job.snippet
+    pattern = job.pattern
+    started = latency.start()
+    
+    # Get the replacement value; a pattern match carries its template
+    if pattern is None:
+        replacement = get_replacement(snippet)
+        if not replacement:
+            return
+    
+    # Print confirmation to terminal
+    if debugging:
+        print(f"Replacing '{snippet}' - [{datetime.datetime.now().strftime('%H:%M:%S')}]")
+    
+    try:
+        # Expand the precompiled template; flags and {n} are
+        # resolved in a single pass
+        expand_started = latency.start()
+        if pattern is not None:
+            replacement = pattern.expand()
+        else:
+            template = get_template(snippet)
+            if template is not None:
+                replacement = template.expand()
+            else:
+                replacement = replace_flags(replacement).replace("{n}", "\n")
+        latency.record("replace_flags", expand_started)
+        
+        # Freeze the keys typed since the match; from here on key events
+        # are our own and are ignored by the hook
+        trailing = expansion_worker.begin(job)
+        if trailing is None:
+            return
+        
+        # Delete the whole snippet plus anything typed after it while the
+        # job was waiting, then output the replacement followed by those keys
+        delete_count = len(snippet) + len(trailing)
+        # Large included files go to the backend as the cached string itself
+        text = replacement + trailing if trailing else replacement
+        backend = output_policy.select(text)
+        if debugging:
+            print(f"Output backend: {backend.name}")
+        backend.replace(delete_count, text)
+        latency.record("expansion", started)
+        
+        # Buffered; the usage log thread writes it to disk
+        usage_log.record(snippet if pattern is None else pattern.source, len(replacement), (time.perf_counter() - job.submitted) * 1e6)
+        
+        # Play confirmation sound
+        play_sound()
+    except Exception as e:
+        print(f"Error during replacement: {e}")
+        if debugging:
+            traceback.print_exc()
+
+# Short single-line replacements are typed, everything else is pasted
+clipboard_manager = ClipboardManager("pyperclip", clipboard_restore_delay, debugging)
+usage_log = UsageLog(usage_file, debugging=debugging)
+include_cache.base_dir = os.path.dirname(input_file)
+injection_pacer = InjectionPacer(debugging=debugging)
+output_policy = OutputPolicy(
+    TypingBackend(keyboard, injection_pacer),
+    ClipboardBackend(keyboard, clipboard_manager, injection_pacer),
+    type_threshold,
+)
+
+# Modifier keys are tracked from key events instead of queried per key
+modifiers = ModifierState(keyboard)
+
+# Expansions run on a dedicated thread fed from the keyboard hook
+expansion_worker = ExpansionWorker(expand_snippet, debugging)
+
+def apply_snippet_edits(updates, removed=()):
+    """Write snippet edits to the storage and apply them to the live engine"""
+    # Bodies are kept the way Input.ini gives them back after a reload
+    updates = {key.strip().lower(): normalize_body(body) for key, body in updates.items()}
+    removed = [key.strip().lower() for key in removed]
+    
+    with reload_lock:
+        current = not snippet_store.is_stale()
+        transaction = open_transaction()
+        for key, body in updates.items():
+            transaction.set(key, body)
+        for key in removed:
+            transaction.remove(key)
+        signature = transaction.commit()
+        
+        if current and isinstance(snippet_store, SnippetStore):
+            # The edits are all that changed, so apply them directly instead
+            # of parsing the file again
+            added = [key for key in updates if key not in snippet_store]
+            gone = [key for key in removed if key in snippet_store]
+            for key in gone:
+                matcher.remove(key)
+            snippet_store.apply(updates, gone, signature)
+            for key in added:
+                matcher.add(key)
+            if added or gone:
+                update_key_array(added, gone)
+        else:
+            # Lazy offsets moved, the database needs a refresh, or someone
+            # else changed the file too
+            reload_ini_file()
+
+def control_add(snippets):
+    """Control command: add or update snippets given as {key: replacement}"""
+    if not isinstance(snippets, dict) or not snippets:
+        raise ValueError("add needs at least one snippet")
+    for key, body in snippets.items():
+        check_snippet_key(key)
+        check_snippet_body(key, body)
+    apply_snippet_edits(snippets)
+    return {"added": len(snippets), "snippets": len(key_array)}
+
+def control_remove(keys):
+    """Control command: remove snippets"""
+    if not isinstance(keys, list) or not keys or not all(isinstance(key, str) for key in keys):
+        raise ValueError("remove needs a list of snippets")
+    missing = [key for key in keys if key.strip().lower() not in snippet_store]
+    apply_snippet_edits({}, keys)
+    return {"removed": len(keys) - len(missing), "missing": missing, "snippets": len(key_array)}
+
+def control_reload(full=False):
+    """Control command: apply changes on disk, or reload everything"""
+    if full:
+        restart_script()
+    else:
+        reload_ini_file()
+    return {"snippets": len(key_array)}
+
+def control_toggle_sound():
+    """Control command: toggle the sound setting"""
+    toggle_sound()
+    return {"sound": sound_setting}
+
+def control_stats():
+    """Control command: return the latency statistics"""
+    return {"enabled": latency.enabled, "stages": latency.snapshot()}
+
+def control_dump_buffer_state():
+    """Control command: return the keystroke buffer and engine state"""
+    with log_lock:
+        buffer = str(log)
+        capacity = log.capacity
+    job = expansion_worker.pending
+    return {
+        "buffer": buffer,
+        "capacity": capacity,
+        "idle_seconds": round(time.monotonic() - last_key_time, 3),
+        "pending_expansion": job.snippet if job is not None else None,
+        "injecting": expansion_worker.injecting.is_set(),
+        "modifier_mask": modifiers.mask,
+        "snippets": len(key_array),
+        "patterns": len(pattern_matcher),
+        "store": type(snippet_store).__name__,
+    }
+
+def control_ping():
+    """Control command: report that this instance is alive"""
+    return {"version": version, "snippets": len(key_array)}
+
+def control_gui_focus(focused):
+    """Control command: the settings GUI gained or lost the keyboard focus"""
+    global gui_focused
+    gui_focused = bool(focused)
+    return {}
+
+def control_quit():
+    """Control command: exit SnipIt once the reply has been sent"""
+    threading.Timer(0.1, exit_app).start()
+    return {}
+
+control_commands = {
+    "ping": control_ping,
+    "quit": control_quit,
+    "gui-focus": control_gui_focus,
+    "add": control_add,
+    "remove": control_remove,
+    "reload": control_reload,
+    "toggle-sound": control_toggle_sound,
+    "stats": control_stats,
+    "dump-buffer-state": control_dump_buffer_state,
+}
+control_server = None
+gui_process = None  # settings GUI started by setup()
+gui_focused = False  # keys typed into the settings GUI are not matched
+
+def start_control_server():
+    """Serve control_commands on the control socket"""
+    global control_server, socket_path
     
     try:
-        # Clear terminal
-        os.system('cls' if os.name == 'nt' else 'clear')
+        from sub.control import ControlServer, default_socket_path
+        if socket_path is None:
+            socket_path = default_socket_path(script_dir)
+        server = ControlServer(control_commands, socket_path, debugging)
+        if server.start():
+            control_server = server
+            if debugging:
+                print(f"Control socket listening on {server.address}")
+        else:
+            print(f"Control socket {socket_path} is in use; is SnipIt already running?")
+    except Exception as e:
+        print(f"Error starting the control socket: {e}")
+        if debugging:
+            traceback.print_exc()
+
+def parse_args(argv=None):
+    """Parse the command line options"""
+    parser = argparse.ArgumentParser(description="SnipIt - Text replacement tool",
+                                     epilog="To expand the snippets in files instead, see: snipit.py expand --help")
+    parser.add_argument("--stats", nargs="?", const="table", choices=["table", "json"],
+                        help="record per-stage latency histograms and dump them on Ctrl+Shift+L and at exit")
+    parser.add_argument("--db", nargs="?", const=default_database_file, metavar="PATH",
+                        help="keep the snippets in an SQLite database (default: Input.db) instead of Input.ini")
+    parser.add_argument("--import-ini", nargs="?", const=input_file, metavar="PATH",
+                        help="replace the database content with an INI file (default: Input.ini) and exit")
+    parser.add_argument("--export-ini", nargs="?", const=input_file, metavar="PATH",
+                        help="write the database content to an INI file (default: Input.ini) and exit")
+    parser.add_argument("--usage-report", nargs="?", const=20, type=int, metavar="TOP",
+                        help="print the most used (default: top 20) and never used snippets from Usage.log and exit")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print how long each import and initialization phase took once SnipIt is ready")
+    return parser.parse_args(argv)
+
+def on_key_event(event):
+    """Keyboard hook callback for every key-down and key-up event"""
+    started = latency.start()
+    try:
+        name = getattr(event, 'name', None)
+        is_down = getattr(event, 'event_type', 'down') != 'up'
+        
+        # Track Ctrl/Alt/AltGr from the events themselves
+        modifier_started = latency.start()
+        if modifiers.update(name, is_down) or not is_down:
+            latency.record("modifiers", modifier_started)
+            return
+        
+        # Our own keystrokes, including AltGr characters typed by the worker
+        if expansion_worker.injecting.is_set():
+            latency.record("modifiers", modifier_started)
+            injection_pacer.note_echo(name or getattr(event, 'char', None))
+            return
+        
+        modifier_pressed = modifiers.any_pressed()
+        latency.record("modifiers", modifier_started)
+        if modifier_pressed:
+            # Ctrl+Z right after an expansion counts as a correction
+            if name == 'z' and modifiers.mask & CTRL:
+                injection_pacer.note_correction()
+            if debugging:
+                print("Ignoring input while modifier key is pressed")
+            return
+        
+        # Get the key value, handling special characters correctly
+        if name:
+            key = name
+        elif hasattr(event, 'char') and event.char:
+            key = event.char
+        else:
+            key = ""
         
+        if key:  # Only process if we got a valid key
+            process_key(key)
+    except Exception as e:
+        print(f"Error in key press callback: {e}")
+        if debugging:
+            traceback.print_exc()
+    finally:
+        latency.record("hook", started)
+
+def install_hooks():
+    """Register the hotkeys and the keyboard hook"""
+    # Forget modifier state from before a re-hook; key-ups may have been missed
+    modifiers.reset()
+    
+    # Register hotkeys
+    keyboard.add_hotkey('ctrl+shift+q', exit_app)
+    keyboard.add_hotkey('ctrl+shift+s', setup)
+    keyboard.add_hotkey('ctrl+shift+l', dump_stats)
+    keyboard.add_hotkey('ctrl+shift+p', toggle_sound)
+    keyboard.add_hotkey('esc', restart_script)
+    
+    # Start keyboard listener with the callback
+    keyboard.hook(on_key_event)
+    injection_pacer.watch_echo()
+
+def main(args=None):
+    """Main function to start the snippet runner"""
+    global log, stats_format, database_file
+    
+    if args is None:
+        args = parse_args([])
+    if args.stats:
+        stats_format = args.stats
+        latency.enable()
+    if args.import_ini or args.export_ini:
+        database_command(args.db or default_database_file, args.import_ini, args.export_ini)
+        return
+    if args.db:
+        database_file = args.db
+    if args.usage_report is not None:
+        usage_report(args.usage_report)
+        return
+    startup.mark("parse arguments")
+    
+    try:
         # Print banner
         print("="*60)
         print(f"          SnipIt - Text Replacement Tool - {version}")
@@ -295,58 +930,50 @@ def main():
         
         # Read the ini file
         read_ini_file()
+        startup.mark("load snippets")
         
         # Print loaded snippets
-        print(f"Loaded {len(key_array)} snippets from Input.ini")
+        print(f"Loaded {len(key_array)} snippets from {os.path.basename(database_file or input_file)}")
         print("Hotkeys:")
         print("  Ctrl+Shift+S: Open settings GUI")
         print("  Ctrl+Shift+P: Toggle sound notifications")
         print("  Ctrl+Shift+Q: Exit the application")
+        if latency.enabled:
+            print("  Ctrl+Shift+L: Dump latency statistics")
         print("  Esc: Reset/restart the script")
         print("-"*60)
         print("SnipIt is now running and monitoring keystrokes")
         print("-"*60)
         
-        # Register hotkeys
-        keyboard.add_hotkey('ctrl+shift+q', exit_app)
-        keyboard.add_hotkey('ctrl+shift+s', setup)
-        keyboard.add_hotkey('ctrl+shift+p', toggle_sound)
-        keyboard.add_hotkey('esc', restart_script)
-        
         # Start key capture
-        log = ""
+        with log_lock:
+            log.clear()
         
-        # Start the timeout checker in a separate thread
-        timeout_thread = threading.Thread(target=check_timeout, daemon=True)
-        timeout_thread.start()
+        # Start the expansion worker and the clipboard restore service
+        expansion_worker.start()
+        clipboard_manager.start()
+        usage_log.start()
+        startup.mark("start workers")
         
-        # Define a callback function for key press events
-        def on_key_press(event):
-            try:
-                # Check if any modifier key is pressed directly using keyboard.is_pressed
-                if (keyboard.is_pressed('ctrl') or
-                        keyboard.is_pressed('alt') or
-                        keyboard.is_pressed('alt gr')):
-                    if debugging:
-                        print("Ignoring input while modifier key is pressed")
-                    return
-                # Get the key value, handling special characters correctly
-                if hasattr(event, 'name') and event.name:
-                    key = event.name
-                elif hasattr(event, 'char') and event.char:
-                    key = event.char
-                else:
-                    key = ""
-                
-                if key:  # Only process if we got a valid key
-                    process_key(key)
-            except Exception as e:
-                print(f"Error in key press callback: {e}")
-                if debugging:
-                    traceback.print_exc()
+        # Register hotkeys and start the keyboard listener; snippets expand
+        # from here on, so everything below is off the critical path
+        install_hooks()
+        startup.mark("install hooks (ready)")
+        
+        # Pick up edits to Input.ini or the database while running
+        if database_file:
+            IniWatcher(database_file, reload_ini_file, debugging=debugging,
+                       signature=lambda: snippet_store.generation()).start()
+        else:
+            IniWatcher(input_file, reload_ini_file, debugging=debugging).start()
+        startup.mark("start file watcher")
+        
+        # Accept commands from snipitctl.py
+        start_control_server()
+        startup.mark("start control socket")
         
-        # Start keyboard listener with the callback
-        keyboard.on_press(on_key_press)
+        if args.profile_startup:
+            print(startup.format_table())
         
         # Keep the program running
         keyboard.wait()
@@ -356,9 +983,48 @@ def main():
         traceback.print_exc()
         input("Press Enter to exit...")
 
+def database_command(path, import_path=None, export_path=None):
+    """Import an INI file into the database or export the database to one"""
+    from sub.sqlite_store import SqliteSnippetStore
+    store = SqliteSnippetStore(path)
+    if import_path:
+        count = store.import_ini(import_path)
+        print(f"Imported {count} snippets from {import_path} into {path}")
+    if export_path:
+        count = store.export_ini(export_path)
+        print(f"Exported {count} snippets from {path} to {export_path}")
+
+def usage_report(top=20):
+    """Print the most used and the never used snippets"""
+    if database_file:
+        from sub.sqlite_store import SqliteSnippetStore
+        store = SqliteSnippetStore(database_file)
+        store.load()
+        library_keys = store.keys()
+    elif os.path.exists(input_file):
+        data = read_ini_bytes()
+        library_keys = list(scan_ini(data)[0]) + list(scan_patterns(data))
+    else:
+        library_keys = ()
+    print(format_report(read_usage(usage_file), library_keys, top))
+
+def dump_stats():
+    """Print the per-stage latency histograms"""
+    if not latency.enabled:
+        print("Latency statistics are disabled; start SnipIt with --stats to record them.")
+        return
+    print(latency.dump(stats_format))
+
 def exit_app():
     """Exit the application"""
     try:
+        if latency.enabled:
+            dump_stats()
+        # Put back the user's clipboard if a restore is still pending
+        clipboard_manager.restore_now()
+        usage_log.flush()
+        if control_server is not None:
+            control_server.stop()
         if os.path.exists(list_file):
             try:
                 os.remove(list_file)
@@ -372,79 +1038,51 @@ def exit_app():
     os._exit(0)  # Force exit to kill all threads
 
 def setup():
-    """Start the setup GUI"""
-    print("Opening settings GUI...")
+    """Start the setup GUI in its own process"""
+    global gui_process
+    
+    # The GUI runs its own Tk main loop in a separate process and sends its
+    # edits over the control socket, so the keyboard hook stays installed
+    # and snippets keep expanding while the window is open
+    if gui_process is not None and gui_process.poll() is None:
+        print("The settings GUI is already open.")
+        return
     
+    print("Opening settings GUI...")
     try:
-        # Stop keyboard listener temporarily
-        keyboard.unhook_all()
-        
-        # Start the GUI
-        setup_gui(input_file, key_array)
-        
-        # Restart the script
-        restart_script()
-        
-        # Resume keyboard listener with the correct callback
-        def on_key_press(event):
-            try:
-                global ctrl_pressed, alt_pressed, alt_gr_pressed
-
-                # Check if any modifier key is pressed directly using keyboard.is_pressed
-                if (keyboard.is_pressed('ctrl') or
-                        keyboard.is_pressed('alt') or
-                        keyboard.is_pressed('alt gr')):
-                    if debugging:
-                        print("Ignoring input while modifier key is pressed")
-                    return
-
-                # Get the key value, handling special characters correctly
-                if hasattr(event, 'name') and event.name:
-                    key = event.name
-                elif hasattr(event, 'char') and event.char:
-                    key = event.char
-                else:
-                    key = ""
-                
-                if key:  # Only process if we got a valid key
-                    process_key(key)
-            except Exception as e:
-                print(f"Error in key press callback: {e}")
-                if debugging:
-                    traceback.print_exc()
-                    
-        keyboard.on_press(on_key_press)
+        command = [sys.executable, "-m", "sub.gui", "--input", input_file]
+        if database_file:
+            command += ["--db", database_file]
+        if control_server is not None:
+            command += ["--socket", socket_path]
+        import subprocess
+        gui_process = subprocess.Popen(command, cwd=script_dir)
     except Exception as e:
         print(f"Error in setup: {e}")
         if debugging:
             traceback.print_exc()
-        restart_script()
 
 def toggle_sound():
     """Toggle sound setting"""
     global sound_setting
     
     try:
-        config = configparser.ConfigParser(interpolation=None)
-        with open(input_file, 'r', encoding='utf-8') as f:
-            config.read_file(f)
-        
-        if "Settings" not in config:
-            config["Settings"] = {}
-            
-        if sound_setting == 1:
-            config["Settings"]["SoundSetting"] = "0"
-            print("Sounds switched off.")
-            sound_setting = 0
-        else:
-            config["Settings"]["SoundSetting"] = "1"
-            print("Sounds switched on.")
-            sound_setting = 1
+        new_setting = 0 if sound_setting == 1 else 1
         
-        with open(input_file, 'w', encoding='utf-8') as f:
-            config.write(f)
+        with reload_lock:
+            # Only the setting is written. If the loaded snippets were
+            # current before the write they still are, so the store adopts the
+            # new file signature instead of reloading the library. The lazy
+            # store keeps byte offsets into the file and must be reindexed.
+            current = not snippet_store.is_stale()
+            transaction = open_transaction()
+            transaction.set_setting("SoundSetting", new_setting)
+            signature = transaction.commit()
+            sound_setting = new_setting
+            if current and not isinstance(snippet_store, LazySnippetStore):
+                snippet_store.signature = signature
         
-        restart_script()
+        print("Sounds switched on." if sound_setting == 1 else "Sounds switched off.")
     except Exception as e:
         print(f"Error toggling sound: {e}")
         if debugging:
@@ -460,11 +1098,11 @@ def restart_script():
         print(f"Reloaded {len(key_array)} snippets from Input.ini")
         # Reset the log
         with log_lock:
-            log = ""
+            log.clear()
     except Exception as e:
         print(f"Error restarting script: {e}")
         if debugging:
             traceback.print_exc()
     
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(parse_args())
\ No newline at end of file
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+SnipIt - Control client
+
+Sends commands to a running SnipIt instance over its control socket, so
+scripts and provisioning tools can change snippets without restarting it
+or interrupting the keyboard hook.
+
+    python snipitctl.py add sig "Best regards.{n}John Doe"
+    python snipitctl.py add --file snippets.ini      # bulk upload of a [Strings] section
+    python snipitctl.py remove sig
+    python snipitctl.py reload [--full]
+    python snipitctl.py toggle-sound
+    python snipitctl.py stats [--json]
+    python snipitctl.py dump-buffer-state
+"""
+
+import argparse
+import configparser
+import json
+import os
+import sys
+
+from sub.control import ControlError, default_socket_path, send_command
+from sub.patterns import strip_patterns
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def read_snippet_file(path):
+    """Return the [Strings] section of an INI file as a dict"""
+    config = configparser.ConfigParser(interpolation=None)
+    with open(path, 'r', encoding='utf-8') as f:
+        config.read_string(strip_patterns(f.read()), path)
+    return dict(config["Strings"]) if "Strings" in config else {}
+
+
+def print_stats(result):
+    if not result["enabled"]:
+        print("Latency statistics are disabled; start SnipIt with --stats to record them.")
+        return
+    stages = result["stages"]
+    if not stages:
+        print("No latency samples recorded.")
+        return
+    print(f"{'stage':<20} {'count':>8} {'mean':>10} {'p50':>10} {'p99':>10} {'max':>10}")
+    for stage, summary in stages.items():
+        print(f"{stage:<20} {summary['count']:>8} {summary['mean_us']:>10.1f} "
+              f"{summary['p50_us']:>10.1f} {summary['p99_us']:>10.1f} {summary['max_us']:>10.1f}")
+    print("(microseconds; p50/p99 are bucket upper bounds)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Control a running SnipIt instance")
+    parser.add_argument("--socket", default=default_socket_path(script_dir),
+                        help="control socket of the instance (default: the one next to snipit.py)")
+    parser.add_argument("--json", action="store_true", help="print the raw result as JSON")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add or update snippets")
+    add.add_argument("pairs", nargs="*", metavar="KEY REPLACEMENT", help="snippet and replacement pairs")
+    add.add_argument("--file", help="read snippets from the [Strings] section of an INI file")
+
+    remove = commands.add_parser("remove", help="remove snippets")
+    remove.add_argument("keys", nargs="+", metavar="KEY")
+
+    reload = commands.add_parser("reload", help="apply changes made to the snippet file")
+    reload.add_argument("--full", action="store_true", help="reload everything instead of applying the difference")
+
+    commands.add_parser("toggle-sound", help="switch the sound notification on or off")
+    commands.add_parser("stats", help="show the latency statistics")
+    commands.add_parser("dump-buffer-state", help="show the keystroke buffer and engine state")
+    return parser, parser.parse_args(argv)
+
+
+def main(argv=None):
+    parser, args = parse_args(argv)
+
+    arguments = {}
+    if args.command == "add":
+        if len(args.pairs) % 2:
+            parser.error("add needs pairs of KEY REPLACEMENT")
+        snippets = dict(zip(args.pairs[0::2], args.pairs[1::2]))
+        if args.file:
+            snippets.update(read_snippet_file(args.file))
+        if not snippets:
+            parser.error("add needs at least one snippet")
+        arguments["snippets"] = snippets
+    elif args.command == "remove":
+        arguments["keys"] = args.keys
+    elif args.command == "reload":
+        arguments["full"] = args.full
+
+    try:
+        result = send_command(args.socket, args.command, **arguments)
+    except ControlError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+
+    if args.json or args.command == "dump-buffer-state":
+        print(json.dumps(result, indent=2))
+    elif args.command == "stats":
+        print_stats(result)
+    elif args.command == "add":
+        print(f"Added or updated {result['added']} snippets ({result['snippets']} in total)")
+    elif args.command == "remove":
+        print(f"Removed {result['removed']} snippets ({result['snippets']} in total)")
+        if result["missing"]:
+            print(f"Not found: {', '.join(result['missing'])}")
+    elif args.command == "reload":
+        print(f"Reloaded, {result['snippets']} snippets")
+    elif args.command == "toggle-sound":
+        print("Sounds switched on." if result["sound"] else "Sounds switched off.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Clipboard manager for SnipIt
+Saves and restores the user's clipboard around bursts of expansions
+"""
+
+import importlib
+import threading
+import time
+import traceback
+
+from sub.stats import latency
+
+
+class ClipboardManager:
+    """
+    One long-lived thread that restores the clipboard once per burst
+
+    hold() is called before an expansion uses the clipboard. The first hold
+    of a burst saves the user's real clipboard; later ones reuse it. release()
+    is called after the paste and arms a single deadline settle_delay seconds
+    away. Each new expansion pushes the deadline back, and the clipboard is
+    restored once after the last expansion settles. If the user copied
+    something else in the meantime, it is left alone.
+    """
+
+    def __init__(self, clipboard_module, settle_delay=0.5, debugging=False):
+        # A module name is imported the first time the clipboard is used
+        self._clipboard = clipboard_module
+        self.settle_delay = settle_delay
+        self.debugging = debugging
+        self.condition = threading.Condition()
+        self.active = 0
+        self.saved = None
+        self.last_copied = None
+        self.deadline = None
+        self.thread = None
+
+    @property
+    def clipboard(self):
+        if isinstance(self._clipboard, str):
+            self._clipboard = importlib.import_module(self._clipboard)
+        return self._clipboard
+
+    def start(self):
+        """Start the restore thread once"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="snipit-clipboard", daemon=True)
+            self.thread.start()
+
+    def hold(self):
+        """Mark the clipboard as in use and remember the user's content once per burst"""
+        with self.condition:
+            self.active += 1
+            self.deadline = None
+            if self.saved is None:
+                started = latency.start()
+                try:
+                    self.saved = self.clipboard.paste()
+                except:
+                    self.saved = ""
+                latency.record("clipboard_save", started)
+
+    def copy(self, text):
+        """Put text on the clipboard for a paste"""
+        self.clipboard.copy(text)
+        with self.condition:
+            self.last_copied = text
+
+    def release(self):
+        """Mark the clipboard as free and arm the restore deadline"""
+        self.start()
+        with self.condition:
+            self.active = max(self.active - 1, 0)
+            if self.active == 0:
+                self.deadline = time.monotonic() + self.settle_delay
+                self.condition.notify()
+
+    def restore_now(self):
+        """Restore the saved clipboard immediately, e.g. before exiting"""
+        with self.condition:
+            self._restore()
+
+    def _restore(self):
+        # Called with the condition held
+        saved = self.saved
+        self.saved = None
+        self.deadline = None
+        if saved is None:
+            return
+        started = latency.start()
+        try:
+            # Do not overwrite something the user copied after our paste
+            if self.last_copied is None or self.clipboard.paste() == self.last_copied:
+                self.clipboard.copy(saved)
+        except:
+            pass
+        latency.record("clipboard_restore", started)
+        self.last_copied = None
+
+    def _run(self):
+        with self.condition:
+            while True:
+                try:
+                    if self.deadline is None or self.active:
+                        self.condition.wait()
+                        continue
+                    remaining = self.deadline - time.monotonic()
+                    if remaining > 0:
+                        self.condition.wait(remaining)
+                        continue
+                    self._restore()
+                except Exception as e:
+                    print(f"Error restoring clipboard: {e}")
+                    if self.debugging:
+                        traceback.print_exc()
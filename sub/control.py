@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Control socket for SnipIt
+Lets scripts manage a running SnipIt instance without touching the keyboard hook
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import socket
+import tempfile
+import threading
+import traceback
+
+from sub.ini_writer import Transaction
+
+# Unix domain sockets where the platform has them, a localhost TCP port
+# guarded by a token everywhere else (e.g. Windows)
+USE_UNIX_SOCKET = hasattr(socket, "AF_UNIX") and os.name != "nt"
+
+# Longest request line accepted, large enough for bulk snippet uploads
+MAX_REQUEST_BYTES = 16 * 1024 * 1024
+
+
+class ControlError(Exception):
+    """Raised by the client when a command fails or the instance cannot be reached"""
+
+
+def default_socket_path(directory):
+    """Return the control socket path for the SnipIt instance in directory"""
+    path = os.path.join(directory, "snipit.sock")
+    # Unix socket paths are limited to about 100 bytes
+    if USE_UNIX_SOCKET and len(path.encode('utf-8')) > 100:
+        digest = hashlib.sha1(os.path.abspath(directory).encode('utf-8')).hexdigest()[:12]
+        path = os.path.join(tempfile.gettempdir(), f"snipit-{digest}.sock")
+    return path
+
+
+def port_file_path(socket_path):
+    """Return the file that holds the TCP port and token when Unix sockets are not available"""
+    return socket_path + ".port"
+
+
+class ControlServer:
+    """
+    Serves control commands on an asyncio loop in a background thread
+
+    Each request is one line of JSON, {"command": name, ...arguments}, and is
+    answered with one line of JSON, {"ok": true, "result": ...} or
+    {"ok": false, "error": message}. Command handlers run in a worker thread
+    of the loop so slow ones (file writes, reloads) never stall the socket,
+    and nothing here runs on the keyboard hook thread.
+    """
+
+    def __init__(self, commands, path, debugging=False):
+        self.commands = commands
+        self.path = path
+        self.debugging = debugging
+        self.token = None
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.address = None
+
+    def start(self):
+        """Start serving; return False if another instance already owns the socket"""
+        if self.thread is not None:
+            return True
+        if USE_UNIX_SOCKET and not self._claim_socket():
+            return False
+        # asyncio is only needed once the server runs, not by the client
+        import asyncio
+        self.loop = asyncio.new_event_loop()
+        started = threading.Event()
+        errors = []
+
+        def run():
+            asyncio.set_event_loop(self.loop)
+            try:
+                self.loop.run_until_complete(self._listen())
+            except Exception as e:
+                errors.append(e)
+                started.set()
+                return
+            started.set()
+            self.loop.run_forever()
+            # Let open connections close before the loop goes away
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="snipit-control", daemon=True)
+        self.thread.start()
+        started.wait()
+        if errors:
+            self.thread = None
+            raise errors[0]
+        return True
+
+    def stop(self):
+        """Stop serving and remove the socket or port file"""
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self._shutdown)
+            self.thread.join(5.0)
+            self.thread = None
+        if self.address is None:
+            return
+        try:
+            os.remove(self.path if USE_UNIX_SOCKET else port_file_path(self.path))
+        except OSError:
+            pass
+        self.address = None
+
+    def _shutdown(self):
+        # Runs on the loop: refuse new connections, then end run_forever()
+        if self.server is not None:
+            self.server.close()
+        self.loop.stop()
+
+    def _claim_socket(self):
+        # A leftover socket from a crashed instance is removed; a live one
+        # means SnipIt is already running
+        if not os.path.exists(self.path):
+            return True
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+            return False
+        except OSError:
+            os.remove(self.path)
+            return True
+        finally:
+            probe.close()
+
+    async def _listen(self):
+        import asyncio
+        if USE_UNIX_SOCKET:
+            self.server = await asyncio.start_unix_server(self._handle, path=self.path, limit=MAX_REQUEST_BYTES)
+            os.chmod(self.path, 0o600)
+            self.address = self.path
+        else:
+            self.token = secrets.token_hex(16)
+            self.server = await asyncio.start_server(self._handle, host="127.0.0.1", port=0,
+                                                     limit=MAX_REQUEST_BYTES)
+            port = self.server.sockets[0].getsockname()[1]
+            self.address = f"127.0.0.1:{port}"
+            port_file = port_file_path(self.path)
+            fd = os.open(port_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"port": port, "token": self.token}, f)
+
+    async def _handle(self, reader, writer):
+        import asyncio
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self._dispatch(line)
+                writer.write(json.dumps(response).encode('utf-8') + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, line):
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("request must be a JSON object")
+        except ValueError as e:
+            return {"ok": False, "error": f"invalid request: {e}"}
+        if self.token is not None and request.pop("token", None) != self.token:
+            return {"ok": False, "error": "invalid token"}
+        name = request.pop("command", None)
+        handler = self.commands.get(name)
+        if handler is None:
+            return {"ok": False, "error": f"unknown command: {name}"}
+        try:
+            result = await self.loop.run_in_executor(None, lambda: handler(**request))
+        except Exception as e:
+            if self.debugging:
+                traceback.print_exc()
+            return {"ok": False, "error": str(e) or type(e).__name__}
+        return {"ok": True, "result": result}
+
+
+def send_command(path, command, timeout=5.0, **arguments):
+    """Send one command to the SnipIt instance listening at path and return its result"""
+    request = {"command": command, **arguments}
+    try:
+        if USE_UNIX_SOCKET:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                connection.settimeout(timeout)
+                connection.connect(path)
+            except OSError:
+                connection.close()
+                raise
+        else:
+            with open(port_file_path(path), 'r', encoding='utf-8') as f:
+                endpoint = json.load(f)
+            request["token"] = endpoint["token"]
+            connection = socket.create_connection(("127.0.0.1", endpoint["port"]), timeout=timeout)
+    except (OSError, ValueError, KeyError) as e:
+        raise ControlError(f"SnipIt is not running or cannot be reached at {path}: {e}")
+
+    with connection:
+        connection.sendall(json.dumps(request).encode('utf-8') + b"\n")
+        data = b""
+        while not data.endswith(b"\n"):
+            chunk = connection.recv(65536)
+            if not chunk:
+                break
+            data += chunk
+    try:
+        response = json.loads(data)
+    except ValueError:
+        raise ControlError("invalid response from SnipIt")
+    if not response.get("ok"):
+        raise ControlError(response.get("error", "command failed"))
+    return response.get("result")
+
+
+class RemoteTransaction(Transaction):
+    """
+    A batch of snippet edits for a running SnipIt instance
+
+    Has the same interface as IniTransaction for [Strings] edits. commit()
+    sends the updates and deletions over the control socket, where the
+    engine writes them to its storage and applies them to the live matcher.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def set(self, key, value, section="Strings"):
+        """Add or update key"""
+        if section != "Strings":
+            raise ValueError("only snippets can be edited through the control socket")
+        super().set(key, value, section)
+
+    def commit(self):
+        """
+        Send all recorded edits to the running instance
+
+        The edits are dropped even if the engine rejects them, so a bad edit
+        is not sent again with every later commit.
+        """
+        entries = self.changes.get("Strings", {})
+        self.changes = {}
+        updates = {key: value for key, value in entries.items() if value is not None}
+        removed = [key for key, value in entries.items() if value is None]
+        if removed:
+            send_command(self.path, "remove", keys=removed)
+        if updates:
+            send_command(self.path, "add", snippets=updates)
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Expansion worker for SnipIt
+Runs snippet expansions off the keyboard hook thread
+"""
+
+import queue
+import threading
+import time
+import traceback
+
+
+class ExpansionJob:
+    """
+    One pending snippet expansion
+
+    trailing collects the characters typed after the snippet matched but
+    before the worker started injecting. They reach the target window ahead
+    of the backspaces, so the worker deletes them together with the snippet
+    and types them again after the replacement. submitted is the
+    perf_counter() time of the match, for end-to-end latency. For a pattern
+    trigger, snippet is the matched text and pattern the PatternMatch.
+    """
+
+    __slots__ = ("snippet", "pattern", "trailing", "started", "cancelled", "submitted")
+
+    def __init__(self, snippet, pattern=None):
+        self.snippet = snippet
+        self.pattern = pattern
+        self.trailing = []
+        self.started = False
+        self.cancelled = False
+        self.submitted = time.perf_counter()
+
+
+class ExpansionWorker:
+    """
+    Single background thread that performs expansions in order
+
+    The keyboard hook only submits jobs and reports the keys typed while a
+    job is waiting; the handler does all clipboard and injection work. The
+    policy for keys typed while an expansion is in flight is:
+
+    - while a job is waiting, typed characters are recorded as its trailing
+      text and no new snippet is matched
+    - a backspace removes the last trailing character, or cancels the job if
+      there is none, since the user is then editing the snippet itself
+    - while the handler injects, key events are ignored because they are the
+      worker's own synthetic keystrokes
+    """
+
+    def __init__(self, handler, debugging=False):
+        self.handler = handler
+        self.debugging = debugging
+        self.jobs = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = None
+        self.injecting = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the worker thread once"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="snipit-expansion", daemon=True)
+            self.thread.start()
+
+    def submit(self, snippet, pattern=None):
+        """Queue an expansion for snippet and return its job"""
+        job = ExpansionJob(snippet, pattern)
+        with self.lock:
+            self.pending = job
+        self.jobs.put(job)
+        return job
+
+    def busy(self):
+        """Return True while a job is waiting or being injected"""
+        return self.pending is not None or self.injecting.is_set()
+
+    def note_key(self, char):
+        """Record a key typed while a job waits; return True if it was consumed"""
+        with self.lock:
+            job = self.pending
+            if job is None or job.started:
+                return False
+            job.trailing.append(char)
+            return True
+
+    def note_backspace(self):
+        """Apply a backspace to the waiting job; return True if it was consumed"""
+        with self.lock:
+            job = self.pending
+            if job is None or job.started:
+                return False
+            if job.trailing:
+                job.trailing.pop()
+            else:
+                job.cancelled = True
+                self.pending = None
+            return True
+
+    def begin(self, job):
+        """
+        Freeze a job's trailing text right before injecting
+
+        Called by the handler; returns the trailing characters, or None if the
+        job was cancelled in the meantime.
+        """
+        with self.lock:
+            if job.cancelled:
+                return None
+            job.started = True
+            self.injecting.set()
+            return "".join(job.trailing)
+
+    def _run(self):
+        while True:
+            job = self.jobs.get()
+            try:
+                if not job.cancelled:
+                    self.handler(job)
+            except Exception as e:
+                print(f"Error in expansion worker: {e}")
+                if self.debugging:
+                    traceback.print_exc()
+            finally:
+                with self.lock:
+                    if self.pending is job:
+                        self.pending = None
+                self.injecting.clear()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Include file cache for SnipIt
+Holds the files used by {file:...} tokens so repeated expansions do not read the disk
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class FileCache:
+    """
+    LRU cache of decoded text files, bounded by budget characters
+
+    A cached file is revalidated against its mtime and size at most once per
+    check_interval seconds, so a burst of expansions of the same template
+    costs neither a read nor a stat. Files larger than the budget are read
+    every time instead of evicting everything else. Relative paths are
+    resolved against base_dir, the directory of Input.ini.
+    """
+
+    def __init__(self, base_dir=".", budget=8 * 1024 * 1024, check_interval=1.0):
+        self.base_dir = base_dir
+        self.budget = budget
+        self.check_interval = check_interval
+        self.entries = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def resolve(self, path):
+        return os.path.normpath(os.path.join(self.base_dir, os.path.expanduser(path)))
+
+    def read(self, path):
+        """Return the text of the file at path; raises OSError if it cannot be read"""
+        full_path = self.resolve(path)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(full_path)
+            if entry is not None and now - entry[3] < self.check_interval:
+                self.entries.move_to_end(full_path)
+                return entry[2]
+
+        stat = os.stat(full_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            entry = self.entries.get(full_path)
+            if entry is not None and entry[:2] == signature:
+                self.entries[full_path] = (*signature, entry[2], now)
+                self.entries.move_to_end(full_path)
+                return entry[2]
+
+        text = self._load(full_path)
+        with self.lock:
+            old = self.entries.pop(full_path, None)
+            if old is not None:
+                self.size -= len(old[2])
+            if len(text) <= self.budget:
+                self.entries[full_path] = (*signature, text, now)
+                self.size += len(text)
+                while self.size > self.budget:
+                    _, evicted = self.entries.popitem(last=False)
+                    self.size -= len(evicted[2])
+        return text
+
+    @staticmethod
+    def _load(full_path):
+        # Read the bytes in one go and decode once; line endings are only
+        # rewritten (and the text copied) if the file has Windows ones
+        with open(full_path, 'rb') as f:
+            data = f.read()
+        text = data.decode('utf-8-sig')
+        del data
+        if "\r" in text:
+            text = text.replace("\r\n", "\n")
+        return text
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+# Shared instance used by compiled templates
+include_cache = FileCache()
@@ -5,204 +5,462 @@ GUI for SnipIt
 
 import os
 import sys
+import argparse
+import bisect
 import configparser
 import tkinter as tk
 from tkinter import messagebox, ttk
 import traceback
 
-def setup_gui(input_file, key_array):
-    """Setup the GUI for managing snippets"""
-    
-    # Initialize variables
-    key_list = []
-    value_list = []
-    key_value_list = []
-    
+from sub.control import ControlError, RemoteTransaction, send_command
+from sub.ini_writer import IniTransaction, check_snippet_body, check_snippet_key, normalize_body
+from sub.patterns import strip_patterns
+from sub.sqlite_store import SqliteSnippetStore
+
+# Milliseconds without further edits before pending edits are written
+WRITE_DELAY_MS = 500
+
+
+def display_text(key, value):
+    """Return the list entry for a snippet, shortening long replacements"""
+    # Limit the display length for very long replacements
+    display_value = value
+    if len(display_value) > 40:
+        display_value = display_value[:37] + "..."
+    display_value = display_value.replace("{n}", "↵")  # Show newlines with a symbol
+    return f"{key} => {display_value}"
+
+
+class SnippetModel:
+    """
+    Sorted snippet list with an incremental search filter
+
+    Each snippet has a lowercase search text built once. When the query is
+    extended, only the current matches are filtered again instead of the
+    whole library. Edits are applied in place with bisect, so the list never
+    has to be rebuilt.
+    """
+
+    def __init__(self, items):
+        self.query = ""
+        self.reset(items)
+
+    def reset(self, items):
+        """Replace all snippets, keeping the search filter"""
+        self.bodies = dict(items)
+        self.keys = sorted(self.bodies)
+        self.search_text = {key: f"{key}\0{body}".lower() for key, body in self.bodies.items()}
+        self.visible = [key for key in self.keys if self.matches(key)]
+
+    def __len__(self):
+        return len(self.visible)
+
+    def __getitem__(self, index):
+        return self.visible[index]
+
+    def matches(self, key):
+        return not self.query or self.query in self.search_text[key]
+
+    def filter(self, query):
+        """Show only the snippets whose key or replacement contains query"""
+        query = query.lower()
+        if query == self.query:
+            return
+        if self.query and query.startswith(self.query):
+            candidates = self.visible
+        else:
+            candidates = self.keys
+        self.query = query
+        self.visible = [key for key in candidates if self.matches(key)]
+
+    def set(self, key, body):
+        """Add or update a snippet"""
+        if key not in self.bodies:
+            bisect.insort(self.keys, key)
+        self.bodies[key] = body
+        self.search_text[key] = f"{key}\0{body}".lower()
+        index = bisect.bisect_left(self.visible, key)
+        present = index < len(self.visible) and self.visible[index] == key
+        if self.matches(key) and not present:
+            self.visible.insert(index, key)
+        elif present and not self.matches(key):
+            del self.visible[index]
+
+    def remove(self, key):
+        """Delete a snippet"""
+        if key not in self.bodies:
+            return
+        del self.bodies[key]
+        del self.search_text[key]
+        del self.keys[bisect.bisect_left(self.keys, key)]
+        index = bisect.bisect_left(self.visible, key)
+        if index < len(self.visible) and self.visible[index] == key:
+            del self.visible[index]
+
+
+class VirtualList:
+    """
+    Listbox that only holds the rows currently on screen
+
+    The scrollbar is driven by the model size rather than by the Listbox, so
+    opening or filtering a library of any size only renders one screen of
+    entries.
+    """
+
+    def __init__(self, parent, model, rows=12, width=50, font=None, on_select=None):
+        self.model = model
+        self.rows = rows
+        self.top = 0
+        self.selected_key = None
+        self.on_select = on_select
+
+        self.frame = tk.Frame(parent)
+        self.listbox = tk.Listbox(self.frame, width=width, height=rows, font=font, exportselection=False)
+        self.scrollbar = tk.Scrollbar(self.frame, orient="vertical", command=self._on_scroll)
+        self.listbox.pack(side="left", fill="both")
+        self.scrollbar.pack(side="right", fill="y")
+
+        self.listbox.bind('<<ListboxSelect>>', self._on_listbox_select)
+        self.listbox.bind('<MouseWheel>', self._on_wheel)
+        self.listbox.bind('<Button-4>', lambda event: self.scroll(-1))
+        self.listbox.bind('<Button-5>', lambda event: self.scroll(1))
+        self.listbox.bind('<Up>', lambda event: self.move_selection(-1))
+        self.listbox.bind('<Down>', lambda event: self.move_selection(1))
+        self.listbox.bind('<Prior>', lambda event: self.scroll(-self.rows))
+        self.listbox.bind('<Next>', lambda event: self.scroll(self.rows))
+
+    def grid(self, **kwargs):
+        self.frame.grid(**kwargs)
+
+    def refresh(self):
+        """Render the visible window of the model"""
+        total = len(self.model)
+        self.top = max(0, min(self.top, total - self.rows))
+        keys = self.model.visible[self.top:self.top + self.rows]
+        self.listbox.delete(0, tk.END)
+        for key in keys:
+            self.listbox.insert(tk.END, display_text(key, self.model.bodies[key]))
+        if self.selected_key in keys:
+            self.listbox.selection_set(keys.index(self.selected_key))
+        if total:
+            self.scrollbar.set(self.top / total, min(self.top + self.rows, total) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def scroll(self, rows):
+        self.top += rows
+        self.refresh()
+        return "break"
+
+    def show(self, key):
+        """Scroll so that key is on screen and select it"""
+        self.selected_key = key
+        try:
+            index = self.model.visible.index(key)
+        except ValueError:
+            self.refresh()
+            return
+        if not self.top <= index < self.top + self.rows:
+            self.top = index - self.rows // 2
+        self.refresh()
+
+    def move_selection(self, step):
+        visible = self.model.visible
+        if not visible:
+            return "break"
+        try:
+            index = visible.index(self.selected_key) + step
+        except ValueError:
+            index = self.top
+        index = max(0, min(index, len(visible) - 1))
+        self.show(visible[index])
+        if self.on_select:
+            self.on_select(visible[index])
+        return "break"
+
+    def _on_scroll(self, *args):
+        total = len(self.model)
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * total)
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            self.top += amount * (self.rows if args[2] == "pages" else 1)
+        self.refresh()
+
+    def _on_wheel(self, event):
+        return self.scroll(-1 if event.delta > 0 else 1)
+
+    def _on_listbox_select(self, event):
+        selection = self.listbox.curselection()
+        if not selection:
+            return
+        index = self.top + selection[0]
+        if index < len(self.model):
+            self.selected_key = self.model[index]
+            if self.on_select:
+                self.on_select(self.selected_key)
+
+
+def load_ini_snippets(input_file):
+    """Return the [Strings] items of the ini file, creating the file or section if needed"""
+    # Read the current snippets from the ini file - disable interpolation
+    config = configparser.ConfigParser(interpolation=None)
+
+    # Check if the file exists
+    if not os.path.exists(input_file):
+        with IniTransaction(input_file) as transaction:
+            transaction.ensure_section("Strings")
+            transaction.set_setting("SoundSetting", 0)
+
+    # Read the file with utf-8 encoding
+    with open(input_file, 'r', encoding='utf-8') as f:
+        config.read_string(strip_patterns(f.read()), input_file)
+
+    # Check if required sections exist
+    if "Strings" not in config:
+        config["Strings"] = {}
+        with IniTransaction(input_file) as transaction:
+            transaction.ensure_section("Strings")
+
+    return config["Strings"].items()
+
+
+def engine_running(socket_path):
+    """Return True if a SnipIt instance answers on socket_path"""
+    if not socket_path:
+        return False
     try:
-        # Read the current snippets from the ini file - disable interpolation
-        config = configparser.ConfigParser(interpolation=None)
-        
-        # Check if the file exists
-        if not os.path.exists(input_file):
-            config["Strings"] = {}
-            config["Settings"] = {"SoundSetting": "0"}
-            with open(input_file, 'w', encoding='utf-8') as f:
-                config.write(f)
-                
-        # Read the file with utf-8 encoding
-        with open(input_file, 'r', encoding='utf-8') as f:
-            config.read_file(f)
-        
-        # Check if required sections exist
-        if "Strings" not in config:
-            config["Strings"] = {}
-            with open(input_file, 'w', encoding='utf-8') as f:
-                config.write(f)
-                
-        # Generate the lists for the GUI
-        for key in config["Strings"]:
-            key_list.append(key)
-            value_list.append(config["Strings"][key])
-            # Limit the display length for very long replacements
-            display_value = config["Strings"][key]
-            if len(display_value) > 40:
-                display_value = display_value[:37] + "..."
-            display_value = display_value.replace("{n}", "↵")  # Show newlines with a symbol
-            key_value_list.append(f"{key} => {display_value}")
-        
+        send_command(socket_path, "ping", timeout=1.0)
+        return True
+    except ControlError:
+        return False
+
+
+def setup_gui(input_file, key_array, database_file=None, socket_path=None):
+    """
+    Setup the GUI for managing snippets, stored in input_file or in an SQLite database
+
+    If a SnipIt instance answers on socket_path, edits are sent to it and take
+    effect at once; otherwise they are written to the storage directly.
+    """
+
+    try:
+        # Build the indexed model for the GUI
+        store = SqliteSnippetStore(database_file) if database_file else None
+
+        def read_snippets():
+            return store.items() if store is not None else load_ini_snippets(input_file)
+
+        model = SnippetModel(read_snippets())
+
+        # Edits are collected in a transaction, sent to the running engine
+        # right away or written to the same storage after a short pause
+        remote = engine_running(socket_path)
+        if remote:
+            pending = RemoteTransaction(socket_path)
+            write_delay = 0
+        else:
+            pending = store.transaction() if database_file else IniTransaction(input_file)
+            write_delay = WRITE_DELAY_MS
+
         # Create the GUI
         root = tk.Tk()
         root.title("SnipIt: Snippets & Replacements")
         root.resizable(False, False)
-        
+
         # Set font
         font_style = ("Verdana", 8)
-        
+
         # Add elements to the GUI
-        tk.Label(root, text="Snippets => Replacements", font=font_style).grid(row=0, column=0, padx=20, pady=20, sticky="w")
-        
-        # Create listbox with scrollbar for snippets
-        frame = tk.Frame(root)
-        frame.grid(row=1, column=0, padx=20, sticky="w")
-        
-        listbox = tk.Listbox(frame, width=50, height=12, font=font_style)
-        scrollbar = tk.Scrollbar(frame, orient="vertical")
-        listbox.config(yscrollcommand=scrollbar.set)
-        scrollbar.config(command=listbox.yview)
-        
-        listbox.pack(side="left", fill="both")
-        scrollbar.pack(side="right", fill="y")
-        
-        # Add items to the listbox
-        for item in key_value_list:
-            listbox.insert(tk.END, item)
-        
+        header_frame = tk.Frame(root)
+        header_frame.grid(row=0, column=0, padx=20, pady=(20, 5), sticky="we")
+        tk.Label(header_frame, text="Snippets => Replacements", font=font_style).pack(side="left")
+        count_label = tk.Label(header_frame, font=("Verdana", 7))
+        count_label.pack(side="right")
+
+        # Incremental search over keys and replacements
+        search_var = tk.StringVar()
+        search_frame = tk.Frame(root)
+        search_frame.grid(row=1, column=0, padx=20, pady=(0, 5), sticky="we")
+        tk.Label(search_frame, text="Search:", font=font_style).pack(side="left")
+        search_entry = tk.Entry(search_frame, textvariable=search_var, font=font_style)
+        search_entry.pack(side="left", fill="x", expand=True, padx=(5, 0))
+
         # Create input fields and buttons
         input_frame = tk.Frame(root)
-        input_frame.grid(row=0, column=1, rowspan=2, padx=10, sticky="n")
-        
+        input_frame.grid(row=0, column=1, rowspan=3, padx=10, sticky="n")
+
         tk.Label(input_frame, text="Enter snippet (max. 10):", font=font_style).pack(anchor="w", pady=(20, 5))
         snippet_entry = tk.Entry(input_frame, width=20, font=font_style)
         snippet_entry.pack(anchor="w")
-        
+
         tk.Label(input_frame, text="Enter replacement:", font=font_style).pack(anchor="w", pady=(5, 5))
         replacement_entry = tk.Entry(input_frame, width=20, font=font_style)
         replacement_entry.pack(anchor="w")
-        
+
+        # When an item is selected in the list, populate the entry fields
+        def on_select(key):
+            try:
+                snippet_entry.delete(0, tk.END)
+                snippet_entry.insert(0, key)
+
+                replacement_entry.delete(0, tk.END)
+                replacement_entry.insert(0, model.bodies[key])
+            except Exception as e:
+                print(f"Error in on_select: {e}")
+
+        # Create the virtualized list of snippets; only visible rows are rendered
+        snippet_list = VirtualList(root, model, rows=12, width=50, font=font_style, on_select=on_select)
+        snippet_list.grid(row=2, column=0, padx=20, sticky="w")
+
+        def refresh_view():
+            snippet_list.refresh()
+            if model.query:
+                count_label.config(text=f"{len(model)} of {len(model.keys)}")
+            else:
+                count_label.config(text=f"{len(model.keys)} snippets")
+
+        def on_search(*args):
+            model.filter(search_var.get())
+            snippet_list.top = 0
+            refresh_view()
+
+        search_var.trace_add("write", on_search)
+
         # Help text for special codes
         help_frame = tk.Frame(root)
-        help_frame.grid(row=2, column=0, columnspan=2, padx=20, pady=(10, 0), sticky="w")
-        
+        help_frame.grid(row=3, column=0, columnspan=2, padx=20, pady=(10, 0), sticky="w")
+
         help_text = """Special codes:
 - Date: %dd (day), %MM (month), %yyyy (year)
 - Time: %HH (hour), %mm (mins), %ss (secs)
 - {n} inserts a newline"""
-        
+
         tk.Label(help_frame, text=help_text, font=("Verdana", 7), justify="left").pack(anchor="w")
-        
+
+        # Edits are written together once the user pauses, so a burst of
+        # edits costs a single rewrite. The list only shows an edit once it
+        # has been saved (or accepted by the running engine)
+        write_job = [None]
+        show_key = [None]
+
+        def write_pending():
+            write_job[0] = None
+            edits = dict(pending.changes.get("Strings", {}))
+            try:
+                pending.commit()
+            except Exception as e:
+                # Drop the failed edits so later saves do not send them
+                # again, and show what the storage actually holds
+                pending.discard()
+                messagebox.showerror("Error", f"Error saving snippets: {e}")
+                try:
+                    model.reset(read_snippets())
+                except Exception as reload_error:
+                    print(f"Error reloading snippets: {reload_error}")
+                refresh_view()
+                return
+            for key, body in edits.items():
+                if body is None:
+                    model.remove(key)
+                else:
+                    model.set(key, normalize_body(body))
+            if show_key[0] in model.bodies:
+                snippet_list.show(show_key[0])
+            show_key[0] = None
+            refresh_view()
+
+        def schedule_write():
+            if write_job[0] is not None:
+                root.after_cancel(write_job[0])
+            write_job[0] = root.after(write_delay, write_pending)
+
+        def flush_pending():
+            if write_job[0] is not None:
+                root.after_cancel(write_job[0])
+                write_pending()
+
         # Button actions
         def add_snippet():
             try:
                 snippet = snippet_entry.get().strip()
                 replacement = replacement_entry.get()
-                
+
                 if not snippet:
                     messagebox.showinfo("Info", "Enter a snippet first!")
                     return
-                
+
                 if not replacement:
                     messagebox.showinfo("Info", "Enter a replacement string first!")
                     return
-                
-                if len(snippet) > 10:
-                    messagebox.showinfo("Info", "Snippet length should not exceed 10 characters!")
+
+                # The same rules as the engine, so no edit is rejected later
+                try:
+                    check_snippet_key(snippet)
+                    check_snippet_body(snippet, replacement)
+                except ValueError as e:
+                    messagebox.showinfo("Info", str(e))
                     return
-                
-                # Write to the ini file
-                config = configparser.ConfigParser(interpolation=None)
-                with open(input_file, 'r', encoding='utf-8') as f:
-                    config.read_file(f)
-                
-                # Ensure the Strings section exists
-                if "Strings" not in config:
-                    config["Strings"] = {}
-                
-                config["Strings"][snippet] = replacement
-                
-                with open(input_file, 'w', encoding='utf-8') as f:
-                    config.write(f)
-                
-                # Restart the GUI to refresh the list
-                root.destroy()
-                setup_gui(input_file, key_array)
+
+                # Queue the edit; configparser stores keys in lowercase. The
+                # list is updated once the edit is saved
+                key = snippet.lower()
+                pending.set(key, replacement)
+                show_key[0] = key
+                schedule_write()
             except Exception as e:
                 messagebox.showerror("Error", f"Error adding snippet: {e}")
-        
+
         def delete_snippet():
             try:
-                selection = listbox.curselection()
-                if selection:
-                    index = selection[0]
-                    if index < len(key_list):
-                        key = key_list[index]
-                        
-                        # Delete from the ini file
-                        config = configparser.ConfigParser(interpolation=None)
-                        with open(input_file, 'r', encoding='utf-8') as f:
-                            config.read_file(f)
-                        
-                        if "Strings" in config and key in config["Strings"]:
-                            config.remove_option("Strings", key)
-                            
-                            with open(input_file, 'w', encoding='utf-8') as f:
-                                config.write(f)
-                        
-                        # Restart the GUI to refresh the list
-                        root.destroy()
-                        setup_gui(input_file, key_array)
+                key = snippet_list.selected_key
+                if key is not None and key in model.bodies:
+                    # Queue the deletion; the list is updated once it is saved
+                    pending.remove(key)
+                    snippet_list.selected_key = None
+                    schedule_write()
             except Exception as e:
                 messagebox.showerror("Error", f"Error deleting snippet: {e}")
-        
+
         def continue_action():
+            flush_pending()
+            if remote and focused[0]:
+                try:
+                    send_command(socket_path, "gui-focus", focused=False)
+                except ControlError:
+                    pass
             root.destroy()
-        
+
         def stop_action():
+            flush_pending()
+            if remote:
+                # The engine runs in another process; ask it to shut down
+                try:
+                    send_command(socket_path, "quit")
+                except ControlError:
+                    pass
             try:
                 if os.path.exists(os.path.join(os.path.dirname(input_file), "List.txt")):
                     os.remove(os.path.join(os.path.dirname(input_file), "List.txt"))
             except:
                 pass  # Ignore if file can't be deleted
-                
+
             messagebox.showinfo("Info", "SnipIt is turning off now.")
             root.destroy()
             os._exit(0)  # Force exit to kill all threads
-        
-        # When an item is selected in the listbox, populate the entry fields
-        def on_select(event):
-            try:
-                selection = listbox.curselection()
-                if selection:
-                    index = selection[0]
-                    if index < len(key_list):
-                        snippet_entry.delete(0, tk.END)
-                        snippet_entry.insert(0, key_list[index])
-                        
-                        replacement_entry.delete(0, tk.END)
-                        replacement_entry.insert(0, value_list[index])
-            except Exception as e:
-                print(f"Error in on_select: {e}")
-        
-        listbox.bind('<<ListboxSelect>>', on_select)
-        
+
         # Create buttons
         tk.Button(input_frame, text="Add/Update", width=20, command=add_snippet, font=font_style).pack(anchor="w", pady=(5, 5))
         tk.Button(input_frame, text="Delete", width=20, command=delete_snippet, font=font_style).pack(anchor="w", pady=(5, 5))
         tk.Button(input_frame, text="Continue", width=20, command=continue_action, font=font_style).pack(anchor="w", pady=(5, 5))
         tk.Button(input_frame, text="Stop", width=20, command=stop_action, font=font_style).pack(anchor="w", pady=(5, 5))
-        
+
         # Copyright notice
         tk.Label(input_frame, text="(Python port of J. Seif's 2017 AHK script)", font=("Verdana", 7)).pack(anchor="w", pady=(15, 5))
-        
+
+        # Render the first screen of snippets
+        refresh_view()
+
         # Position the window in the center of the screen
         root.update_idletasks()
         width = root.winfo_width()
@@ -210,23 +468,46 @@ def setup_gui(input_file, key_array):
         x = (root.winfo_screenwidth() // 2) - (width // 2)
         y = (root.winfo_screenheight() // 2) - (height // 2)
         root.geometry('{}x{}+{}+{}'.format(width, height, x, y))
-        
+
         # Remove the window decorator options
         try:
             root.attributes('-toolwindow', True)
         except:
             pass  # Not all platforms support this
-        
+
+        # Tell the engine while this window has the keyboard focus, so that
+        # snippets typed into the entry fields are not expanded
+        focused = [False]
+
+        def update_focus():
+            try:
+                state = root.focus_get() is not None
+            except (KeyError, tk.TclError):
+                state = False
+            if state != focused[0]:
+                focused[0] = state
+                try:
+                    send_command(socket_path, "gui-focus", focused=state)
+                except ControlError:
+                    pass
+
+        if remote:
+            root.bind("<FocusIn>", lambda event: root.after_idle(update_focus))
+            root.bind("<FocusOut>", lambda event: root.after_idle(update_focus))
+
+        # Closing the window keeps the edits as well
+        root.protocol("WM_DELETE_WINDOW", continue_action)
+
         # Set the continue button as default
         root.bind('<Return>', lambda event: continue_action())
-        
+
         # Start the GUI main loop
         root.mainloop()
-    
+
     except Exception as e:
         print(f"Error in GUI setup: {e}")
         traceback.print_exc()
-        
+
         # Create a simple error dialog
         try:
             error_root = tk.Tk()
@@ -235,4 +516,18 @@ def setup_gui(input_file, key_array):
             tk.Button(error_root, text="OK", command=error_root.destroy).pack(pady=10)
             error_root.mainloop()
         except:
-            pass  # If even the error dialog fails, just continue
\ No newline at end of file
+            pass  # If even the error dialog fails, just continue
+
+
+def main(argv=None):
+    """Run the GUI as its own process, as started by SnipIt's Ctrl+Shift+S"""
+    parser = argparse.ArgumentParser(description="SnipIt snippet manager")
+    parser.add_argument("--input", required=True, help="path of Input.ini")
+    parser.add_argument("--db", help="SQLite database used instead of Input.ini")
+    parser.add_argument("--socket", help="control socket of the running SnipIt instance")
+    args = parser.parse_args(argv)
+    setup_gui(args.input, [], args.db, args.socket)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Input.ini watcher for SnipIt
+Calls back when the snippet file changes on disk
+"""
+
+import os
+import select
+import struct
+import threading
+import traceback
+
+from sub.snippet_store import file_signature
+
+# inotify flags, see <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0x00000800
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+class IniWatcher:
+    """
+    Watches one file and calls on_change() when it changes
+
+    On Linux the containing directory is watched with inotify, which also
+    catches editors that save by writing a new file and renaming it over the
+    old one. Everywhere else, or if inotify is not available, the file's
+    mtime and size are polled every poll_interval seconds. Either way the
+    callback only runs when the file signature really changed and then
+    stayed the same for settle_delay seconds, so a file that is still being
+    written is not loaded half-way.
+
+    A signature function can be passed to watch something other than the
+    file's mtime and size, such as the change counter of a database; it is
+    always polled.
+    """
+
+    def __init__(self, path, on_change, poll_interval=1.0, settle_delay=0.1, debugging=False, signature=None):
+        self.path = os.path.abspath(path)
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.settle_delay = settle_delay
+        self.debugging = debugging
+        self.read_signature = signature
+        self.signature = self._signature()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.mode = None
+
+    def start(self):
+        """Start watching in a background thread"""
+        if self.thread is not None:
+            return
+        inotify_fd = self._open_inotify() if self.read_signature is None else None
+        if inotify_fd is not None:
+            self.mode = "inotify"
+            target = lambda: self._watch_inotify(inotify_fd)
+        else:
+            self.mode = "poll"
+            target = self._watch_poll
+        self.thread = threading.Thread(target=target, name="snipit-ini-watcher", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def _signature(self):
+        if self.read_signature is None:
+            return file_signature(self.path)
+        try:
+            return self.read_signature()
+        except Exception:
+            return None
+
+    def check(self):
+        """Call on_change() if the file signature differs from the last one seen"""
+        signature = self._signature()
+        if signature == self.signature:
+            return False
+        # Wait until the writer is done with the file
+        while not self.stop_event.wait(self.settle_delay):
+            settled = self._signature()
+            if settled == signature:
+                break
+            signature = settled
+        self.signature = signature
+        try:
+            self.on_change()
+        except Exception as e:
+            print(f"Error reloading {os.path.basename(self.path)}: {e}")
+            if self.debugging:
+                traceback.print_exc()
+        return True
+
+    def _watch_poll(self):
+        while not self.stop_event.wait(self.poll_interval):
+            self.check()
+
+    def _open_inotify(self):
+        if not hasattr(os, "uname") or os.uname().sysname != "Linux":
+            return None
+        try:
+            # The symbols of the running process include libc; find_library()
+            # would start ldconfig in a subprocess
+            import ctypes
+            libc = ctypes.CDLL(None, use_errno=True)
+            fd = libc.inotify_init1(IN_NONBLOCK)
+            if fd < 0:
+                return None
+            directory = os.path.dirname(self.path).encode()
+            mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+            if libc.inotify_add_watch(fd, directory, mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except (OSError, AttributeError):
+            return None
+
+    def _watch_inotify(self, fd):
+        name = os.path.basename(self.path).encode()
+        try:
+            while not self.stop_event.is_set():
+                # Wake up regularly so stop() and missed events are handled
+                ready, _, _ = select.select([fd], [], [], self.poll_interval)
+                if not ready:
+                    self.check()
+                    continue
+                try:
+                    data = os.read(fd, 4096)
+                except BlockingIOError:
+                    continue
+                touched = False
+                offset = 0
+                while offset + _EVENT_HEADER.size <= len(data):
+                    _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                    offset += _EVENT_HEADER.size
+                    if data[offset:offset + length].rstrip(b"\0") == name:
+                        touched = True
+                    offset += length
+                if touched:
+                    self.check()
+        finally:
+            os.close(fd)
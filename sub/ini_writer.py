@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Input.ini writer for SnipIt
+Applies batches of edits to the snippet file with a single atomic rewrite
+"""
+
+import os
+import threading
+
+from sub.snippet_store import file_signature
+
+# Serializes writers within the process so two transactions never interleave
+_write_lock = threading.Lock()
+
+
+def _option_key(key):
+    """Normalize a key the way configparser does (stripped and lowercased)"""
+    return key.strip().lower()
+
+
+def _split_option(line):
+    """Return (key, separator index) for an option line, or None"""
+    separators = [i for i in (line.find("="), line.find(":")) if i >= 0]
+    if not separators:
+        return None
+    separator = min(separators)
+    return _option_key(line[:separator]), separator
+
+
+# Longest snippet key, as in the original settings GUI
+MAX_KEY_LENGTH = 10
+
+
+def check_snippet_key(key):
+    """Raise ValueError if key cannot be written to Input.ini as a single [Strings] option"""
+    if not isinstance(key, str) or not key or len(key) > MAX_KEY_LENGTH:
+        raise ValueError(f"invalid snippet {key!r}: keys must be 1 to {MAX_KEY_LENGTH} characters")
+    # configparser strips the key and '=' or ':' end it; tabs and line
+    # breaks would split the line, and a leading '[' or comment character
+    # would turn it into a section or a comment. Inner spaces are fine.
+    if (key != key.strip() or any(char in "=:\t\r\n" for char in key) or key[0] in "[#;"):
+        raise ValueError(f"invalid snippet {key!r}: keys cannot contain '=', ':', tabs or line breaks, "
+                         "start or end with whitespace, or start with '[', '#' or ';'")
+
+
+def check_snippet_body(key, body):
+    """Raise ValueError if body is not a usable replacement for key"""
+    if not isinstance(body, str) or not body.strip():
+        raise ValueError(f"snippet {key!r} needs a replacement")
+
+
+def normalize_body(body):
+    """Return body with \r\n and lone \r line breaks turned into \n, as readers of Input.ini see them"""
+    return body.replace("\r\n", "\n").replace("\r", "\n")
+
+
+def _format_value(value, newline):
+    # Multi-line values are written as indented continuation lines, as
+    # configparser does; a lone \r is a line break to text-mode readers too
+    return normalize_body(str(value)).replace("\n", newline + "\t")
+
+
+def split_lines(text):
+    """
+    Split text after each \n, keeping the line endings
+
+    Unlike str.splitlines(), characters such as U+2028 or \x0c inside a
+    value do not end the line, since configparser does not treat them as
+    line breaks either.
+    """
+    lines = text.split("\n")
+    last = lines.pop()
+    lines = [line + "\n" for line in lines]
+    if last:
+        lines.append(last)
+    return lines
+
+
+def apply_edits(lines, changes, newline="\n"):
+    """
+    Return lines with changes applied
+
+    changes maps a section name to {key: value}, where a value of None
+    deletes the key. Edited options keep their original key spelling and
+    spacing, new options are appended to the end of their section and
+    missing sections are appended to the end of the file. Everything else,
+    including comments and the order of the file, is copied unchanged.
+    """
+    pending = {section: dict(entries) for section, entries in changes.items()}
+    output = []
+    section = None
+    skipping = False
+    held_blanks = []
+
+    def ensure_newline():
+        if output and not output[-1].endswith(("\n", "\r")):
+            output[-1] += newline
+
+    def close_section():
+        # Append the options that did not exist yet before the blank lines
+        # that separate this section from the next one
+        additions = pending.pop(section, None) if section is not None else None
+        if not additions:
+            return
+        trailing = []
+        while output and not output[-1].strip():
+            trailing.insert(0, output.pop())
+        ensure_newline()
+        for key, value in additions.items():
+            if value is not None:
+                output.append(f"{key} = {_format_value(value, newline)}{newline}")
+        output.extend(trailing)
+
+    for line in lines:
+        content = line.rstrip("\r\n")
+        stripped = content.strip()
+
+        if skipping:
+            # Drop the continuation lines of a replaced or deleted option;
+            # blank lines only belong to it if another continuation follows
+            if not stripped:
+                held_blanks.append(line)
+                continue
+            if content[:1] in (" ", "\t") and stripped[:1] not in ("#", ";"):
+                held_blanks = []
+                continue
+            skipping = False
+            output.extend(held_blanks)
+            held_blanks = []
+
+        if stripped.startswith("[") and stripped.endswith("]"):
+            close_section()
+            section = stripped[1:-1]
+            output.append(line)
+            continue
+
+        if (section in pending and stripped and stripped[:1] not in ("#", ";")
+                and content[:1] not in (" ", "\t")):
+            option = _split_option(content)
+            if option is not None and option[0] in pending[section]:
+                key, separator = option
+                value = pending[section].pop(key)
+                skipping = True
+                if value is not None:
+                    rest = content[separator + 1:]
+                    if rest.strip():
+                        spacing = rest[:len(rest) - len(rest.lstrip())]
+                    else:
+                        spacing = " " if content[separator - 1:separator] == " " else ""
+                    output.append(f"{content[:separator + 1]}{spacing}{_format_value(value, newline)}{newline}")
+                continue
+
+        output.append(line)
+
+    output.extend(held_blanks)
+    close_section()
+
+    # Sections that do not exist yet
+    for name, additions in pending.items():
+        ensure_newline()
+        if output and output[-1].strip():
+            output.append(newline)
+        output.append(f"[{name}]{newline}")
+        for key, value in additions.items():
+            if value is not None:
+                output.append(f"{key} = {_format_value(value, newline)}{newline}")
+    return output
+
+
+def write_atomic(path, data):
+    """
+    Replace path with data without ever leaving a partial file behind
+
+    The data is written and flushed to a temporary file in the same
+    directory, which is then renamed over the target.
+    """
+    import shutil
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".snipit-ini-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            shutil.copymode(path, tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class Transaction:
+    """
+    A batch of edits to the snippets and settings
+
+    set(), remove() and set_setting() only record the edit in changes, as
+    {section: {key: value}} with None for a deletion, and commit() applies
+    them all at once. Used as a context manager the transaction commits
+    when the block succeeds and is discarded when it raises. Subclasses
+    implement commit() for their storage.
+    """
+
+    def __init__(self):
+        self.changes = {}
+
+    def set(self, key, value, section="Strings"):
+        """Add or update key in section"""
+        self.changes.setdefault(section, {})[_option_key(key)] = value
+
+    def remove(self, key, section="Strings"):
+        """Delete key from section"""
+        self.set(key, None, section)
+
+    def set_setting(self, name, value):
+        self.set(name, str(value), "Settings")
+
+    def ensure_section(self, section):
+        """Create section if the storage does not have it"""
+        self.changes.setdefault(section, {})
+
+    def discard(self):
+        self.changes = {}
+
+    def __len__(self):
+        return sum(len(entries) for entries in self.changes.values())
+
+    def __bool__(self):
+        return bool(self.changes)
+
+    def commit(self):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.discard()
+        return False
+
+
+class IniTransaction(Transaction):
+    """
+    A batch of edits to Input.ini that is written in one go
+
+    commit() reads the file once, applies every edit line by line, without
+    parsing or re-serializing the rest of the file, and moves the result
+    into place atomically.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+
+    def commit(self):
+        """Write all recorded edits and return the new file signature"""
+        if not self.changes:
+            return file_signature(self.path)
+        with _write_lock:
+            try:
+                with open(self.path, 'r', encoding='utf-8', newline='') as f:
+                    text = f.read()
+            except FileNotFoundError:
+                text = ""
+            newline = "\r\n" if "\r\n" in text else "\n"
+            lines = apply_edits(split_lines(text), self.changes, newline)
+            write_atomic(self.path, "".join(lines).encode('utf-8'))
+            signature = file_signature(self.path)
+        self.changes = {}
+        return signature
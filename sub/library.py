@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Snippet library API for SnipIt
+Matches and expands snippets in text without the keyboard hook or the clipboard
+
+    from sub.library import SnippetLibrary
+    library = SnippetLibrary.from_ini("Input.ini")
+    report = library.expand_text("Status on ddate: done.")
+
+Nothing here imports keyboard or pyperclip, so the same library can be run
+over documents, e.g. by `python snipit.py expand`.
+"""
+
+import argparse
+import codecs
+import os
+import re
+import sys
+import time
+
+from sub.file_cache import FileCache
+from sub.matcher import SnippetMatcher
+from sub.patterns import PatternMatch, PatternMatcher, PATTERN_WINDOW, scan_patterns, strip_patterns
+from sub.snippet_store import SnippetStore
+
+# Smallest keystroke buffer of the live engine, in characters
+MIN_WINDOW = 16
+
+# Bytes read from an input at a time by expand_stream()
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+
+
+def find_trigger(matcher, pattern_matcher, tail):
+    """
+    Return the snippet key or the PatternMatch that ends tail, or None
+
+    [Strings] snippets take precedence: the patterns are only tried when no
+    snippet ends tail. tail is a str or the keystroke RingBuffer.
+    """
+    snippet = matcher.match(tail)
+    if snippet is None and pattern_matcher:
+        snippet = pattern_matcher.match(str(tail))
+    return snippet
+
+
+class SnippetLibrary:
+    """
+    A loaded snippet library: the store, the snippet trie and the pattern triggers
+
+    store is any SnipIt snippet store (in-memory, lazy or SQLite). window is
+    how far back a trigger can reach, the same as the live keystroke buffer.
+    {file:...} paths are relative to base_dir and read through the library's
+    own cache, so loading a library never changes where the live engine
+    finds its included files.
+    """
+
+    def __init__(self, store, patterns=None, base_dir="."):
+        self.store = store
+        self.files = FileCache(base_dir)
+        self.matcher = SnippetMatcher(store.keys())
+        self.patterns = PatternMatcher(patterns)
+        self.window = max(2 * self.matcher.max_len, MIN_WINDOW, PATTERN_WINDOW if self.patterns else 0)
+
+    @classmethod
+    def from_ini(cls, path):
+        """Load the [Strings] and [Patterns] sections of an INI file"""
+        import configparser
+        with open(path, 'rb') as f:
+            data = f.read()
+        config = configparser.ConfigParser(interpolation=None)
+        config.read_string(strip_patterns(data.decode('utf-8').replace('\r\n', '\n')))
+        store = SnippetStore(path)
+        store.load(config["Strings"] if "Strings" in config else {})
+        # {file:...} paths are relative to the INI file, as in the live engine
+        return cls(store, scan_patterns(data), os.path.dirname(os.path.abspath(path)))
+
+    @classmethod
+    def from_database(cls, path, ini_path=None):
+        """Load the snippets of an SQLite database and the [Patterns] of ini_path, if it exists"""
+        from sub.sqlite_store import SqliteSnippetStore
+        # Opening a missing database would create an empty one
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No such database: {path}")
+        store = SqliteSnippetStore(path)
+        store.load()
+        patterns = None
+        if ini_path and os.path.exists(ini_path):
+            with open(ini_path, 'rb') as f:
+                patterns = scan_patterns(f.read())
+        return cls(store, patterns, os.path.dirname(os.path.abspath(ini_path or path)))
+
+    def match(self, tail):
+        """Return the snippet key or PatternMatch that ends tail and would expand, or None"""
+        trigger = find_trigger(self.matcher, self.patterns, tail)
+        if isinstance(trigger, PatternMatch) or (trigger and self.store.has_body(trigger)):
+            return trigger
+        return None
+
+    def expand(self, trigger, now=None):
+        """Return the replacement for a snippet key or PatternMatch, or None"""
+        if isinstance(trigger, PatternMatch):
+            return trigger.expand(now, self.files)
+        template = self.store.get_template(trigger)
+        return template.expand(now, files=self.files) if template is not None else None
+
+    def expand_text(self, text, now=None):
+        """Return text with every snippet in it expanded"""
+        expander = Expander(self, now)
+        return expander.feed(text) + expander.close()
+
+
+class Expander:
+    """
+    Expands the snippets in a stream of text as if it were typed
+
+    Text can be fed in chunks of any size. A snippet expands as soon as its
+    last character is seen, exactly as in the live engine: the longest
+    snippet ending there wins, patterns come after snippets, and matching
+    starts afresh after each expansion. Only the characters a later match
+    could still reach back to are held between chunks, so memory does not
+    grow with the input. count is the number of expansions so far.
+    """
+
+    def __init__(self, library, now=None):
+        self.library = library
+        self.now = now
+        self.pending = ""
+        self.scanned = 0
+        self.count = 0
+        if library.patterns:
+            self.lookback = library.window
+            self.candidates = None
+        else:
+            # Without patterns only the characters that end a snippet need a lookup
+            self.lookback = max(library.matcher.max_len, 1)
+            ends = "".join(re.escape(char) for char in sorted(library.matcher.root))
+            self.candidates = re.compile(f"[{ends}]") if ends else re.compile(r"(?!)")
+
+    def feed(self, chunk):
+        """Return the part of the expanded output that chunk completes"""
+        text = self.pending + chunk if self.pending else chunk
+        lookback = self.lookback
+        library = self.library
+        output = []
+        start = 0  # characters before start are final
+        if self.candidates is not None:
+            positions = (found.start() for found in self.candidates.finditer(text, self.scanned))
+        else:
+            positions = range(self.scanned, len(text))
+        for position in positions:
+            end = position + 1
+            trigger = library.match(text[max(start, end - lookback):end])
+            if trigger is None:
+                continue
+            replacement = library.expand(trigger, self.now)
+            if replacement is None:
+                continue
+            matched = len(trigger.text) if isinstance(trigger, PatternMatch) else len(trigger)
+            output.append(text[start:end - matched])
+            output.append(replacement)
+            start = end
+            self.count += 1
+        keep = max(start, len(text) - lookback + 1)
+        output.append(text[start:keep])
+        self.pending = text[keep:]
+        self.scanned = len(self.pending)
+        return "".join(output)
+
+    def close(self):
+        """Return the held back text once the input has ended"""
+        text = self.pending
+        self.pending = ""
+        self.scanned = 0
+        return text
+
+
+def expand_stream(library, source, target, chunk_size=DEFAULT_CHUNK_SIZE, now=None):
+    """
+    Expand UTF-8 text from the binary file source into the binary file target
+
+    The input is read chunk_size bytes at a time. Bytes that are not valid
+    UTF-8 are passed through unchanged. Returns (bytes read, expansions).
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='surrogateescape')
+    expander = Expander(library, now)
+    total = 0
+    while True:
+        data = source.read(chunk_size)
+        if not data:
+            break
+        total += len(data)
+        target.write(expander.feed(decoder.decode(data)).encode('utf-8', 'surrogateescape'))
+    tail = expander.feed(decoder.decode(b"", final=True)) + expander.close()
+    target.write(tail.encode('utf-8', 'surrogateescape'))
+    return total, expander.count
+
+
+def load_library(input_file, database_file=None):
+    """Load the library of Input.ini, or of database_file if given"""
+    if database_file:
+        return SnippetLibrary.from_database(database_file, input_file)
+    return SnippetLibrary.from_ini(input_file)
+
+
+# Library of a worker process of the expand pool, loaded once per process
+_worker_library = None
+
+
+def _init_worker(input_file, database_file):
+    global _worker_library
+    # Forked workers inherit the library the parent already loaded
+    if _worker_library is None:
+        _worker_library = load_library(input_file, database_file)
+
+
+def expand_file(source_path, target_path, chunk_size=DEFAULT_CHUNK_SIZE, library=None):
+    """Expand one file into target_path; returns (bytes read, expansions)"""
+    library = library or _worker_library
+    with open(source_path, 'rb') as source, open(target_path, 'wb') as target:
+        return expand_stream(library, source, target, chunk_size)
+
+
+def parse_expand_args(argv, input_file):
+    parser = argparse.ArgumentParser(
+        prog="snipit.py expand",
+        description="Expand the snippets in files or standard input with the SnipIt library",
+    )
+    parser.add_argument("files", nargs="*", metavar="FILE", help="files to expand (default: standard input)")
+    parser.add_argument("--input", default=input_file, metavar="PATH", help="snippet file (default: Input.ini)")
+    parser.add_argument("--db", nargs="?", const=os.path.join(os.path.dirname(input_file), "Input.db"),
+                        metavar="PATH", help="use the snippets of an SQLite database (default: Input.db)")
+    parser.add_argument("-o", "--output-dir", metavar="DIR",
+                        help="write each expanded file to DIR under its own name instead of to standard output")
+    parser.add_argument("-j", "--jobs", type=int, default=1, metavar="N",
+                        help="expand up to N files at once in worker processes (needs --output-dir)")
+    parser.add_argument("--chunk-kb", type=int, default=DEFAULT_CHUNK_SIZE // 1024, metavar="KB",
+                        help="read the input in chunks of this many kilobytes (default: %(default)s)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="do not report the throughput")
+    args = parser.parse_args(argv)
+    if args.jobs > 1 and not args.output_dir:
+        parser.error("--jobs needs --output-dir")
+    if args.output_dir and (not args.files or "-" in args.files):
+        parser.error("--output-dir needs input files")
+    if args.chunk_kb < 1:
+        parser.error("--chunk-kb must be at least 1")
+    return args
+
+
+def expand_main(argv, input_file):
+    """Run `snipit.py expand`; returns the exit status"""
+    global _worker_library
+    args = parse_expand_args(argv, input_file)
+    chunk_size = args.chunk_kb * 1024
+    started = time.perf_counter()
+    try:
+        library = load_library(args.input, args.db)
+    except Exception as e:
+        print(f"Error loading snippets from {args.db or args.input}: {e}", file=sys.stderr)
+        return 2
+    total = 0
+    expansions = 0
+    failed = 0
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        jobs = []
+        for path in args.files:
+            target = os.path.join(args.output_dir, os.path.basename(path))
+            if os.path.abspath(target) == os.path.abspath(path):
+                print(f"Skipping {path}: the output would overwrite it", file=sys.stderr)
+                failed += 1
+                continue
+            jobs.append((path, target))
+        if args.jobs > 1 and len(jobs) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+            _worker_library = library
+            with ProcessPoolExecutor(max_workers=min(args.jobs, len(jobs)), initializer=_init_worker,
+                                     initargs=(args.input, args.db)) as pool:
+                futures = {pool.submit(expand_file, path, target, chunk_size): path for path, target in jobs}
+                for future, path in futures.items():
+                    try:
+                        read, count = future.result()
+                    except Exception as e:
+                        print(f"Error expanding {path}: {e}", file=sys.stderr)
+                        failed += 1
+                        continue
+                    total += read
+                    expansions += count
+        else:
+            for path, target in jobs:
+                try:
+                    read, count = expand_file(path, target, chunk_size, library)
+                except OSError as e:
+                    print(f"Error expanding {path}: {e}", file=sys.stderr)
+                    failed += 1
+                    continue
+                total += read
+                expansions += count
+    else:
+        output = sys.stdout.buffer
+        for path in args.files or ["-"]:
+            try:
+                if path == "-":
+                    read, count = expand_stream(library, sys.stdin.buffer, output, chunk_size)
+                else:
+                    with open(path, 'rb') as source:
+                        read, count = expand_stream(library, source, output, chunk_size)
+            except OSError as e:
+                print(f"Error expanding {path}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            total += read
+            expansions += count
+        output.flush()
+
+    elapsed = time.perf_counter() - started
+    if not args.quiet:
+        megabytes = total / (1024 * 1024)
+        files = len(args.files) - failed if args.files else 1
+        print(f"Expanded {files} input(s), {megabytes:.1f} MB in {elapsed:.2f} s "
+              f"({megabytes / elapsed if elapsed else 0:.1f} MB/s), {expansions} expansions",
+              file=sys.stderr)
+    return 1 if failed else 0
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Snippet library cache for SnipIt
+Stores the parsed and compiled snippet library next to Input.ini
+"""
+
+import gc
+import hashlib
+import os
+import pickle
+
+# Bump when the layout of the cached data or of the pickled classes changes
+CACHE_FORMAT = 3
+
+
+def content_hash(data):
+    """Return the hex digest used to key the cache for the given file bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _header(digest):
+    return f"snipit-cache {CACHE_FORMAT} {digest}\n".encode('ascii')
+
+
+def load_cache(cache_file, digest):
+    """
+    Return the cached library for digest, or None
+
+    A missing, unreadable, outdated or foreign cache is treated as a miss.
+    The cache is a pickle written by SnipIt itself, so it carries the same
+    trust as Input.ini and the script next to it.
+    """
+    # Unpickling creates many small containers; pausing the cyclic garbage
+    # collector while doing so keeps it from rescanning them over and over
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(cache_file, 'rb') as f:
+            # The header is checked first so a stale cache is not unpickled
+            if f.readline() != _header(digest):
+                return None
+            cached = pickle.load(f)
+    except Exception:
+        return None
+    finally:
+        if gc_enabled:
+            gc.enable()
+    if not isinstance(cached, dict):
+        return None
+    return cached
+
+
+def save_cache(cache_file, digest, library):
+    """
+    Write library for digest to cache_file atomically
+
+    The data goes to a temporary file in the same directory which is then
+    renamed over the old cache, so a crash never leaves a truncated cache.
+    """
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(cache_file))
+    fd, tmp_path = tempfile.mkstemp(prefix=".snipit-cache-", dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_header(digest))
+            pickle.dump(dict(library), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_file)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
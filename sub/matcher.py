@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Snippet matcher for SnipIt
+Finds the longest snippet that ends the typed input without scanning every key
+"""
+
+
+# Trie nodes are plain dicts mapping a character to the next node; the key
+# that ends at a node is stored under "", which is never a typed character.
+# Plain dicts keep the index compact and let it be pickled quickly.
+_KEY = ""
+
+
+class SnippetMatcher:
+    """
+    Reversed-suffix trie over all snippet keys
+
+    Every key is inserted back to front, so matching walks the typed input
+    from the last character backwards and stops as soon as no key can match.
+    The work per keystroke is bounded by the length of the longest key and
+    does not depend on how many snippets are loaded. The deepest key found
+    on the walk is returned, which keeps the rule that the longest snippet wins.
+    """
+
+    def __init__(self, keys=()):
+        self.root = {}
+        self.max_len = 0
+        self.count = 0
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        """Insert a snippet key into the trie"""
+        if not key:
+            return
+        node = self.root
+        for char in reversed(key):
+            child = node.get(char)
+            if child is None:
+                child = node[char] = {}
+            node = child
+        if _KEY not in node:
+            self.count += 1
+        node[_KEY] = key
+        if len(key) > self.max_len:
+            self.max_len = len(key)
+
+    def remove(self, key):
+        """Remove a snippet key from the trie and prune empty branches"""
+        if not key:
+            return False
+        path = [self.root]
+        node = self.root
+        for char in reversed(key):
+            node = node.get(char)
+            if node is None:
+                return False
+            path.append(node)
+        if _KEY not in node:
+            return False
+        del node[_KEY]
+        self.count -= 1
+        # Prune nodes that no longer lead to any key
+        for depth in range(len(key), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][key[len(key) - depth]]
+        return True
+
+    def __contains__(self, key):
+        node = self.root
+        for char in reversed(key):
+            node = node.get(char)
+            if node is None:
+                return False
+        return _KEY in node
+
+    def __len__(self):
+        return self.count
+
+    def match(self, text):
+        """
+        Return the longest snippet that text ends with, or None
+
+        text only needs to support reversed(), so a str or the keystroke
+        RingBuffer can be matched without copying it.
+        """
+        node = self.root
+        best = None
+        for char in reversed(text):
+            node = node.get(char)
+            if node is None:
+                break
+            key = node.get(_KEY)
+            if key is not None:
+                best = key
+        return best
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Modifier key tracking for SnipIt
+Keeps the Ctrl/Alt/AltGr state in memory from key-down and key-up events
+"""
+
+CTRL = 1
+ALT = 2
+ALT_GR = 4
+
+# keyboard event names of the modifiers that suspend snippet matching, and
+# the name keyboard.is_pressed() understands for each bit
+MODIFIER_BITS = {
+    "ctrl": CTRL,
+    "left ctrl": CTRL,
+    "right ctrl": CTRL,
+    "alt": ALT,
+    "left alt": ALT,
+    "right alt": ALT,
+    "alt gr": ALT_GR,
+}
+PRESSED_NAMES = {CTRL: "ctrl", ALT: "alt", ALT_GR: "alt gr"}
+
+
+class ModifierState:
+    """
+    Bitmask of the modifier keys that are currently held down
+
+    update() is fed every key event and only touches the state for modifier
+    keys. While no modifier is held, checking the state is a single integer
+    test. Because a key-up can be lost (for example when the desktop is
+    locked with a modifier held), a non-zero mask is confirmed with
+    keyboard.is_pressed() before it is trusted, which also repairs it.
+    """
+
+    __slots__ = ("keyboard", "held", "mask")
+
+    def __init__(self, keyboard_module):
+        self.keyboard = keyboard_module
+        self.held = {}
+        self.mask = 0
+
+    def update(self, name, is_down):
+        """Apply a key event; return True if the key was a tracked modifier"""
+        bit = MODIFIER_BITS.get(name)
+        if bit is None:
+            return False
+        if is_down:
+            self.held[name] = bit
+        else:
+            self.held.pop(name, None)
+        mask = 0
+        for held_bit in self.held.values():
+            mask |= held_bit
+        self.mask = mask
+        return True
+
+    def reset(self):
+        self.held.clear()
+        self.mask = 0
+
+    def any_pressed(self):
+        """Return True if Ctrl, Alt or AltGr is held down"""
+        if not self.mask:
+            return False
+        for bit, name in PRESSED_NAMES.items():
+            if self.mask & bit:
+                try:
+                    if self.keyboard.is_pressed(name):
+                        return True
+                except Exception:
+                    return True
+        # Every flagged modifier was released without us seeing the key-up
+        self.reset()
+        return False
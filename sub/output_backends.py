@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Output backends for SnipIt
+Different ways of replacing a typed snippet in the target window
+"""
+
+from sub.stats import latency
+
+
+class OutputBackend:
+    """
+    Replaces the last delete_count characters in the target with text
+
+    Subclasses implement replace(); name is used in debug output.
+    """
+
+    name = "base"
+
+    def replace(self, delete_count, text):
+        raise NotImplementedError
+
+
+class TypingBackend(OutputBackend):
+    """Deletes the snippet and types the replacement with keyboard.write"""
+
+    name = "typing"
+
+    def __init__(self, keyboard_module, pacer):
+        self.keyboard = keyboard_module
+        self.pacer = pacer
+
+    def replace(self, delete_count, text):
+        # Deletions go out as one batch, followed by a pause calibrated for
+        # the target window
+        self.pacer.delete(self.keyboard, delete_count)
+        started = latency.start()
+        self.pacer.write(self.keyboard, text)
+        latency.record("type", started)
+
+
+class ClipboardBackend(OutputBackend):
+    """Deletes the snippet and pastes the replacement through the clipboard"""
+
+    name = "clipboard"
+
+    def __init__(self, keyboard_module, clipboard_manager, pacer):
+        self.keyboard = keyboard_module
+        self.clipboard = clipboard_manager
+        self.pacer = pacer
+
+    def replace(self, delete_count, text):
+        # Save the user's clipboard once per burst and copy the replacement
+        self.clipboard.hold()
+        try:
+            started = latency.start()
+            self.clipboard.copy(text)
+            latency.record("clipboard_copy", started)
+
+            # Deletions go out as one batch, followed by a pause calibrated
+            # for the target window
+            self.pacer.delete(self.keyboard, delete_count)
+
+            # Paste the replacement
+            started = latency.start()
+            self.keyboard.press_and_release('ctrl+v')
+            latency.record("paste", started)
+        finally:
+            # The manager restores the original clipboard once the burst settles
+            self.clipboard.release()
+
+
+class RecordingBackend(OutputBackend):
+    """In-memory backend for tests that records every replacement"""
+
+    name = "recording"
+
+    def __init__(self):
+        self.calls = []
+        self.text = ""
+
+    def replace(self, delete_count, text):
+        self.calls.append((delete_count, text))
+        if delete_count:
+            self.text = self.text[:-delete_count]
+        self.text += text
+
+
+class OutputPolicy:
+    """
+    Picks a backend for each replacement
+
+    Short single-line text is typed directly, which avoids the clipboard
+    round-trip. Longer or multi-line text is pasted, since typing it is slow
+    and newlines would be sent as Enter key presses. A threshold of 0 always
+    pastes.
+    """
+
+    def __init__(self, typing_backend, paste_backend, type_threshold=16):
+        self.typing_backend = typing_backend
+        self.paste_backend = paste_backend
+        self.type_threshold = type_threshold
+
+    def select(self, text):
+        """Return the backend to use for text"""
+        if len(text) <= self.type_threshold and "\n" not in text and "\r" not in text:
+            return self.typing_backend
+        return self.paste_backend
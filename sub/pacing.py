@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Injection pacing for SnipIt
+Decides how fast synthetic keystrokes can be sent to the window in front
+"""
+
+import os
+import threading
+import time
+
+from sub.stats import latency
+
+
+class PacingProfile:
+    """
+    Timing for one kind of target window
+
+    settle is the starting pause between deleting the snippet and typing or
+    pasting the replacement, and is calibrated between min_settle and
+    max_settle. key_delay paces each deletion for targets that drop keys
+    sent in a burst; with key_delay 0 all deletions go out in one call.
+    """
+
+    __slots__ = ("name", "settle", "min_settle", "max_settle", "key_delay")
+
+    def __init__(self, name, settle, min_settle, max_settle, key_delay=0.0):
+        self.name = name
+        self.settle = settle
+        self.min_settle = min_settle
+        self.max_settle = max_settle
+        self.key_delay = key_delay
+
+
+PROFILES = {
+    # No pauses at all, for benchmarks and in-process fakes
+    "instant": PacingProfile("instant", 0.0, 0.0, 0.0),
+    # Local applications that read their input queue promptly
+    "native": PacingProfile("native", 0.01, 0.0, 0.15),
+    # Used when the target cannot be identified; matches the old fixed pause
+    "default": PacingProfile("default", 0.05, 0.01, 0.3),
+    # Remote desktop and VM consoles, which forward keys over the network
+    "remote": PacingProfile("remote", 0.1, 0.04, 0.6, key_delay=0.004),
+}
+
+# Executables whose windows get the remote profile in auto mode
+DEFAULT_REMOTE_APPS = (
+    "mstsc.exe", "msrdc.exe", "vmconnect.exe", "vmware.exe", "vmware-vmx.exe",
+    "virtualbox.exe", "virtualboxvm.exe", "vncviewer.exe", "tvnviewer.exe",
+    "citrix.exe", "wfica32.exe", "cdviewer.exe", "anydesk.exe", "teamviewer.exe",
+)
+
+# A backspace or undo this soon after an expansion is taken as a sign that
+# the target lost keys
+CORRECTION_WINDOW = 1.5
+GROW_FACTOR = 1.5
+DECAY_FACTOR = 0.9
+
+
+def foreground_app():
+    """Return the lowercase executable name of the foreground window, or None"""
+    if os.name != "nt":
+        return None
+    try:
+        import ctypes
+        from ctypes import wintypes
+        user32 = ctypes.windll.user32
+        kernel32 = ctypes.windll.kernel32
+        hwnd = user32.GetForegroundWindow()
+        if not hwnd:
+            return None
+        pid = wintypes.DWORD()
+        user32.GetWindowThreadProcessId(hwnd, ctypes.byref(pid))
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        process = kernel32.OpenProcess(0x1000, False, pid.value)
+        if not process:
+            return None
+        try:
+            buffer = ctypes.create_unicode_buffer(260)
+            size = wintypes.DWORD(len(buffer))
+            if not kernel32.QueryFullProcessImageNameW(process, 0, buffer, ctypes.byref(size)):
+                return None
+            return os.path.basename(buffer.value).lower()
+        finally:
+            kernel32.CloseHandle(process)
+    except Exception:
+        return None
+
+
+class InjectionPacer:
+    """
+    Paces the deletions and the pause before the replacement for each target
+
+    The target is the foreground application. In auto mode known remote
+    desktop and VM clients get the remote profile, other identified
+    applications the native one, and unidentified targets the default one.
+
+    The pause is calibrated per target in two ways. First, when the keyboard
+    hook sees our own keystrokes come back, the pacer waits for the
+    deletions to arrive there instead of guessing how long the input queue
+    takes. Second, the settle pause grows when the user corrects an expansion
+    right away (a backspace or Ctrl+Z within CORRECTION_WINDOW seconds),
+    which is what happens when the target ate keys, and shrinks slowly after
+    every expansion that is not corrected.
+    """
+
+    def __init__(self, mode="auto", remote_apps=DEFAULT_REMOTE_APPS, settle_override=None,
+                 app_detector=foreground_app, debugging=False):
+        self.mode = mode
+        self.remote_apps = frozenset(app.lower() for app in remote_apps)
+        self.settle_override = settle_override
+        self.app_detector = app_detector
+        self.debugging = debugging
+        self.lock = threading.Lock()
+        self.settle = {}
+        # None while unknown; stays False until a keyboard hook is installed
+        self.echo_supported = False
+        self.echo_expected = 0
+        self.echo_backspace = False
+        self.echo_event = threading.Event()
+        self.last_target = None
+        self.last_expansion = None
+
+    def configure(self, mode="auto", remote_apps=None, settle_override=None):
+        """Apply the pacing settings; calibration starts over"""
+        with self.lock:
+            self.mode = mode if mode in PROFILES or mode == "auto" else "auto"
+            if remote_apps is not None:
+                self.remote_apps = frozenset(app.strip().lower() for app in remote_apps if app.strip())
+            self.settle_override = settle_override
+            self.settle = {}
+
+    def profile_for(self, app):
+        if self.mode != "auto":
+            return PROFILES[self.mode]
+        if app is None:
+            return PROFILES["default"]
+        if app in self.remote_apps:
+            return PROFILES["remote"]
+        return PROFILES["native"]
+
+    def target(self):
+        """Return (target key, profile) for the window in front"""
+        app = self.app_detector() if self.mode == "auto" else None
+        return (app or "", self.mode), self.profile_for(app)
+
+    def _bounds(self, profile):
+        # A configured pause may be longer than the profile's own limit
+        upper = profile.max_settle
+        if self.settle_override is not None:
+            upper = max(upper, self.settle_override)
+        return profile.min_settle, upper
+
+    def settle_delay(self, target, profile):
+        """Return the calibrated pause for target"""
+        with self.lock:
+            delay = self.settle.get(target)
+            if delay is None:
+                low, high = self._bounds(profile)
+                start = profile.settle if self.settle_override is None else self.settle_override
+                delay = self.settle[target] = min(max(start, low), high)
+            return delay
+
+    def delete(self, keyboard_module, count):
+        """Send count backspaces and wait until the target should have processed them"""
+        target, profile = self.target()
+        started = latency.start()
+        if count:
+            self._expect_echo(count, backspace=True)
+            if profile.key_delay:
+                for _ in range(count):
+                    keyboard_module.press_and_release('backspace')
+                    time.sleep(profile.key_delay)
+            else:
+                # One call with all deletions instead of a call per key
+                keyboard_module.send(", ".join(["backspace"] * count))
+        latency.record("backspaces", started)
+
+        started = latency.start()
+        if count:
+            self._wait_for_echo(max(profile.max_settle, 0.05))
+            delay = self.settle_delay(target, profile)
+            if delay:
+                time.sleep(delay)
+        latency.record("settle", started)
+        self._expanded(target)
+
+    def write(self, keyboard_module, text):
+        """
+        Type text and wait until the hook has seen it
+
+        The keyboard hook gets events on its own thread, so without the wait
+        the last typed characters could arrive after the injection ended and
+        be taken for user input, and a replacement ending in a snippet key
+        would expand again.
+        """
+        if not text:
+            return
+        _, profile = self.target()
+        self._expect_echo(len(text))
+        keyboard_module.write(text)
+        self._wait_for_echo(max(profile.max_settle, 0.05) + 0.002 * len(text), learn=False)
+
+    def watch_echo(self):
+        """Start waiting for deletions to echo through the keyboard hook, if it shows our own keys"""
+        if self.echo_supported is False:
+            self.echo_supported = None
+
+    def _expect_echo(self, count, backspace=False):
+        if self.echo_supported is False:
+            return
+        self.echo_event.clear()
+        self.echo_backspace = backspace
+        self.echo_expected = count
+
+    def note_echo(self, key):
+        """Called by the keyboard hook for each of our own key-down events it sees"""
+        if self.echo_backspace:
+            if key != 'backspace':
+                return
+        elif not key or (len(key) > 1 and key not in ('space', 'tab')):
+            # Shift and other keys sent along with the typed characters
+            return
+        if self.echo_expected > 0:
+            self.echo_expected -= 1
+            if self.echo_expected == 0:
+                self.echo_supported = True
+                self.echo_event.set()
+
+    def _wait_for_echo(self, timeout, learn=True):
+        if self.echo_supported is False or self.echo_expected <= 0:
+            return
+        if not self.echo_event.wait(timeout):
+            if learn and self.echo_supported is None:
+                # The hook never sees our own keys on this system
+                self.echo_supported = False
+                if self.debugging:
+                    print("Injected keys are not echoed to the hook; pacing by time only")
+        self.echo_expected = 0
+
+    def _expanded(self, target):
+        with self.lock:
+            previous = self.last_target
+            if previous is not None and previous in self.settle:
+                # The previous expansion was not corrected
+                profile_min = self._profile_of(previous).min_settle
+                self.settle[previous] = max(self.settle[previous] * DECAY_FACTOR, profile_min)
+            self.last_target = target
+            self.last_expansion = time.monotonic()
+
+    def _profile_of(self, target):
+        app, mode = target
+        return PROFILES[mode] if mode != "auto" else self.profile_for(app or None)
+
+    def note_correction(self):
+        """Called when the user presses backspace or Ctrl+Z; grows the pause if it follows an expansion"""
+        with self.lock:
+            target = self.last_target
+            if target is None or time.monotonic() - self.last_expansion > CORRECTION_WINDOW:
+                return
+            profile = self._profile_of(target)
+            delay = self.settle.get(target, profile.settle)
+            self.settle[target] = min(max(delay, 0.005) * GROW_FACTOR, self._bounds(profile)[1])
+            # Count each expansion at most once
+            self.last_target = None
+            if self.debugging:
+                print(f"Expansion corrected; pause for {target[0] or 'this target'} is now {self.settle[target] * 1000:.0f} ms")
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Pattern triggers for SnipIt
+Matches the regular expression triggers from [Patterns] with a single combined regex
+"""
+
+import re
+
+from sub.replace_flags import compile_template
+
+# Header of the [Patterns] section, for skipping files without one quickly
+_PATTERNS_HEADER = re.compile(r"^[ \t]*\[[ \t]*patterns[ \t]*\][ \t]*\r?$", re.IGNORECASE | re.MULTILINE)
+
+# Smallest keystroke buffer while patterns are loaded, so that triggers with
+# open-ended parts such as \d+ have room to match
+PATTERN_WINDOW = 64
+
+
+class PatternMatch:
+    """
+    A pattern trigger found at the end of the typed input
+
+    text is the typed text the pattern matched, which is deleted before the
+    replacement is sent, and groups holds the whole match followed by the
+    captured groups, with "" for groups that did not take part in the match.
+    """
+
+    __slots__ = ("source", "text", "groups", "template")
+
+    def __init__(self, source, text, groups, template):
+        self.source = source
+        self.text = text
+        self.groups = groups
+        self.template = template
+
+    def expand(self, now=None, files=None):
+        """Expand the replacement with the captured groups"""
+        return self.template.expand(now, self.groups, files)
+
+
+class PatternMatcher:
+    """
+    All [Patterns] triggers compiled into one regex anchored at the end of the input
+
+    Each pattern becomes a named alternative of (?:(?P<p0>...)|(?P<p1>...))\\Z,
+    so a single search over the buffer tail tests every trigger at once
+    instead of running one regex per pattern. The match that starts furthest
+    back, which is the longest one, wins; for matches starting at the same
+    character the pattern listed first wins. The winning pattern is then
+    matched on its own against the matched text to number its groups.
+
+    Patterns that do not compile, use named groups or match empty input are
+    skipped and reported in errors, and so are patterns that only compile on
+    their own: global flags such as (?i) must start the whole regex, and
+    numbered backreferences would point at the wrong group once the group
+    numbers shift in the combined regex.
+    """
+
+    def __init__(self, patterns=None):
+        self.sources = dict(patterns or {})
+        self.entries = []
+        self.errors = []
+        alternatives = []
+        for source, body in self.sources.items():
+            try:
+                compiled = re.compile(source)
+            except re.error as e:
+                self.errors.append(f"{source}: {e}")
+                continue
+            if compiled.groupindex:
+                self.errors.append(f"{source}: named groups are not supported")
+                continue
+            if compiled.fullmatch(""):
+                self.errors.append(f"{source}: matches empty input")
+                continue
+            if _has_group_reference(source):
+                self.errors.append(f"{source}: backreferences are not supported")
+                continue
+            alternative = f"(?P<p{len(self.entries)}>{source})"
+            try:
+                re.compile(alternative)
+            except re.error as e:
+                self.errors.append(f"{source}: {e}")
+                continue
+            alternatives.append(alternative)
+            self.entries.append((source, compiled, compile_template(body, captures=True)))
+        self.regex = None
+        if alternatives:
+            try:
+                self.regex = re.compile(f"(?:{'|'.join(alternatives)})\\Z")
+            except re.error as e:
+                self.errors.append(f"combined patterns: {e}")
+                self.entries = []
+
+    def __len__(self):
+        return len(self.entries)
+
+    def match(self, text):
+        """Return the PatternMatch for the pattern that ends text, or None"""
+        if self.regex is None:
+            return None
+        found = self.regex.search(text)
+        if found is None:
+            return None
+        # The alternative's own group closes last, so it is lastgroup
+        source, compiled, template = self.entries[int(found.lastgroup[1:])]
+        matched = found.group(found.lastindex)
+        own = compiled.fullmatch(matched)
+        if own is None:
+            return None
+        groups = (matched,) + own.groups(default="")
+        return PatternMatch(source, matched, groups, template)
+
+
+def _has_group_reference(source):
+    """Return True if source refers to a numbered group with \\1 or (?(1)...)"""
+    length = len(source)
+    in_class = False
+    i = 0
+    while i < length:
+        char = source[i]
+        if char == "\\":
+            digits = source[i + 1:i + 4]
+            # \1 to \99 are backreferences; \0 and three octal digits are character escapes
+            if (not in_class and digits and digits[0] in "123456789"
+                    and not (len(digits) == 3 and all(digit in "01234567" for digit in digits))):
+                return True
+            i += 2
+            continue
+        if in_class:
+            if char == "]":
+                in_class = False
+        elif char == "[":
+            in_class = True
+            # A ']' right after '[' or '[^' is a literal
+            i += 1
+            if source.startswith("^", i):
+                i += 1
+            if source.startswith("]", i):
+                i += 1
+            continue
+        elif source.startswith("(?(", i) and source[i + 3:i + 4].isdigit():
+            return True
+        i += 1
+    return False
+
+
+def scan_patterns(data):
+    """
+    Return the [Patterns] section of the raw bytes of an INI file as a dict
+
+    Patterns are kept as written, not lowercased. The pattern ends at the
+    first " = " on the line, or at the first "=" if there is none, so that
+    regex syntax such as (?:...) and (?=...) can be used. Only lines
+    starting with ';' are comments, because '#' is common in patterns.
+    """
+    patterns = {}
+    section = None
+    for raw_line in data.splitlines():
+        line = raw_line.strip()
+        if line.startswith(b"[") and line.endswith(b"]"):
+            section = line[1:-1].strip().lower()
+            continue
+        if section != b"patterns" or not line or line.startswith(b";"):
+            continue
+        text = line.decode('utf-8')
+        separator = text.find(" = ")
+        if separator < 0:
+            separator = text.find("=")
+            if separator < 0:
+                continue
+            source, body = text[:separator], text[separator + 1:]
+        else:
+            source, body = text[:separator], text[separator + 3:]
+        source = source.strip()
+        if source:
+            patterns[source] = body.strip()
+    return patterns
+
+
+def strip_patterns(text):
+    """
+    Return the text of an INI file with the [Patterns] section blanked out
+
+    Patterns are not valid configparser options: (?: would be read as a
+    key ending in ':', keys differing only in case would clash and a pattern
+    starting with '[' could open a section. Every reader that hands the file
+    to configparser passes it through here first. The lines are replaced by
+    blank ones, so line numbers in parser errors stay right.
+    """
+    found = _PATTERNS_HEADER.search(text)
+    if found is None:
+        return text
+    lines = text[found.start():].split("\n")
+    section = None
+    for index, line in enumerate(lines):
+        stripped = line.strip()
+        if stripped.startswith("[") and stripped.endswith("]"):
+            section = stripped[1:-1].strip().lower()
+        if section == "patterns":
+            lines[index] = ""
+    return text[:found.start()] + "\n".join(lines)
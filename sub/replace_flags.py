@@ -2,10 +2,202 @@
 """
 Replace flags in text with dynamic content
 Ported from AutoHotKey to Python with improvements
+
+Snippet bodies are compiled once into a Template, a plan of literal chunks
+and date/time field slots, so an expansion is a single join over values
+computed from one datetime.now() call. {file:path} slots are filled from
+the shared include cache, and pattern bodies can also hold {1}, {2}, ...
+slots for the groups captured by their trigger.
 """
 
 import datetime
-import re
+
+from sub.file_cache import include_cache
+
+# Prefixes of include, capture and date offset slots in Template.slots;
+# date/time flags never contain a colon
+FILE_PREFIX = "file:"
+GROUP_PREFIX = "group:"
+DAYS_PREFIX = "days:"
+
+# Date/time flags and how to format them, longest flags first so that
+# e.g. %yyyy is preferred over %yy and %y at the same position
+FLAG_FORMATTERS = (
+    ("yyyy", lambda now: "%04d" % now.year),
+    ("yy", lambda now: "%02d" % (now.year % 100)),
+    ("y", lambda now: str(now.year)[-1:]),
+    ("MM", lambda now: "%02d" % now.month),
+    ("M", lambda now: str(now.month)),
+    ("dd", lambda now: "%02d" % now.day),
+    ("d", lambda now: str(now.day)),
+    ("HH", lambda now: "%02d" % now.hour),
+    ("H", lambda now: str(now.hour)),
+    ("hh", lambda now: "%02d" % (now.hour % 12 or 12)),
+    ("h", lambda now: str(now.hour % 12 or 12)),
+    ("mm", lambda now: "%02d" % now.minute),
+    ("m", lambda now: str(now.minute)),
+    ("ss", lambda now: "%02d" % now.second),
+    ("s", lambda now: str(now.second)),
+)
+
+_FORMATTERS = dict(FLAG_FORMATTERS)
+
+
+class Template:
+    """
+    A compiled snippet body
+
+    parts holds the literal chunks with placeholders at the positions listed
+    in slots, as (index, flag) pairs, where flag is a date/time flag or
+    "file:<path>" for an included file, "group:<n>" for a captured group and
+    "days:<n>", which is empty and moves the date by the number of days in
+    captured group n. A body without flags expands to a constant string, and
+    a body that is a single {file:...} token expands to the cached file text
+    itself without copying it.
+    """
+
+    __slots__ = ("parts", "slots", "flags", "constant")
+
+    def __init__(self, parts, slots):
+        self.parts = parts
+        self.slots = slots
+        self.flags = tuple(dict.fromkeys(flag for _, flag in slots))
+        self.constant = "".join(parts) if not slots else None
+
+    def __reduce__(self):
+        # Rebuild from the plan only; used when templates are cached
+        return (Template, (self.parts, self.slots))
+
+    def expand(self, now=None, groups=(), files=None):
+        """
+        Expand the template using a single timestamp and the groups captured by a pattern
+
+        {file:...} slots are read from files, a FileCache, or from the shared
+        include_cache of the live engine.
+        """
+        if self.constant is not None:
+            return self.constant
+        if now is None:
+            now = datetime.datetime.now()
+        if groups:
+            now = _shift_days(now, self.flags, groups)
+        values = {flag: _flag_value(flag, now, groups, files) for flag in self.flags}
+        if len(self.parts) == 1:
+            return values[self.flags[0]]
+        parts = list(self.parts)
+        for index, flag in self.slots:
+            parts[index] = values[flag]
+        return "".join(parts)
+
+
+def _group(groups, flag, prefix):
+    index = int(flag[len(prefix):])
+    return groups[index] if index < len(groups) else ""
+
+
+def _shift_days(now, flags, groups):
+    for flag in flags:
+        if flag.startswith(DAYS_PREFIX):
+            offset = _group(groups, flag, DAYS_PREFIX).strip()
+            try:
+                now += datetime.timedelta(days=int(offset))
+            except (ValueError, OverflowError):
+                pass
+    return now
+
+
+def _flag_value(flag, now, groups=(), files=None):
+    if flag.startswith(GROUP_PREFIX):
+        return _group(groups, flag, GROUP_PREFIX)
+    if flag.startswith(DAYS_PREFIX):
+        return ""
+    if not flag.startswith(FILE_PREFIX):
+        return _FORMATTERS[flag](now)
+    path = flag[len(FILE_PREFIX):]
+    try:
+        return (include_cache if files is None else files).read(path)
+    except (OSError, UnicodeDecodeError) as e:
+        print(f"Error reading included file {path}: {e}")
+        # Leave the token in place so the failed include is visible
+        return "{" + flag + "}"
+
+
+def compile_template(input_str, expand_newlines=True, captures=False):
+    """
+    Tokenize a snippet body into a Template in a single left-to-right pass
+
+    A flag is a % optionally preceded by a backtick, followed by the longest
+    matching flag name. Any other backtick is an escape character and is
+    dropped. {n} becomes a newline when expand_newlines is set.
+    {file:path} includes the file at path, relative to the directory of
+    Input.ini; its contents are inserted as they are, without flags. With
+    captures set, {0}, {1}, ... insert the groups captured by a pattern
+    trigger and {days:n} moves the date by the days in group n.
+    """
+    text = str(input_str)
+    parts = []
+    slots = []
+    literal = []
+    length = len(text)
+    i = 0
+    while i < length:
+        char = text[i]
+        if char == "%":
+            for name, _ in FLAG_FORMATTERS:
+                if text.startswith(name, i + 1):
+                    if literal:
+                        parts.append("".join(literal))
+                        literal = []
+                    slots.append((len(parts), name))
+                    parts.append("")
+                    i += 1 + len(name)
+                    break
+            else:
+                literal.append(char)
+                i += 1
+        elif char == "`":
+            # Backticks are AHK escape characters and are dropped
+            i += 1
+        elif expand_newlines and char == "{" and text.startswith("{n}", i):
+            literal.append("\n")
+            i += 3
+        elif char == "{" and text.startswith("{file:", i) and text.find("}", i) > i + 6:
+            end = text.find("}", i)
+            if literal:
+                parts.append("".join(literal))
+                literal = []
+            slots.append((len(parts), FILE_PREFIX + text[i + 6:end].strip()))
+            parts.append("")
+            i = end + 1
+        elif captures and char == "{" and _capture_token(text, i):
+            flag, end = _capture_token(text, i)
+            if literal:
+                parts.append("".join(literal))
+                literal = []
+            slots.append((len(parts), flag))
+            parts.append("")
+            i = end + 1
+        else:
+            literal.append(char)
+            i += 1
+    if literal:
+        parts.append("".join(literal))
+    return Template(parts, slots)
+
+
+def _capture_token(text, i):
+    # Return (flag, index of the closing brace) for {<digits>} and
+    # {days:<digits>} at i, or None
+    end = text.find("}", i)
+    if end < 0:
+        return None
+    token = text[i + 1:end]
+    if token.isdecimal():
+        return GROUP_PREFIX + str(int(token)), end
+    if token.startswith(DAYS_PREFIX) and token[len(DAYS_PREFIX):].isdecimal():
+        return DAYS_PREFIX + str(int(token[len(DAYS_PREFIX):])), end
+    return None
+
 
 def replace_flags(input_str):
     """
@@ -28,66 +220,13 @@ def replace_flags(input_str):
     `%ss or %ss --> replaced by seconds: 00 - 59
     `%s or %s --> replaced by seconds: 0 - 59
     {n} --> will be converted to newlines later in the main script
+    {file:path} --> replaced by the contents of the file at path
     """
     try:
-        now = datetime.datetime.now()
-        
-        # Make a copy of the input string to avoid modifying the original
-        result = str(input_str)
-        
-        # Process date/time replacements in a specific order to avoid conflicts
-        # For example, replace %yyyy before %yy to prevent double replacement
-        
-        # Year replacements (longest first)
-        result = result.replace("`%yyyy", now.strftime("%Y"))
-        result = result.replace("%yyyy", now.strftime("%Y"))
-        result = result.replace("`%yy", now.strftime("%y"))
-        result = result.replace("%yy", now.strftime("%y"))
-        result = result.replace("`%y", str(now.year)[-1:])
-        result = result.replace("%y", str(now.year)[-1:])
-        
-        # Month replacements
-        result = result.replace("`%MM", now.strftime("%m"))
-        result = result.replace("%MM", now.strftime("%m"))
-        result = result.replace("`%M", str(now.month))
-        result = result.replace("%M", str(now.month))
-        
-        # Day replacements
-        result = result.replace("`%dd", now.strftime("%d"))
-        result = result.replace("%dd", now.strftime("%d"))
-        result = result.replace("`%d", str(now.day))
-        result = result.replace("%d", str(now.day))
-        
-        # Hour replacements (24-hour format)
-        result = result.replace("`%HH", now.strftime("%H"))
-        result = result.replace("%HH", now.strftime("%H"))
-        result = result.replace("`%H", str(now.hour))
-        result = result.replace("%H", str(now.hour))
-        
-        # Hour replacements (12-hour format)
-        result = result.replace("`%hh", now.strftime("%I"))
-        result = result.replace("%hh", now.strftime("%I"))
-        result = result.replace("`%h", str(int(now.strftime("%I"))))
-        result = result.replace("%h", str(int(now.strftime("%I"))))
-        
-        # Minute replacements
-        result = result.replace("`%mm", now.strftime("%M"))
-        result = result.replace("%mm", now.strftime("%M"))
-        result = result.replace("`%m", str(int(now.strftime("%M"))))
-        result = result.replace("%m", str(int(now.strftime("%M"))))
-        
-        # Second replacements
-        result = result.replace("`%ss", now.strftime("%S"))
-        result = result.replace("%ss", now.strftime("%S"))
-        result = result.replace("`%s", str(int(now.strftime("%S"))))
-        result = result.replace("%s", str(int(now.strftime("%S"))))
-        
-        # Remove any backtick characters (escape characters in the original script)
-        result = result.replace("`", "")
-        
-        return result
+        # Compatibility wrapper: {n} is left for the caller to convert
+        return compile_template(input_str, expand_newlines=False).expand()
     
     except Exception as e:
         print(f"Error in replace_flags: {e}")
         # Return the input string unchanged in case of error
-        return input_str
\ No newline at end of file
+        return input_str
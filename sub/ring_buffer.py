@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Keystroke buffer for SnipIt
+A fixed-capacity character ring buffer that replaces the growing log string
+"""
+
+
+class RingBuffer:
+    """
+    Holds the most recently typed characters
+
+    Appending and backspacing are O(1) and never copy the buffer. Once the
+    buffer is full the oldest character is overwritten. Iterating with
+    reversed() yields the characters from the newest to the oldest, which is
+    all the snippet matcher needs to read the tail.
+    """
+
+    __slots__ = ("_chars", "_capacity", "_end", "_count")
+
+    def __init__(self, capacity):
+        self._capacity = max(int(capacity), 1)
+        self._chars = [""] * self._capacity
+        self._end = 0  # index of the slot after the newest character
+        self._count = 0
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def append(self, char):
+        """Add a character, overwriting the oldest one when full"""
+        self._chars[self._end] = char
+        self._end = (self._end + 1) % self._capacity
+        if self._count < self._capacity:
+            self._count += 1
+
+    def pop(self):
+        """Remove and return the newest character, or None if empty"""
+        if not self._count:
+            return None
+        self._end = (self._end - 1) % self._capacity
+        self._count -= 1
+        char = self._chars[self._end]
+        self._chars[self._end] = ""
+        return char
+
+    def clear(self):
+        """Forget all characters"""
+        self._end = 0
+        self._count = 0
+
+    def resize(self, capacity):
+        """Change the capacity, keeping the newest characters that still fit"""
+        chars = list(reversed(self))[:max(int(capacity), 1)]
+        self.__init__(capacity)
+        for char in reversed(chars):
+            self.append(char)
+
+    def __len__(self):
+        return self._count
+
+    def __reversed__(self):
+        chars = self._chars
+        capacity = self._capacity
+        index = self._end
+        for _ in range(self._count):
+            index = (index - 1) % capacity
+            yield chars[index]
+
+    def __iter__(self):
+        chars = self._chars
+        capacity = self._capacity
+        start = self._end - self._count
+        for offset in range(self._count):
+            yield chars[(start + offset) % capacity]
+
+    def __str__(self):
+        return "".join(self)
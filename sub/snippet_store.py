@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+In-memory snippet store for SnipIt
+Keeps the replacement bodies from Input.ini so lookups do not touch the disk
+"""
+
+import mmap
+import os
+import threading
+from array import array
+from collections import OrderedDict
+
+from sub.replace_flags import compile_template
+
+
+def file_signature(path):
+    """Return (mtime_ns, size) for a file, or None if it cannot be read"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class SnippetStore:
+    """
+    Maps snippet keys to their replacement bodies and compiled templates
+
+    Bodies are compiled once when they are loaded. The store remembers the
+    mtime and size of the file it was loaded from, so callers can cheaply
+    check whether the file changed on disk and only then reload it. A lookup
+    is a single dict access.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.bodies = {}
+        self.templates = {}
+        self.signature = None
+
+    def load(self, strings, signature=None):
+        """Replace all bodies with the key/value pairs from strings"""
+        bodies = dict(strings)
+        self.templates = {key: compile_template(body) for key, body in bodies.items()}
+        self.bodies = bodies
+        self.signature = signature if signature is not None else file_signature(self.path)
+
+    def load_compiled(self, bodies, templates, signature=None):
+        """Replace all bodies with already compiled ones, e.g. from the cache"""
+        self.templates = templates
+        self.bodies = bodies
+        self.signature = signature if signature is not None else file_signature(self.path)
+
+    def diff(self, strings):
+        """
+        Compare the loaded bodies with strings
+
+        Returns (added, changed, removed): dicts of new and modified bodies,
+        and a list of keys that no longer exist.
+        """
+        bodies = self.bodies
+        added = {}
+        changed = {}
+        for key, body in strings.items():
+            old = bodies.get(key)
+            if old is None:
+                added[key] = body
+            elif old != body:
+                changed[key] = body
+        removed = [key for key in bodies if key not in strings]
+        return added, changed, removed
+
+    def apply(self, updates, removed=(), signature=None):
+        """
+        Apply an incremental update in place
+
+        Only the updated bodies are recompiled. Each key is swapped with a
+        single dict assignment, so lookups from other threads keep working
+        while the update is applied.
+        """
+        for key, body in updates.items():
+            self.templates[key] = compile_template(body)
+            self.bodies[key] = body
+        for key in removed:
+            self.bodies.pop(key, None)
+            self.templates.pop(key, None)
+        self.signature = signature if signature is not None else file_signature(self.path)
+
+    def is_stale(self):
+        """Return True if the file changed since it was last loaded"""
+        return file_signature(self.path) != self.signature
+
+    def get(self, key):
+        """Return the replacement body for key, or None"""
+        return self.bodies.get(key)
+
+    def get_template(self, key):
+        """Return the compiled template for key, or None"""
+        return self.templates.get(key)
+
+    def has_body(self, key):
+        """Return True if key exists and has a non-empty body"""
+        return bool(self.bodies.get(key))
+
+    def keys(self):
+        return self.bodies.keys()
+
+    def __contains__(self, key):
+        return key in self.bodies
+
+    def __len__(self):
+        return len(self.bodies)
+
+
+def scan_ini(data):
+    """
+    Index the raw bytes of an INI file without decoding the [Strings] bodies
+
+    Follows configparser's rules for the common cases: keys are stripped and
+    lowercased, '=' or ':' separates key and value, lines starting with '#'
+    or ';' are comments and indented lines continue the previous value.
+    Returns (entries, settings) where entries maps each [Strings] key to the
+    (offset, length) of its raw value and settings holds the decoded
+    [Settings] values with lowercase keys.
+    """
+    entries = {}
+    settings = {}
+    section = None
+    current = None
+    position = 0
+    for line in data.splitlines(keepends=True):
+        start = position
+        position += len(line)
+        content = line.rstrip(b"\r\n")
+        stripped = content.strip()
+        if not stripped or stripped[:1] in (b"#", b";"):
+            continue
+        if content[:1] in (b" ", b"\t") and current is not None:
+            # Continuation line: extend the previous value up to here
+            key, offset = current
+            end = start + len(content.rstrip())
+            if section == b"strings":
+                entries[key] = (offset, end - offset)
+            elif section == b"settings":
+                settings[key] = data[offset:end].decode('utf-8')
+            continue
+        if stripped.startswith(b"[") and stripped.endswith(b"]"):
+            section = stripped[1:-1].strip().lower()
+            current = None
+            continue
+        separators = [i for i in (content.find(b"="), content.find(b":")) if i >= 0]
+        if not separators:
+            current = None
+            continue
+        separator = min(separators)
+        key = content[:separator].strip().decode('utf-8').lower()
+        value = content[separator + 1:]
+        offset = start + separator + 1 + (len(value) - len(value.lstrip()))
+        end = start + len(content.rstrip())
+        length = max(end - offset, 0)
+        current = (key, offset)
+        if section == b"strings":
+            entries[key] = (offset, length)
+        elif section == b"settings":
+            settings[key] = data[offset:offset + length].decode('utf-8')
+    return entries, settings
+
+
+class CachedBodyStore:
+    """
+    Base for snippet stores that read bodies on demand
+
+    Subclasses implement _read(key), which returns the body or None.
+    Recently used bodies and their compiled templates stay in an LRU cache
+    bounded by cache_budget characters of body text; a body larger than the
+    whole budget is read every time instead of evicting everything else.
+    """
+
+    __slots__ = ("cache", "cache_size", "cache_budget", "lock")
+
+    def __init__(self, cache_budget):
+        self.cache = OrderedDict()
+        self.cache_size = 0
+        self.cache_budget = cache_budget
+        self.lock = threading.Lock()
+
+    def _read(self, key):
+        raise NotImplementedError
+
+    def _clear_cache(self):
+        # Called with the lock held
+        self.cache.clear()
+        self.cache_size = 0
+
+    def _lookup(self, key):
+        # Return (template, body) through the LRU cache, reading the body on a miss
+        with self.lock:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache.move_to_end(key)
+                return cached[0], cached[1]
+        body = self._read(key)
+        if body is None:
+            return None, None
+        template = compile_template(body)
+        size = len(body)
+        with self.lock:
+            if key not in self.cache and size <= self.cache_budget:
+                self.cache[key] = (template, body, size)
+                self.cache_size += size
+                while self.cache_size > self.cache_budget:
+                    _, (_, _, evicted_size) = self.cache.popitem(last=False)
+                    self.cache_size -= evicted_size
+        return template, body
+
+    def get(self, key):
+        """Return the replacement body for key, or None; recently used bodies are served from memory"""
+        return self._lookup(key)[1]
+
+    def get_template(self, key):
+        """Return the compiled template for key, reading it on a cache miss"""
+        return self._lookup(key)[0]
+
+
+class LazySnippetStore(CachedBodyStore):
+    """
+    Snippet store that keeps only the keys resident
+
+    Each body is recorded as a byte offset and length in the file, in two
+    compact arrays, and read on demand through a short-lived mmap into the
+    LRU cache of CachedBodyStore. The file is not kept mapped between reads,
+    so editors and the GUI can still rewrite it on Windows.
+    """
+
+    __slots__ = ("path", "index", "offsets", "lengths", "signature")
+
+    def __init__(self, path, cache_budget=1024 * 1024):
+        super().__init__(cache_budget)
+        self.path = path
+        self.index = {}
+        self.offsets = array('q')
+        self.lengths = array('q')
+        self.signature = None
+
+    def load_index(self, entries, signature=None):
+        """Replace the index with entries from scan_ini()"""
+        index = {}
+        offsets = array('q')
+        lengths = array('q')
+        for position, (key, (offset, length)) in enumerate(entries.items()):
+            index[key] = position
+            offsets.append(offset)
+            lengths.append(length)
+        with self.lock:
+            self.index, self.offsets, self.lengths = index, offsets, lengths
+            self._clear_cache()
+        self.signature = signature if signature is not None else file_signature(self.path)
+
+    def reindex(self, entries, signature=None):
+        """Load a new index and return (added, removed) keys"""
+        old = self.index
+        added = [key for key in entries if key not in old]
+        removed = [key for key in old if key not in entries]
+        self.load_index(entries, signature)
+        return added, removed
+
+    def is_stale(self):
+        """Return True if the file changed since it was last indexed"""
+        return file_signature(self.path) != self.signature
+
+    def has_body(self, key):
+        """Return True if key exists and has a non-empty body, without reading it"""
+        position = self.index.get(key)
+        return position is not None and self.lengths[position] > 0
+
+    def _read(self, key):
+        position = self.index.get(key)
+        if position is None:
+            return None
+        offset = self.offsets[position]
+        length = self.lengths[position]
+        if not length:
+            return ""
+        with open(self.path, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                raw = mapped[offset:offset + length]
+        body = raw.decode('utf-8')
+        if "\n" in body:
+            # Multi-line values are joined the way configparser does it, which
+            # only breaks lines at \n (and \r\n), not at U+2028 and the like
+            body = "\n".join(line.strip() for line in body.split("\n")).strip()
+        return body
+
+    def keys(self):
+        return self.index.keys()
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
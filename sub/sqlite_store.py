@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+SQLite snippet store for SnipIt
+Keeps large or shared snippet libraries in an indexed database instead of Input.ini
+"""
+
+import configparser
+import sqlite3
+import threading
+
+from sub.ini_writer import Transaction, apply_edits, write_atomic
+from sub.patterns import strip_patterns
+from sub.snippet_store import CachedBodyStore
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snippets (key TEXT PRIMARY KEY, body TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS settings (name TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID;
+INSERT OR IGNORE INTO meta VALUES ('generation', 0);
+"""
+
+# Every change, including ones made by other processes or by hand with the
+# sqlite3 shell, bumps the generation, which is what staleness checks compare
+TRIGGERS = "".join(
+    f"""
+CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()} AFTER {event} ON {table}
+BEGIN UPDATE meta SET value = value + 1 WHERE name = 'generation'; END;
+"""
+    for table in ("snippets", "settings")
+    for event in ("INSERT", "UPDATE", "DELETE")
+)
+
+
+class SqliteSnippetStore(CachedBodyStore):
+    """
+    Snippet store backed by an SQLite database
+
+    Offers the same lookups as SnippetStore. Only the keys, and which of them
+    have a body, stay in memory for the matcher; bodies are fetched by
+    primary key when a snippet expands, into the LRU cache of
+    CachedBodyStore. The database runs in WAL mode
+    so the GUI, other SnipIt instances and external tools can read while one
+    of them writes. Each thread gets its own connection.
+    """
+
+    def __init__(self, path, cache_budget=1024 * 1024):
+        super().__init__(cache_budget)
+        self.path = path
+        self.index = set()
+        self.filled = set()
+        self.signature = None
+        self.local = threading.local()
+        with self.connection() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA + TRIGGERS)
+
+    def connection(self):
+        """Return this thread's connection, opening it on first use"""
+        db = getattr(self.local, "db", None)
+        if db is None:
+            # Transactions are started explicitly where they are needed
+            db = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            db.execute("PRAGMA synchronous=NORMAL")
+            self.local.db = db
+        return db
+
+    def generation(self):
+        """Return the change counter of the database"""
+        row = self.connection().execute("SELECT value FROM meta WHERE name = 'generation'").fetchone()
+        return row[0] if row else 0
+
+    def load(self):
+        """Load the key set and return the settings as a dict with lowercase keys"""
+        db = self.connection()
+        # Read keys, settings and the generation from one snapshot
+        with db:
+            db.execute("BEGIN")
+            signature = self.generation()
+            keys = set()
+            filled = set()
+            for key, has_body in db.execute("SELECT key, body <> '' FROM snippets"):
+                keys.add(key)
+                if has_body:
+                    filled.add(key)
+            settings = self.settings()
+        with self.lock:
+            self.index = keys
+            self.filled = filled
+            self._clear_cache()
+        self.signature = signature
+        return settings
+
+    def refresh(self):
+        """Reload after a change and return (added, removed, settings)"""
+        old = self.index
+        settings = self.load()
+        added = [key for key in self.index if key not in old]
+        removed = [key for key in old if key not in self.index]
+        return added, removed, settings
+
+    def settings(self):
+        return {name.lower(): value for name, value in self.connection().execute("SELECT name, value FROM settings")}
+
+    def is_stale(self):
+        """Return True if the database changed since it was last loaded"""
+        return self.generation() != self.signature
+
+    def _read(self, key):
+        row = self.connection().execute("SELECT body FROM snippets WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def has_body(self, key):
+        """Return True if key exists and has a non-empty body, without touching the database"""
+        return key in self.filled
+
+    def items(self):
+        """Return all (key, body) pairs ordered by key"""
+        return self.connection().execute("SELECT key, body FROM snippets ORDER BY key").fetchall()
+
+    def keys(self):
+        return self.index
+
+    def __contains__(self, key):
+        return key in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def transaction(self):
+        return SqliteTransaction(self)
+
+    def import_ini(self, ini_path):
+        """Replace the snippets and settings with those of an INI file; return the snippet count"""
+        config = configparser.ConfigParser(interpolation=None)
+        with open(ini_path, 'r', encoding='utf-8') as f:
+            config.read_string(strip_patterns(f.read()), ini_path)
+        strings = dict(config["Strings"]) if "Strings" in config else {}
+        settings = dict(config["Settings"]) if "Settings" in config else {}
+        db = self.connection()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM snippets")
+            db.executemany("INSERT INTO snippets VALUES (?, ?)", strings.items())
+            db.execute("DELETE FROM settings")
+            db.executemany("INSERT INTO settings VALUES (?, ?)", settings.items())
+        return len(strings)
+
+    def export_ini(self, ini_path):
+        """Write the snippets and settings to an INI file; return the snippet count"""
+        items = self.items()
+        changes = {
+            "Strings": dict(items),
+            "Settings": dict(self.connection().execute("SELECT name, value FROM settings ORDER BY name")),
+        }
+        write_atomic(ini_path, "".join(apply_edits([], changes)).encode('utf-8'))
+        return len(items)
+
+
+class SqliteTransaction(Transaction):
+    """
+    A batch of edits to the database, with the same interface as IniTransaction
+
+    commit() applies every recorded edit in a single SQLite transaction.
+    """
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+
+    def ensure_section(self, section):
+        # Tables always exist
+        pass
+
+    def commit(self):
+        """Write all recorded edits and return the new generation"""
+        db = self.store.connection()
+        if self.changes:
+            tables = {"Strings": ("snippets", "key", "body"), "Settings": ("settings", "name", "value")}
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                for section, entries in self.changes.items():
+                    table, key_column, value_column = tables[section]
+                    removed = [(key,) for key, value in entries.items() if value is None]
+                    updates = [(key, value) for key, value in entries.items() if value is not None]
+                    db.executemany(f"DELETE FROM {table} WHERE {key_column} = ?", removed)
+                    db.executemany(f"INSERT OR REPLACE INTO {table} ({key_column}, {value_column}) VALUES (?, ?)", updates)
+            self.changes = {}
+        return self.store.generation()
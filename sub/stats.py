@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Latency statistics for SnipIt
+Fixed-bucket histograms of how long each stage of the pipeline takes
+"""
+
+import time
+
+# Bucket i counts samples below 2**i microseconds; the last bucket catches
+# everything slower (2**24 us is about 17 seconds)
+BUCKETS = 25
+
+# Pipeline stages in the order they run, used to order the dump
+STAGES = (
+    "hook",
+    "modifiers",
+    "buffer",
+    "check_for_snippets",
+    "get_replacement",
+    "replace_flags",
+    "clipboard_save",
+    "clipboard_copy",
+    "backspaces",
+    "settle",
+    "paste",
+    "type",
+    "clipboard_restore",
+    "expansion",
+)
+
+
+class Histogram:
+    """Counts of samples per power-of-two microsecond bucket"""
+
+    __slots__ = ("counts", "count", "total_ns", "max_ns")
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.count = 0
+        self.total_ns = 0
+        self.max_ns = 0
+
+    def add(self, elapsed_ns):
+        # Updates are not locked; a rare lost increment between threads is
+        # an acceptable price for keeping the hook path cheap
+        bucket = (elapsed_ns // 1000).bit_length()
+        self.counts[bucket if bucket < BUCKETS else BUCKETS - 1] += 1
+        self.count += 1
+        self.total_ns += elapsed_ns
+        if elapsed_ns > self.max_ns:
+            self.max_ns = elapsed_ns
+
+    def percentile_us(self, fraction):
+        """Return the upper bound in microseconds of the bucket holding the percentile"""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(float(2 ** bucket), self.max_ns / 1000.0)
+        return self.max_ns / 1000.0
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_us": (self.total_ns / self.count / 1000.0) if self.count else 0.0,
+            "p50_us": self.percentile_us(0.50),
+            "p99_us": self.percentile_us(0.99),
+            "max_us": self.max_ns / 1000.0,
+            "buckets_us": {str(2 ** bucket): count for bucket, count in enumerate(self.counts) if count},
+        }
+
+
+class LatencyStats:
+    """
+    Per-stage histograms that cost next to nothing while disabled
+
+    Instrumented code calls start() to take a timestamp and record() with the
+    stage name and that timestamp. While disabled start() returns 0 without
+    reading the clock and record() returns immediately.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.histograms = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def reset(self):
+        self.histograms = {}
+
+    def start(self):
+        return time.perf_counter_ns() if self.enabled else 0
+
+    def record(self, stage, start):
+        if not start:
+            return
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms.setdefault(stage, Histogram())
+        histogram.add(time.perf_counter_ns() - start)
+
+    def snapshot(self):
+        """Return a summary of every stage with samples, in pipeline order"""
+        order = {stage: index for index, stage in enumerate(STAGES)}
+        stages = sorted(self.histograms, key=lambda stage: (order.get(stage, len(order)), stage))
+        return {stage: self.histograms[stage].summary() for stage in stages}
+
+    def format_table(self):
+        snapshot = self.snapshot()
+        if not snapshot:
+            return "No latency samples recorded."
+        lines = [f"{'stage':<20} {'count':>8} {'mean':>10} {'p50':>10} {'p99':>10} {'max':>10}"]
+        lines.append("-" * len(lines[0]))
+        for stage, summary in snapshot.items():
+            lines.append(f"{stage:<20} {summary['count']:>8} {summary['mean_us']:>10.1f} "
+                         f"{summary['p50_us']:>10.1f} {summary['p99_us']:>10.1f} {summary['max_us']:>10.1f}")
+        lines.append("(microseconds; p50/p99 are bucket upper bounds)")
+        return "\n".join(lines)
+
+    def format_json(self):
+        import json
+        return json.dumps(self.snapshot(), indent=2)
+
+    def dump(self, fmt="table"):
+        """Return the statistics as a table or as JSON"""
+        return self.format_json() if fmt == "json" else self.format_table()
+
+
+class StartupProfile:
+    """
+    Wall-clock time of each startup phase
+
+    mark() closes the phase that started at the previous mark (or when the
+    profile was created) under the given name.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.last = self.started
+        self.phases = []
+
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def format_table(self):
+        lines = [f"{'phase':<28} {'ms':>9} {'total ms':>9}"]
+        lines.append("-" * len(lines[0]))
+        total = 0.0
+        for name, seconds in self.phases:
+            total += seconds
+            lines.append(f"{name:<28} {seconds * 1000:>9.1f} {total * 1000:>9.1f}")
+        return "\n".join(lines)
+
+
+# Shared instances used by all modules
+latency = LatencyStats()
+startup = StartupProfile()
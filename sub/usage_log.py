@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Usage log for SnipIt
+Records which snippets are expanded, for pruning the library and reporting
+"""
+
+import threading
+import time
+import traceback
+
+
+class UsageLog:
+    """
+    Append-only log of expansions, written in batches by a background thread
+
+    record() only appends a tuple to an in-memory buffer. The writer thread
+    appends the buffered records to the file every flush_interval seconds,
+    or sooner once max_buffer records are waiting, so no expansion ever
+    waits on the disk. Each record is one line:
+
+        <unix time>\t<latency in microseconds>\t<replacement length>\t<snippet>
+    """
+
+    def __init__(self, path, flush_interval=5.0, max_buffer=256, debugging=False):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.debugging = debugging
+        self.enabled = True
+        self.condition = threading.Condition()
+        self.buffer = []
+        self.thread = None
+
+    def start(self):
+        """Start the writer thread once"""
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, name="snipit-usage-log", daemon=True)
+            self.thread.start()
+
+    def record(self, snippet, replacement_length, latency_us):
+        """Buffer one expansion"""
+        if not self.enabled:
+            return
+        with self.condition:
+            self.buffer.append((int(time.time()), int(latency_us), replacement_length, snippet))
+            if len(self.buffer) >= self.max_buffer:
+                self.condition.notify()
+
+    def flush(self):
+        """Write the buffered records now"""
+        with self.condition:
+            records, self.buffer = self.buffer, []
+        if not records:
+            return
+        lines = "".join(
+            f"{timestamp}\t{latency_us}\t{length}\t{snippet.replace(chr(10), ' ')}\n"
+            for timestamp, latency_us, length, snippet in records
+        )
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(lines)
+        except Exception as e:
+            print(f"Error writing usage log: {e}")
+            if self.debugging:
+                traceback.print_exc()
+
+    def _run(self):
+        while True:
+            with self.condition:
+                if len(self.buffer) < self.max_buffer:
+                    self.condition.wait(self.flush_interval)
+            self.flush()
+
+
+def read_usage(path):
+    """
+    Aggregate a usage log
+
+    Returns {snippet: [count, last used, total latency in us, total length]}.
+    Lines that cannot be parsed, such as one cut short by a crash, are skipped.
+    """
+    usage = {}
+    try:
+        f = open(path, 'r', encoding='utf-8', errors='replace')
+    except FileNotFoundError:
+        return usage
+    with f:
+        for line in f:
+            fields = line.rstrip("\n").split("\t", 3)
+            if len(fields) != 4:
+                continue
+            try:
+                timestamp, latency_us, length = int(fields[0]), int(fields[1]), int(fields[2])
+            except ValueError:
+                continue
+            entry = usage.get(fields[3])
+            if entry is None:
+                usage[fields[3]] = [1, timestamp, latency_us, length]
+            else:
+                entry[0] += 1
+                if timestamp > entry[1]:
+                    entry[1] = timestamp
+                entry[2] += latency_us
+                entry[3] += length
+    return usage
+
+
+def format_report(usage, library_keys, top=20):
+    """Return a text report of the most used and the never used snippets"""
+    total = sum(entry[0] for entry in usage.values())
+    library_keys = set(library_keys)
+    lines = [f"{total} expansions of {len(usage)} snippets recorded; {len(library_keys)} snippets in the library", ""]
+
+    ranked = sorted(usage.items(), key=lambda item: (-item[1][0], item[0]))
+    lines.append(f"Top {min(top, len(ranked))} snippets:")
+    lines.append(f"  {'snippet':<12} {'count':>8} {'share':>7} {'mean ms':>8} {'mean len':>8}  last used")
+    for key, (count, last, latency_us, length) in ranked[:top]:
+        marker = "" if key in library_keys else "  (removed)"
+        lines.append(f"  {key:<12} {count:>8} {count / total:>7.1%} {latency_us / count / 1000:>8.1f} "
+                     f"{length / count:>8.0f}  {time.strftime('%Y-%m-%d %H:%M', time.localtime(last))}{marker}")
+
+    unused = sorted(key for key in library_keys if key not in usage)
+    lines.append("")
+    lines.append(f"Never used ({len(unused)}):")
+    for start in range(0, len(unused), 8):
+        lines.append("  " + " ".join(unused[start:start + 8]))
+    return "\n".join(lines)
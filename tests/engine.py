@@ -0,0 +1,43 @@
+"""Runs the snipit engine against a temporary Input.ini, with the benchmark's keyboard and clipboard fakes"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import benchmark  # noqa: F401  (installs the keyboard and pyperclip fakes before snipit is imported)
+import snipit
+from sub.snippet_store import SnippetStore
+
+# Globals of snipit that a test points at its own files
+STATE = ("input_file", "list_file", "cache_file", "key_array", "matcher", "snippet_store", "pattern_matcher")
+
+
+class EngineTestCase(unittest.TestCase):
+    """Saves and restores the engine state around each test; write() creates Input.ini"""
+
+    def setUp(self):
+        saved = {name: getattr(snipit, name) for name in STATE}
+        saved_usage_path = snipit.usage_log.path
+        self.addCleanup(lambda: [setattr(snipit, name, value) for name, value in saved.items()])
+        self.addCleanup(setattr, snipit.usage_log, "path", saved_usage_path)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        snipit.input_file = os.path.join(self.directory, "Input.ini")
+        snipit.list_file = os.path.join(self.directory, "List.txt")
+        snipit.cache_file = os.path.join(self.directory, "Input.cache")
+        snipit.usage_log.path = os.path.join(self.directory, "Usage.log")
+        snipit.snippet_store = SnippetStore(snipit.input_file)
+
+    def write(self, text):
+        """Replace Input.ini with text; the mtime moves forward so the change is always seen"""
+        with open(snipit.input_file, "w", encoding="utf-8") as f:
+            f.write(text)
+        stat = os.stat(snipit.input_file)
+        os.utime(snipit.input_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    def read_config(self):
+        import configparser
+        config = configparser.ConfigParser(interpolation=None)
+        config.read(snipit.input_file, encoding="utf-8")
+        return config
@@ -0,0 +1,79 @@
+"""Tests for the clipboard restore service"""
+
+import time
+import unittest
+
+from sub.clipboard_manager import ClipboardManager
+
+
+class FakeClipboard:
+    def __init__(self, text=""):
+        self.text = text
+        self.copies = []
+        self.pastes = 0
+
+    def copy(self, text):
+        self.copies.append(text)
+        self.text = text
+
+    def paste(self):
+        self.pastes += 1
+        return self.text
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+class ClipboardManagerTest(unittest.TestCase):
+    def expand(self, manager, text):
+        manager.hold()
+        manager.copy(text)
+        manager.release()
+
+    def test_burst_is_saved_and_restored_once(self):
+        clipboard = FakeClipboard("user text")
+        manager = ClipboardManager(clipboard, settle_delay=0.05)
+        for text in ("one", "two", "three"):
+            self.expand(manager, text)
+        self.assertEqual(clipboard.text, "three")
+        self.assertTrue(wait_until(lambda: manager.saved is None))
+        self.assertEqual(clipboard.text, "user text")
+        # One save for the burst, one check before the restore
+        self.assertEqual(clipboard.pastes, 2)
+        self.assertEqual(clipboard.copies, ["one", "two", "three", "user text"])
+
+    def test_restore_waits_while_held(self):
+        clipboard = FakeClipboard("user text")
+        manager = ClipboardManager(clipboard, settle_delay=0.01)
+        self.expand(manager, "one")
+        manager.hold()
+        time.sleep(0.05)
+        self.assertEqual(clipboard.text, "one")
+        manager.release()
+        self.assertTrue(wait_until(lambda: clipboard.text == "user text"))
+
+    def test_new_user_copy_is_kept(self):
+        clipboard = FakeClipboard("user text")
+        manager = ClipboardManager(clipboard, settle_delay=60)
+        self.expand(manager, "one")
+        clipboard.text = "copied later"
+        manager.restore_now()
+        self.assertEqual(clipboard.text, "copied later")
+        self.assertIsNone(manager.saved)
+
+    def test_restore_now(self):
+        clipboard = FakeClipboard("user text")
+        manager = ClipboardManager(clipboard, settle_delay=60)
+        self.expand(manager, "one")
+        manager.restore_now()
+        self.assertEqual(clipboard.text, "user text")
+
+
+if __name__ == "__main__":
+    unittest.main()
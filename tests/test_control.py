@@ -0,0 +1,128 @@
+"""Tests for the control socket server and client"""
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+from sub.control import (ControlError, ControlServer, RemoteTransaction, USE_UNIX_SOCKET, default_socket_path,
+                         send_command)
+from tests.engine import EngineTestCase, snipit
+
+
+class ControlServerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = default_socket_path(self.directory)
+        self.snippets = {}
+
+        def add(snippets):
+            self.snippets.update(snippets)
+            return len(snippets)
+
+        def remove(keys):
+            for key in keys:
+                self.snippets.pop(key, None)
+            return len(keys)
+
+        def fail():
+            raise RuntimeError("storage is read-only")
+
+        commands = {"add": add, "remove": remove, "count": lambda: len(self.snippets), "fail": fail}
+        self.server = ControlServer(commands, self.path)
+        self.assertTrue(self.server.start())
+        self.addCleanup(self.server.stop)
+
+    def test_dispatches_commands_with_arguments(self):
+        self.assertEqual(send_command(self.path, "add", snippets={"btw": "by the way"}), 1)
+        self.assertEqual(send_command(self.path, "count"), 1)
+        self.assertEqual(self.snippets, {"btw": "by the way"})
+
+    def test_errors_are_reported(self):
+        with self.assertRaisesRegex(ControlError, "unknown command: nope"):
+            send_command(self.path, "nope")
+        with self.assertRaisesRegex(ControlError, "storage is read-only"):
+            send_command(self.path, "fail")
+        with self.assertRaisesRegex(ControlError, "unexpected keyword"):
+            send_command(self.path, "count", extra=1)
+        # The server keeps serving after errors
+        self.assertEqual(send_command(self.path, "count"), 0)
+
+    def test_remote_transaction(self):
+        self.snippets["old"] = "x"
+        with RemoteTransaction(self.path) as transaction:
+            transaction.set("BTW", "by the way")
+            transaction.remove("old")
+            with self.assertRaises(ValueError):
+                transaction.set_setting("SoundSetting", 1)
+            self.assertEqual(len(transaction), 2)
+        self.assertFalse(transaction)
+        self.assertEqual(self.snippets, {"btw": "by the way"})
+
+    def test_rejected_edits_are_not_sent_again(self):
+        def reject(snippets):
+            raise ValueError("invalid snippet")
+
+        transaction = RemoteTransaction(self.path)
+        self.server.commands["add"] = reject
+        transaction.set("bad", "x")
+        with self.assertRaises(ControlError):
+            transaction.commit()
+        self.assertFalse(transaction)
+        self.server.commands["add"] = lambda snippets: self.snippets.update(snippets)
+        transaction.set("good", "y")
+        transaction.commit()
+        self.assertEqual(self.snippets, {"good": "y"})
+
+    @unittest.skipUnless(USE_UNIX_SOCKET, "needs Unix domain sockets")
+    def test_invalid_requests(self):
+        for line in (b"not json\n", b"[1, 2]\n"):
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as connection:
+                connection.settimeout(5)
+                connection.connect(self.path)
+                connection.sendall(line)
+                self.assertIn(b'"invalid request', connection.recv(65536))
+
+    @unittest.skipUnless(USE_UNIX_SOCKET, "needs Unix domain sockets")
+    def test_second_server_does_not_take_over(self):
+        self.assertFalse(ControlServer({}, self.path).start())
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+
+    def test_client_without_server(self):
+        self.server.stop()
+        with self.assertRaisesRegex(ControlError, "not running"):
+            send_command(self.path, "count", timeout=1)
+
+
+
+class ControlCommandTest(EngineTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("[Strings]\nbtw = by the way\nsig = Sig\n")
+        snipit.read_ini_file()
+
+    def test_add_and_remove(self):
+        self.assertEqual(snipit.control_add({"my sig": "a\rb\r\nc", "BTW": "by the way!"})["added"], 2)
+        self.assertEqual(snipit.matcher.match("so my sig"), "my sig")
+        self.assertEqual(snipit.snippet_store.get("my sig"), "a\nb\nc")
+        self.assertEqual(dict(self.read_config()["Strings"]),
+                         {"btw": "by the way!", "sig": "Sig", "my sig": "a\nb\nc"})
+        result = snipit.control_remove(["sig", "gone"])
+        self.assertEqual((result["removed"], result["missing"]), (1, ["gone"]))
+        self.assertNotIn("sig", self.read_config()["Strings"])
+
+    def test_invalid_edits_change_nothing(self):
+        for snippets in ({}, {" sig": "x"}, {"a\tb": "x"}, {"a=b": "x"}, {"#x": "x"}, {"k": ""}, {"k": "  "},
+                         {"k": 5}, {"toolongtobekey": "x"}):
+            with self.assertRaises(ValueError, msg=snippets):
+                snipit.control_add(snippets)
+        for keys in ("sig", [], ["sig", 1], None):
+            with self.assertRaises(ValueError, msg=keys):
+                snipit.control_remove(keys)
+        self.assertEqual(dict(self.read_config()["Strings"]), {"btw": "by the way", "sig": "Sig"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Tests for the in-flight key policy of the expansion worker"""
+
+import threading
+import unittest
+
+from sub.expansion_worker import ExpansionWorker
+
+
+class ExpansionWorkerTest(unittest.TestCase):
+    def test_keys_while_waiting_become_trailing_text(self):
+        worker = ExpansionWorker(handler=None)
+        job = worker.submit("btw")
+        self.assertTrue(worker.busy())
+        self.assertTrue(worker.note_key("x"))
+        self.assertTrue(worker.note_key("y"))
+        self.assertTrue(worker.note_backspace())
+        self.assertEqual(worker.begin(job), "x")
+        # Once injection started, keys are the worker's own
+        self.assertFalse(worker.note_key("z"))
+        self.assertFalse(worker.note_backspace())
+        self.assertTrue(worker.injecting.is_set())
+
+    def test_backspace_without_trailing_cancels(self):
+        worker = ExpansionWorker(handler=None)
+        job = worker.submit("btw")
+        self.assertTrue(worker.note_backspace())
+        self.assertTrue(job.cancelled)
+        self.assertFalse(worker.busy())
+        self.assertIsNone(worker.begin(job))
+        self.assertFalse(worker.note_key("x"))
+
+    def test_idle_worker_ignores_keys(self):
+        worker = ExpansionWorker(handler=None)
+        self.assertFalse(worker.busy())
+        self.assertFalse(worker.note_key("x"))
+        self.assertFalse(worker.note_backspace())
+
+    def test_jobs_run_in_order_and_skip_cancelled(self):
+        done = threading.Event()
+        handled = []
+
+        def handler(job):
+            trailing = worker.begin(job)
+            handled.append((job.snippet, trailing))
+            if job.snippet == "last":
+                done.set()
+
+        worker = ExpansionWorker(handler)
+        first = worker.submit("first")
+        worker.note_key("!")
+        cancelled = worker.submit("cancelled")
+        worker.note_backspace()
+        worker.submit("last")
+        worker.start()
+        self.assertTrue(done.wait(5))
+        self.assertTrue(cancelled.cancelled and not first.cancelled)
+        self.assertEqual(handled, [("first", "!"), ("last", "")])
+
+    def test_handler_errors_do_not_stop_the_worker(self):
+        done = threading.Event()
+
+        def handler(job):
+            worker.begin(job)
+            if job.snippet == "bad":
+                raise RuntimeError("boom")
+            done.set()
+
+        worker = ExpansionWorker(handler)
+        worker.start()
+        worker.submit("bad")
+        worker.submit("good")
+        self.assertTrue(done.wait(5))
+
+
+if __name__ == "__main__":
+    unittest.main()
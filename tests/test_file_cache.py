@@ -0,0 +1,80 @@
+"""Tests for the {file:...} include cache"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from sub.file_cache import FileCache
+
+
+class FileCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, name, text, mtime=None):
+        path = os.path.join(self.directory, name)
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+        return path
+
+    def test_relative_paths_and_decoding(self):
+        cache = FileCache(self.directory)
+        self.write("sig.txt", "\ufeffBest\r\nregards")
+        self.assertEqual(cache.read("sig.txt"), "Best\nregards")
+        with self.assertRaises(OSError):
+            cache.read("missing.txt")
+
+    def test_changes_are_seen_after_the_check_interval(self):
+        cache = FileCache(self.directory, check_interval=0)
+        path = self.write("a.txt", "old", mtime=1_000_000)
+        self.assertEqual(cache.read(path), "old")
+        self.write("a.txt", "new text", mtime=2_000_000)
+        self.assertEqual(cache.read(path), "new text")
+        self.assertEqual(cache.size, len("new text"))
+
+    def test_hits_within_the_interval_skip_the_disk(self):
+        cache = FileCache(self.directory, check_interval=60)
+        path = self.write("a.txt", "old", mtime=1_000_000)
+        cache.read(path)
+        self.write("a.txt", "new", mtime=2_000_000)
+        self.assertEqual(cache.read(path), "old")
+        os.remove(path)
+        self.assertEqual(cache.read(path), "old")
+
+    def test_unchanged_file_is_not_read_again(self):
+        cache = FileCache(self.directory, check_interval=0)
+        path = self.write("a.txt", "text", mtime=1_000_000)
+        first = cache.read(path)
+        loads = []
+        cache._load = lambda full_path: loads.append(full_path)
+        self.assertIs(cache.read(path), first)
+        self.assertEqual(loads, [])
+
+    def test_budget_evicts_least_recently_used(self):
+        cache = FileCache(self.directory, budget=10)
+        for name in ("a", "b", "c"):
+            self.write(name, name * 4)
+        cache.read("a")
+        cache.read("b")
+        cache.read("a")
+        cache.read("c")
+        self.assertEqual([os.path.basename(path) for path in cache.entries], ["a", "c"])
+        self.assertEqual(cache.size, 8)
+
+    def test_files_over_budget_are_not_cached(self):
+        cache = FileCache(self.directory, budget=4)
+        self.write("small", "abc")
+        self.write("big", "x" * 5)
+        cache.read("small")
+        self.assertEqual(cache.read("big"), "xxxxx")
+        self.assertEqual([os.path.basename(path) for path in cache.entries], ["small"])
+        cache.clear()
+        self.assertEqual((len(cache.entries), cache.size), (0, 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,32 @@
+"""Tests for the settings GUI's snippet model, without opening a window"""
+
+import unittest
+
+from sub.gui import SnippetModel
+
+
+class SnippetModelTest(unittest.TestCase):
+    def test_filter_and_edits_keep_order(self):
+        model = SnippetModel({"sig": "Best regards", "btw": "by the way", "ty": "thank you"})
+        self.assertEqual(list(model.visible), ["btw", "sig", "ty"])
+        model.filter("b")
+        self.assertEqual(model.visible, ["btw", "sig"])
+        model.filter("by")
+        self.assertEqual(model.visible, ["btw"])
+        model.set("abc", "by all means")
+        model.set("ty", "thanks")
+        self.assertEqual(model.visible, ["abc", "btw"])
+        model.remove("btw")
+        self.assertEqual(model.visible, ["abc"])
+        model.filter("")
+        self.assertEqual(model.visible, ["abc", "sig", "ty"])
+
+    def test_reset_keeps_the_filter(self):
+        model = SnippetModel({"btw": "by the way"})
+        model.filter("way")
+        model.reset({"a": "one way", "b": "two", "c": "no way"})
+        self.assertEqual((model.query, model.visible, len(model.keys)), ("way", ["a", "c"], 3))
+
+
+if __name__ == "__main__":
+    unittest.main()
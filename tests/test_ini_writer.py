@@ -0,0 +1,130 @@
+"""Tests for the Input.ini writer"""
+
+import configparser
+import os
+import shutil
+import tempfile
+import unittest
+
+from sub.ini_writer import IniTransaction, apply_edits, check_snippet_key, split_lines
+
+INI = """\
+; SnipIt snippets
+[Settings]
+debug = false
+
+[Strings]
+sig = Best regards.{n}John
+btw=by the way
+multi = first
+\tsecond
+# comment = not a key
+Mixed : colon value
+
+[Extra]
+other = 1
+"""
+
+
+def edit(text, changes, newline="\n"):
+    return "".join(apply_edits(split_lines(text), changes, newline))
+
+
+def parse(text):
+    config = configparser.ConfigParser(interpolation=None)
+    config.read_string(text)
+    return config
+
+
+class ApplyEditsTest(unittest.TestCase):
+    def test_no_changes_is_identity(self):
+        self.assertEqual(edit(INI, {}), INI)
+
+    def test_edit_keeps_spacing_and_other_lines(self):
+        result = edit(INI, {"Strings": {"btw": "by  the way", "sig": "Cheers"}})
+        self.assertIn("btw=by  the way\n", result)
+        self.assertIn("sig = Cheers\n", result)
+        self.assertEqual(result.replace("btw=by  the way", "btw=by the way")
+                         .replace("sig = Cheers", "sig = Best regards.{n}John"), INI)
+
+    def test_replace_and_delete_multiline(self):
+        result = edit(INI, {"Strings": {"multi": "one\ntwo"}})
+        self.assertEqual(parse(result)["Strings"]["multi"], "one\ntwo")
+        result = edit(INI, {"Strings": {"multi": None, "mixed": None}})
+        strings = parse(result)["Strings"]
+        self.assertNotIn("multi", strings)
+        self.assertNotIn("mixed", strings)
+        self.assertNotIn("second", result)
+        self.assertIn("# comment = not a key", result)
+
+    def test_new_key_goes_before_trailing_blank(self):
+        result = edit(INI, {"Strings": {"new": "value"}})
+        self.assertIn("Mixed : colon value\nnew = value\n\n[Extra]", result)
+
+    def test_new_section_and_newline_style(self):
+        text = INI.replace("\n", "\r\n")
+        result = edit(text, {"Patterns2": {"key": "a\nb"}}, newline="\r\n")
+        self.assertTrue(result.endswith("\r\n\r\n[Patterns2]\r\nkey = a\r\n\tb\r\n"))
+        self.assertEqual(parse(result.replace("\r\n", "\n"))["Patterns2"]["key"], "a\nb")
+
+    def test_round_trips_through_configparser(self):
+        changes = {"Strings": {"sig": "x", "btw": None, "added": "y"}, "Settings": {"debug": "true"}}
+        config = parse(edit(INI, changes))
+        expected = dict(parse(INI)["Strings"])
+        expected.update(sig="x", added="y")
+        del expected["btw"]
+        self.assertEqual(dict(config["Strings"]), expected)
+        self.assertEqual(config["Settings"]["debug"], "true")
+
+
+class IniTransactionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "Input.ini")
+
+    def read(self):
+        config = configparser.ConfigParser(interpolation=None)
+        config.read(self.path, encoding="utf-8")
+        return config
+
+    def test_unicode_line_separators_stay_inside_values(self):
+        body = "hello\u2028world\x0cpage\x85end"
+        with open(self.path, "w", encoding="utf-8", newline="") as f:
+            f.write(f"[Strings]\nsep = {body}\nbtw = by the way\n")
+        with IniTransaction(self.path) as transaction:
+            transaction.set("btw", "by the way!")
+        self.assertEqual(dict(self.read()["Strings"]), {"sep": body, "btw": "by the way!"})
+        with IniTransaction(self.path) as transaction:
+            transaction.set("sep", body + "\u2029again")
+        self.assertEqual(self.read()["Strings"]["sep"], body + "\u2029again")
+
+    def test_lone_carriage_returns_become_continuation_lines(self):
+        with IniTransaction(self.path) as transaction:
+            transaction.set("k", "a\rb\r\nc")
+        self.assertEqual(self.read()["Strings"]["k"], "a\nb\nc")
+        with open(self.path, encoding="utf-8", newline="") as f:
+            self.assertNotIn("\r", f.read())
+
+    def test_split_lines(self):
+        self.assertEqual(split_lines("a\r\nb\u2028c\nd"), ["a\r\n", "b\u2028c\n", "d"])
+        self.assertEqual(split_lines("a\n"), ["a\n"])
+        self.assertEqual(split_lines(""), [])
+
+
+
+class CheckSnippetKeyTest(unittest.TestCase):
+    def test_keys_that_round_trip(self):
+        for key in ("btw", "my sig", "Ab.1", "x[y]", "a#b", "émoji😀"):
+            check_snippet_key(key)
+            config = parse(f"[Strings]\n{key} = value\n")
+            self.assertEqual(dict(config["Strings"]), {key.lower(): "value"})
+
+    def test_keys_that_break_the_line(self):
+        for key in ("", " sig", "sig ", "a\tb", "a\rb", "a\nb", "a=b", "a:b", "[x", "#x", ";x", "x" * 11, None):
+            with self.assertRaises(ValueError, msg=repr(key)):
+                check_snippet_key(key)
+
+
+if __name__ == "__main__":
+    unittest.main()
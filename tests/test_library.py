@@ -0,0 +1,120 @@
+"""Tests for the snippet library and the stream expander"""
+
+import contextlib
+import datetime
+import io
+import os
+import random
+import tempfile
+import unittest
+
+from sub.library import SnippetLibrary, expand_main, expand_stream
+from sub.replace_flags import include_cache
+from sub.snippet_store import SnippetStore
+
+NOW = datetime.datetime(2026, 10, 17, 9, 5, 3)
+
+STRINGS = {
+    "btw": "by the way",
+    "tw": "TW",
+    "sig": "Best regards.{n}John",
+    "ddate": "%yyyy-%MM-%dd",
+    "xx": "a longer replacement than the typing threshold",
+    "hole": "",
+}
+
+PATTERNS = {r"(\d+)q\s": "{1} quid "}
+
+
+def make_library(patterns=None):
+    store = SnippetStore("Input.ini")
+    store.load(STRINGS, signature=(0, 0))
+    return SnippetLibrary(store, patterns)
+
+
+def random_text(seed, length=3000):
+    rng = random.Random(seed)
+    words = list(STRINGS) + ["b", "t", "w", "s", "i", "g", "12q ", "7q\t", "q ", "é", "\n", " ", "x"]
+    return "".join(rng.choice(words) for _ in range(length // 3))
+
+
+class ExpanderTest(unittest.TestCase):
+    def test_expand_text(self):
+        library = make_library()
+        self.assertEqual(library.expand_text("say btw, sig: ddate hole", NOW),
+                         "say by the way, Best regards.\nJohn: 2026-10-17 hole")
+        self.assertEqual(library.expand_text("xtw btw", NOW), "xTW by the way")
+
+    def test_chunk_size_does_not_change_output(self):
+        for patterns in (None, PATTERNS):
+            library = make_library(patterns)
+            text = random_text(11)
+            expected = library.expand_text(text, NOW)
+            for chunk_size in (1, 7, 4096):
+                source = io.BytesIO(text.encode("utf-8"))
+                target = io.BytesIO()
+                read, count = expand_stream(library, source, target, chunk_size, NOW)
+                self.assertEqual(read, len(text.encode("utf-8")))
+                self.assertEqual(target.getvalue().decode("utf-8"), expected, (patterns, chunk_size))
+
+    def test_invalid_utf8_passes_through(self):
+        library = make_library()
+        target = io.BytesIO()
+        expand_stream(library, io.BytesIO(b"\xff btw \xfe"), target, 2, NOW)
+        self.assertEqual(target.getvalue(), b"\xff by the way \xfe")
+
+
+class LibraryFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def make_ini(self, name, text):
+        folder = os.path.join(self.tmp.name, name)
+        os.makedirs(folder)
+        with open(os.path.join(folder, "sig.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+        path = os.path.join(folder, "Input.ini")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("[Strings]\nsig = {file:sig.txt}\n")
+        return path
+
+    def test_includes_are_relative_to_each_library(self):
+        base_dir = include_cache.base_dir
+        first = SnippetLibrary.from_ini(self.make_ini("a", "Alice"))
+        second = SnippetLibrary.from_ini(self.make_ini("b", "Bob"))
+        self.assertEqual(first.expand_text("sig"), "Alice")
+        self.assertEqual(second.expand_text("sig"), "Bob")
+        self.assertEqual(include_cache.base_dir, base_dir)
+
+    def run_expand(self, argv):
+        source = os.path.join(self.tmp.name, "report.txt")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("sig")
+        out = os.path.join(self.tmp.name, "out")
+        stderr = io.StringIO()
+        with contextlib.redirect_stderr(stderr):
+            status = expand_main(argv + ["-q", "--output-dir", out, source], "Input.ini")
+        return status, stderr.getvalue(), os.path.join(out, "report.txt")
+
+    def test_expand_main(self):
+        status, errors, target = self.run_expand(["--input", self.make_ini("a", "Alice")])
+        self.assertEqual((status, errors), (0, ""))
+        with open(target, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "Alice")
+
+    def test_expand_main_reports_library_errors(self):
+        broken = os.path.join(self.tmp.name, "broken.ini")
+        with open(broken, "w", encoding="utf-8") as f:
+            f.write("sig = no section\n")
+        for argv in (["--input", os.path.join(self.tmp.name, "missing.ini")],
+                     ["--input", broken],
+                     ["--db", os.path.join(self.tmp.name, "missing.db")]):
+            status, errors, target = self.run_expand(argv)
+            self.assertEqual(status, 2, argv)
+            self.assertTrue(errors.startswith("Error loading snippets from "), errors)
+            self.assertFalse(os.path.exists(target))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Tests for the snippet trie"""
+
+import random
+import unittest
+
+from sub.matcher import SnippetMatcher
+
+
+def linear_match(keys, text):
+    """The original lookup: the longest key that text ends with"""
+    for key in sorted(keys, key=len, reverse=True):
+        if text.endswith(key):
+            return key
+    return None
+
+
+class SnippetMatcherTest(unittest.TestCase):
+    def test_longest_key_wins(self):
+        matcher = SnippetMatcher(["bt", "btw", "w"])
+        self.assertEqual(matcher.match("say btw"), "btw")
+        self.assertEqual(matcher.match("xbt"), "bt")
+        self.assertEqual(matcher.match("saw"), "w")
+        self.assertIsNone(matcher.match("btx"))
+        self.assertIsNone(matcher.match(""))
+
+    def test_add_remove_and_prune(self):
+        matcher = SnippetMatcher(["abc", "bc"])
+        self.assertEqual(len(matcher), 2)
+        self.assertTrue(matcher.remove("abc"))
+        self.assertFalse(matcher.remove("abc"))
+        self.assertNotIn("abc", matcher)
+        self.assertIn("bc", matcher)
+        self.assertEqual(matcher.match("abc"), "bc")
+        matcher.remove("bc")
+        self.assertEqual(matcher.root, {})
+        self.assertEqual(len(matcher), 0)
+
+    def test_agrees_with_linear_scan(self):
+        rng = random.Random(7)
+        keys = {"".join(rng.choice("abc") for _ in range(rng.randint(1, 5))) for _ in range(40)}
+        matcher = SnippetMatcher(keys)
+        for _ in range(2000):
+            text = "".join(rng.choice("abcd") for _ in range(rng.randint(0, 8)))
+            self.assertEqual(matcher.match(text), linear_match(keys, text), text)
+
+
+if __name__ == "__main__":
+    unittest.main()
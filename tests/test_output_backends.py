@@ -0,0 +1,85 @@
+"""Tests for the output policy, replayed through the recording backend"""
+
+import datetime
+import random
+import unittest
+
+from sub.library import SnippetLibrary
+from sub.output_backends import OutputPolicy, RecordingBackend
+from sub.patterns import PatternMatch
+from sub.ring_buffer import RingBuffer
+from sub.snippet_store import SnippetStore
+
+NOW = datetime.datetime(2026, 10, 17, 9, 5, 3)
+
+STRINGS = {
+    "btw": "by the way",
+    "tw": "TW",
+    "sig": "Best regards.{n}John",
+    "ddate": "%yyyy-%MM-%dd",
+    "xx": "a longer replacement than the typing threshold",
+    "hole": "",
+}
+
+PATTERNS = {r"(\d+)q\s": "{1} quid "}
+
+
+def make_library(patterns=None):
+    store = SnippetStore("Input.ini")
+    store.load(STRINGS, signature=(0, 0))
+    return SnippetLibrary(store, patterns)
+
+
+def simulate_typing(library, text, policy):
+    """
+    Type text one character at a time through the live engine's steps
+
+    Returns the text on the screen of the simulated target window.
+    """
+    log = RingBuffer(library.window)
+    screen = RecordingBackend()
+    for char in text:
+        screen.replace(0, char)
+        log.append(char)
+        trigger = library.match(log)
+        if trigger is None:
+            continue
+        replacement = library.expand(trigger, NOW)
+        delete_count = len(trigger.text) if isinstance(trigger, PatternMatch) else len(trigger)
+        policy.select(replacement).replace(delete_count, replacement)
+        screen.replace(delete_count, replacement)
+        log.clear()
+    return screen.text
+
+
+def random_text(seed, length=3000):
+    rng = random.Random(seed)
+    words = list(STRINGS) + ["b", "t", "w", "s", "i", "g", "12q ", "7q\t", "q ", "é", "\n", " ", "x"]
+    return "".join(rng.choice(words) for _ in range(length // 3))
+
+
+class EngineLoopTest(unittest.TestCase):
+    def test_typing_matches_expander(self):
+        for patterns in (None, PATTERNS):
+            library = make_library(patterns)
+            for seed in range(5):
+                text = random_text(seed, 600)
+                typing, paste = RecordingBackend(), RecordingBackend()
+                policy = OutputPolicy(typing, paste)
+                self.assertEqual(simulate_typing(library, text, policy), library.expand_text(text, NOW))
+
+    def test_policy_routes_replacements(self):
+        typing, paste = RecordingBackend(), RecordingBackend()
+        simulate_typing(make_library(PATTERNS), "btw sig xx 12q ", OutputPolicy(typing, paste))
+        self.assertEqual(typing.calls, [(3, "by the way"), (4, "12 quid ")])
+        self.assertEqual(paste.calls, [(3, "Best regards.\nJohn"),
+                                       (2, "a longer replacement than the typing threshold")])
+
+    def test_threshold_zero_always_pastes(self):
+        typing, paste = RecordingBackend(), RecordingBackend()
+        simulate_typing(make_library(), "tw", OutputPolicy(typing, paste, type_threshold=0))
+        self.assertEqual((typing.calls, paste.calls), ([], [(2, "TW")]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+"""Tests for injection pacing: target profiles, echo waits and calibration"""
+
+import threading
+import time
+import unittest
+
+from sub import pacing
+from sub.pacing import InjectionPacer, PROFILES
+
+
+class EchoingKeyboard:
+    """Fake keyboard whose keys come back to the pacer from another thread, like a hook"""
+
+    def __init__(self, pacer, echo=True, extra=()):
+        self.pacer = pacer
+        self.echo = echo
+        self.extra = list(extra)
+        self.sent = []
+        self.threads = []
+
+    def _echo(self, keys):
+        self.sent.extend(keys)
+        if self.echo:
+            thread = threading.Thread(target=lambda: [self.pacer.note_echo(key) for key in self.extra + keys])
+            thread.start()
+            self.threads.append(thread)
+
+    def send(self, keys):
+        self._echo(keys.split(", "))
+
+    def press_and_release(self, key):
+        self._echo([key])
+
+    def write(self, text):
+        self._echo([{" ": "space", "\t": "tab"}.get(char, char) for char in text])
+
+    def join(self):
+        for thread in self.threads:
+            thread.join()
+
+
+class ProfileTest(unittest.TestCase):
+    def test_auto_mode_picks_profile_by_application(self):
+        pacer = InjectionPacer(remote_apps=("MSTSC.exe",))
+        self.assertIs(pacer.profile_for("mstsc.exe"), PROFILES["remote"])
+        self.assertIs(pacer.profile_for("notepad.exe"), PROFILES["native"])
+        self.assertIs(pacer.profile_for(None), PROFILES["default"])
+        pacer.configure("instant")
+        self.assertIs(pacer.profile_for("mstsc.exe"), PROFILES["instant"])
+        pacer.configure("bogus")
+        self.assertEqual(pacer.mode, "auto")
+
+    def test_target_uses_the_detector_only_in_auto_mode(self):
+        calls = []
+        pacer = InjectionPacer(app_detector=lambda: calls.append(1) or "code.exe")
+        self.assertEqual(pacer.target(), (("code.exe", "auto"), PROFILES["native"]))
+        pacer.configure("remote")
+        self.assertEqual(pacer.target(), (("", "remote"), PROFILES["remote"]))
+        self.assertEqual(len(calls), 1)
+
+    def test_override_sets_the_start_and_raises_the_limit(self):
+        pacer = InjectionPacer(settle_override=1.0)
+        self.assertEqual(pacer.settle_delay("t", PROFILES["native"]), 1.0)
+        pacer = InjectionPacer()
+        self.assertEqual(pacer.settle_delay("t", PROFILES["default"]), PROFILES["default"].settle)
+
+
+class CalibrationTest(unittest.TestCase):
+    def setUp(self):
+        self.pacer = InjectionPacer(mode="native", settle_override=0.0)
+        self.keyboard = EchoingKeyboard(self.pacer, echo=False)
+
+    def test_correction_grows_and_quiet_expansions_shrink(self):
+        pacer = self.pacer
+        pacer.delete(self.keyboard, 2)
+        target = pacer.last_target
+        pacer.note_correction()
+        grown = pacer.settle[target]
+        self.assertAlmostEqual(grown, 0.005 * pacing.GROW_FACTOR)
+        # Counted once per expansion
+        pacer.note_correction()
+        self.assertEqual(pacer.settle[target], grown)
+        pacer.delete(self.keyboard, 2)
+        pacer.delete(self.keyboard, 2)
+        self.assertAlmostEqual(pacer.settle[target], grown * pacing.DECAY_FACTOR)
+
+    def test_late_correction_is_ignored(self):
+        pacer = self.pacer
+        pacer.delete(self.keyboard, 1)
+        pacer.last_expansion -= pacing.CORRECTION_WINDOW + 1
+        pacer.note_correction()
+        self.assertEqual(pacer.settle[pacer.last_target], 0.0)
+
+    def test_growth_is_capped(self):
+        pacer = self.pacer
+        pacer.delete(self.keyboard, 1)
+        target = pacer.last_target
+        pacer.settle[target] = PROFILES["native"].max_settle * 0.9
+        pacer.note_correction()
+        self.assertEqual(pacer.settle[target], PROFILES["native"].max_settle)
+
+    def test_deletions_go_out_in_one_call_or_paced(self):
+        self.pacer.delete(self.keyboard, 3)
+        self.assertEqual(self.keyboard.sent, ["backspace"] * 3)
+        pacer = InjectionPacer(mode="remote", settle_override=0.0)
+        keyboard = EchoingKeyboard(pacer, echo=False)
+        pacer.delete(keyboard, 2)
+        self.assertEqual(keyboard.sent, ["backspace", "backspace"])
+
+
+class EchoTest(unittest.TestCase):
+    def test_deletions_wait_for_their_echo(self):
+        pacer = InjectionPacer(mode="default", settle_override=0.0)
+        pacer.watch_echo()
+        # Characters the user typed meanwhile do not count as deletions
+        keyboard = EchoingKeyboard(pacer, extra=["x", "y"])
+        started = time.perf_counter()
+        pacer.delete(keyboard, 5)
+        keyboard.join()
+        self.assertTrue(pacer.echo_supported)
+        self.assertLess(time.perf_counter() - started, PROFILES["default"].max_settle)
+        self.assertEqual(pacer.echo_expected, 0)
+
+    def test_missing_echo_falls_back_to_timing(self):
+        pacer = InjectionPacer(mode="native", settle_override=0.0)
+        pacer.watch_echo()
+        pacer.delete(EchoingKeyboard(pacer, echo=False), 2)
+        self.assertIs(pacer.echo_supported, False)
+        # No more waits once the hook is known not to see our keys
+        started = time.perf_counter()
+        pacer.delete(EchoingKeyboard(pacer, echo=False), 2)
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+    def test_typed_text_is_counted_without_modifiers(self):
+        pacer = InjectionPacer(mode="native", settle_override=0.0)
+        pacer.echo_supported = True
+        keyboard = EchoingKeyboard(pacer, extra=["shift", "backspace"])
+        pacer.write(keyboard, "Hi there")
+        keyboard.join()
+        self.assertEqual(pacer.echo_expected, 0)
+        self.assertEqual(keyboard.sent, ["H", "i", "space", "t", "h", "e", "r", "e"])
+
+    def test_unwaited_text_does_not_change_support(self):
+        pacer = InjectionPacer(mode="native", settle_override=0.0)
+        pacer.watch_echo()
+        pacer.write(EchoingKeyboard(pacer, echo=False), "ab")
+        self.assertIsNone(pacer.echo_supported)
+
+
+if __name__ == "__main__":
+    unittest.main()
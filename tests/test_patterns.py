@@ -0,0 +1,139 @@
+"""Tests for the [Patterns] section and the readers that must skip it"""
+
+import configparser
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+from sub.library import SnippetLibrary
+from sub.patterns import PatternMatcher, scan_patterns, strip_patterns
+from sub.snippet_store import scan_ini
+from sub.sqlite_store import SqliteSnippetStore
+from tests.engine import EngineTestCase, snipit
+
+INI = """[Settings]
+SoundSetting=0
+
+[Strings]
+sig=Best regards.{n}John
+btw=by the way
+
+[Patterns]
+; ticket links and date offsets
+(?:t|T)#(\\d+)\\. = https://tracker/issues/{1}
+(?:x|y)(\\d)\\. = xy {1}
+\\d+q\\s = digits
+\\D+q\\s = other
+[a-z]+z\\s = letters {0}
+dd([+-]\\d+)\\s = %yyyy-%MM-%dd{days:1}
+
+[Extra]
+key=value
+"""
+
+# Only the second pattern works inside the combined regex
+BAD_PATTERN_INI = "[Strings]\nbtw=by the way\n\n[Patterns]\n(?i)tkt(\\d+)\\. = T{1}\n#(\\d+)\\. = N{1}\n"
+
+
+class PatternIniTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "Input.ini")
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(INI)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_scan_patterns_keeps_case_and_syntax(self):
+        patterns = scan_patterns(INI.encode('utf-8'))
+        self.assertEqual(len(patterns), 6)
+        self.assertIn("\\d+q\\s", patterns)
+        self.assertIn("\\D+q\\s", patterns)
+        self.assertEqual(patterns["(?:t|T)#(\\d+)\\."], "https://tracker/issues/{1}")
+
+    def test_configparser_reads_file_without_patterns(self):
+        config = configparser.ConfigParser(interpolation=None)
+        config.read_string(strip_patterns(INI))
+        self.assertEqual(sorted(config.sections()), ["Extra", "Settings", "Strings"])
+        self.assertEqual(dict(config["Strings"]), {"sig": "Best regards.{n}John", "btw": "by the way"})
+        self.assertEqual(config["Extra"]["key"], "value")
+
+    def test_strip_patterns_keeps_line_numbers(self):
+        self.assertEqual(strip_patterns(INI).count("\n"), INI.count("\n"))
+        self.assertIs(strip_patterns("[Strings]\na=b\n"), "[Strings]\na=b\n")
+
+    def test_scan_ini_ignores_patterns(self):
+        entries, settings = scan_ini(INI.encode('utf-8'))
+        self.assertEqual(sorted(entries), ["btw", "sig"])
+        self.assertEqual(settings, {"soundsetting": "0"})
+
+    def test_library_loads_strings_and_patterns(self):
+        library = SnippetLibrary.from_ini(self.path)
+        self.assertEqual(sorted(library.store.keys()), ["btw", "sig"])
+        self.assertEqual(len(library.patterns), 6)
+        now = datetime.datetime(2026, 10, 17)
+        self.assertEqual(library.expand_text("see T#42. dd-1 ", now), "see https://tracker/issues/42 2026-10-16")
+
+    def test_sqlite_import_skips_patterns(self):
+        store = SqliteSnippetStore(os.path.join(self.directory, "Input.db"))
+        self.assertEqual(store.import_ini(self.path), 2)
+        store.load()
+        self.assertEqual(sorted(store.keys()), ["btw", "sig"])
+
+
+class PatternMatcherTest(unittest.TestCase):
+    def test_precedence_and_groups(self):
+        matcher = PatternMatcher({"a(\\d+)\\.": "A{1}", "(\\d+)\\.": "N{1}", "bad(": "x"})
+        self.assertEqual(len(matcher), 2)
+        self.assertEqual(len(matcher.errors), 1)
+        found = matcher.match("xa12.")
+        self.assertEqual((found.text, found.groups, found.expand()), ("a12.", ("a12.", "12"), "A12"))
+        self.assertEqual(matcher.match("b12.").expand(), "N12")
+        self.assertIsNone(matcher.match("a12"))
+
+    def test_rejects_named_groups_and_empty_matches(self):
+        matcher = PatternMatcher({"(?P<n>q)": "x", "a*": "y"})
+        self.assertEqual(len(matcher), 0)
+        self.assertIsNone(matcher.match("q"))
+
+    def test_skips_patterns_that_only_compile_alone(self):
+        matcher = PatternMatcher({
+            "(?i)tkt(\\d+)\\.": "global flag",
+            "(a)\\1\\.": "backreference",
+            "(a)(?(1)b|c)\\.": "conditional",
+            "(?i:tkt)(\\d+)\\.": "T{1}",
+            "[\\1]\\101\\.": "escapes",
+        })
+        self.assertEqual([entry[0] for entry in matcher.entries], ["(?i:tkt)(\\d+)\\.", "[\\1]\\101\\."])
+        self.assertEqual(len(matcher.errors), 3)
+        self.assertEqual(matcher.match("TKT7.").expand(), "T7")
+        self.assertEqual(matcher.match("\x01A.").expand(), "escapes")
+
+
+class BadPatternIniTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "Input.ini")
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(BAD_PATTERN_INI)
+
+    def test_library_skips_bad_pattern(self):
+        library = SnippetLibrary.from_ini(self.path)
+        self.assertEqual(library.expand_text("btw #4. tkt5."), "by the way N4 tkt5.")
+        self.assertEqual(len(library.patterns.errors), 1)
+
+
+class BadPatternEngineTest(EngineTestCase):
+    def test_engine_keeps_strings(self):
+        self.write(BAD_PATTERN_INI)
+        snipit.read_ini_file()
+        self.assertEqual(snipit.key_array, ["btw"])
+        self.assertEqual(len(snipit.pattern_matcher), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
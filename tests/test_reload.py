@@ -0,0 +1,59 @@
+"""Tests for applying Input.ini changes to the live engine"""
+
+import unittest
+
+from sub.snippet_store import SnippetStore
+from tests.engine import EngineTestCase, snipit
+
+
+class SnippetStoreDiffTest(unittest.TestCase):
+    def test_diff_and_apply(self):
+        store = SnippetStore("Input.ini")
+        store.load({"btw": "by the way", "sig": "Sig", "same": "x"}, signature=(0, 0))
+        kept = store.get_template("same")
+        added, changed, removed = store.diff({"btw": "by the way!", "same": "x", "new": "N"})
+        self.assertEqual((added, changed, removed), ({"new": "N"}, {"btw": "by the way!"}, ["sig"]))
+        store.apply({**added, **changed}, removed, signature=(1, 1))
+        self.assertEqual(store.bodies, {"btw": "by the way!", "same": "x", "new": "N"})
+        self.assertEqual(store.get_template("btw").expand(), "by the way!")
+        self.assertIsNone(store.get_template("sig"))
+        # Unchanged snippets are not recompiled
+        self.assertIs(store.get_template("same"), kept)
+        self.assertEqual(store.signature, (1, 1))
+
+
+class ReloadIniFileTest(EngineTestCase):
+    def write(self, strings):
+        lines = ["[Strings]"] + [f"{key} = {body}" for key, body in strings.items()]
+        super().write("\n".join(lines + ["[Settings]", "SoundSetting = 0", ""]))
+
+    def test_only_the_difference_is_applied(self):
+        self.write({"btw": "by the way", "sig": "Sig", "same": "x"})
+        snipit.read_ini_file()
+        matcher = snipit.matcher
+        kept = snipit.snippet_store.get_template("same")
+
+        self.write({"btw": "by the way!", "same": "x", "new": "N"})
+        snipit.reload_ini_file()
+        self.assertIs(snipit.matcher, matcher)
+        self.assertEqual(snipit.matcher.match("xnew"), "new")
+        self.assertIsNone(snipit.matcher.match("sig"))
+        self.assertEqual(snipit.snippet_store.get("btw"), "by the way!")
+        self.assertIs(snipit.snippet_store.get_template("same"), kept)
+        self.assertEqual(sorted(snipit.key_array), ["btw", "new", "same"])
+        with open(snipit.list_file, encoding="utf-8") as f:
+            self.assertEqual(sorted(f.read().split()), ["btw", "new", "same"])
+
+    def test_unchanged_file_is_not_reparsed(self):
+        self.write({"btw": "by the way"})
+        snipit.read_ini_file()
+        calls = []
+        store = snipit.snippet_store
+        store.diff = lambda strings: calls.append(strings)
+        snipit.reload_ini_file()
+        self.assertEqual(calls, [])
+        self.assertEqual(snipit.snippet_store.get("btw"), "by the way")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+"""Tests for snippet templates against the original flag replacement"""
+
+import datetime
+import random
+import unittest
+
+from sub.replace_flags import compile_template
+
+
+def legacy_replace_flags(input_str, now):
+    """The original sequential str.replace() implementation, with a fixed time"""
+    result = str(input_str)
+    for flag, value in (
+        ("yyyy", now.strftime("%Y")), ("yy", now.strftime("%y")), ("y", str(now.year)[-1:]),
+        ("MM", now.strftime("%m")), ("M", str(now.month)),
+        ("dd", now.strftime("%d")), ("d", str(now.day)),
+        ("HH", now.strftime("%H")), ("H", str(now.hour)),
+        ("hh", now.strftime("%I")), ("h", str(int(now.strftime("%I")))),
+        ("mm", now.strftime("%M")), ("m", str(int(now.strftime("%M")))),
+        ("ss", now.strftime("%S")), ("s", str(int(now.strftime("%S")))),
+    ):
+        result = result.replace("`%" + flag, value)
+        result = result.replace("%" + flag, value)
+    return result.replace("`", "")
+
+
+TIMES = (
+    datetime.datetime(2026, 10, 17, 9, 5, 3),
+    datetime.datetime(2008, 1, 2, 0, 0, 0),
+    datetime.datetime(2031, 12, 31, 12, 59, 59),
+    datetime.datetime(2000, 7, 4, 23, 30, 9),
+)
+
+TOKENS = ["%yyyy", "%yy", "%y", "%MM", "%M", "%dd", "%d", "%HH", "%H", "%hh", "%h", "%mm",
+          "%m", "%ss", "%s", "`", "`%dd", "%", "%%", "%x", "a", " ", "-", ".", "y", "d", "{n}"]
+
+
+class CompileTemplateTest(unittest.TestCase):
+    def test_matches_legacy_output(self):
+        rng = random.Random(3)
+        for _ in range(3000):
+            body = "".join(rng.choice(TOKENS) for _ in range(rng.randint(0, 10)))
+            template = compile_template(body, expand_newlines=False)
+            for now in TIMES:
+                self.assertEqual(template.expand(now), legacy_replace_flags(body, now), body)
+
+    def test_newlines_and_constants(self):
+        template = compile_template("Best regards.{n}John")
+        self.assertEqual(template.constant, "Best regards.\nJohn")
+        self.assertEqual(compile_template("a{n}b", expand_newlines=False).expand(), "a{n}b")
+
+    def test_single_timestamp(self):
+        now = datetime.datetime(2026, 10, 17, 23, 59, 59)
+        self.assertEqual(compile_template("%yyyy-%MM-%dd %HH:%mm:%ss").expand(now), "2026-10-17 23:59:59")
+
+    def test_captures_are_opt_in(self):
+        self.assertEqual(compile_template("{1}").expand(groups=("x", "y")), "{1}")
+        template = compile_template("{1}-{0} %dd{days:1}", captures=True)
+        now = datetime.datetime(2026, 10, 17)
+        self.assertEqual(template.expand(now, ("dd+3", "+3")), "+3-dd+3 20")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Tests for the keystroke buffer"""
+
+import unittest
+
+from sub.matcher import SnippetMatcher
+from sub.ring_buffer import RingBuffer
+
+
+class RingBufferTest(unittest.TestCase):
+    def test_append_pop_and_overwrite(self):
+        log = RingBuffer(3)
+        for char in "abcd":
+            log.append(char)
+        self.assertEqual(str(log), "bcd")
+        self.assertEqual(len(log), 3)
+        self.assertEqual(log.pop(), "d")
+        self.assertEqual(str(log), "bc")
+        self.assertEqual("".join(reversed(log)), "cb")
+        log.clear()
+        self.assertIsNone(log.pop())
+        self.assertEqual(str(log), "")
+
+    def test_resize_keeps_newest(self):
+        log = RingBuffer(5)
+        for char in "hello":
+            log.append(char)
+        log.resize(3)
+        self.assertEqual((str(log), log.capacity), ("llo", 3))
+        log.resize(6)
+        log.append("!")
+        self.assertEqual(str(log), "llo!")
+
+    def test_trie_matches_buffer_in_place(self):
+        matcher = SnippetMatcher(["sig"])
+        log = RingBuffer(4)
+        for char in "my sig":
+            log.append(char)
+        self.assertEqual(matcher.match(log), "sig")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+"""Tests for the snippet stores and the raw INI scanner"""
+
+import configparser
+import os
+import shutil
+import tempfile
+import unittest
+
+from sub.snippet_store import LazySnippetStore, scan_ini
+
+INI = """\
+; SnipIt snippets
+[Settings]
+debug = false
+
+[Strings]
+sig = Best regards.{n}John
+btw=by the way
+multi = first
+\tsecond
+# comment = not a key
+Mixed : colon value
+
+[Extra]
+other = 1
+"""
+
+
+def parse(text):
+    config = configparser.ConfigParser(interpolation=None)
+    config.read_string(text)
+    return config
+
+
+class ScanIniTest(unittest.TestCase):
+    def check_against_configparser(self, text):
+        data = text.encode("utf-8")
+        entries, settings = scan_ini(data)
+        config = parse(text)
+        bodies = {key: data[offset:offset + length].decode("utf-8").replace("\r\n", "\n")
+                  for key, (offset, length) in entries.items()}
+        # configparser joins continuation lines without their indentation
+        bodies = {key: "\n".join(line.strip() for line in body.split("\n")) for key, body in bodies.items()}
+        self.assertEqual(bodies, dict(config["Strings"]))
+        if "Settings" in config:
+            self.assertEqual(settings, dict(config["Settings"]))
+
+    def test_matches_configparser(self):
+        self.check_against_configparser(INI)
+
+    def test_windows_newlines_and_unicode(self):
+        self.check_against_configparser(INI.replace("btw=by the way", "btw=por el camino ñ")
+                                        .replace("\n", "\r\n"))
+
+    def test_empty_and_missing_values(self):
+        self.check_against_configparser("[Strings]\nempty =\nUPPER = Value\n  spaced  =  padded  \n")
+
+
+class LazySnippetStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "Input.ini")
+
+    def load(self, text):
+        with open(self.path, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        with open(self.path, "rb") as f:
+            entries, _ = scan_ini(f.read())
+        store = LazySnippetStore(self.path)
+        store.load_index(entries)
+        return store
+
+    def test_bodies_match_configparser(self):
+        for text in (INI, INI.replace("\n", "\r\n"),
+                     "[Strings]\nsep = one\u2028two\n\tthree\x0cfour\nempty =\n"):
+            store = self.load(text)
+            config = parse(text.replace("\r\n", "\n"))
+            self.assertEqual({key: store.get(key) for key in store.keys()}, dict(config["Strings"]))
+
+    def test_has_body_and_cache_budget(self):
+        store = self.load("[Strings]\nbtw = by the way\nempty =\nsig = Best regards\n")
+        store.cache_budget = 12
+        self.assertTrue(store.has_body("btw"))
+        self.assertFalse(store.has_body("empty"))
+        self.assertFalse(store.has_body("missing"))
+        self.assertEqual(store.get_template("btw").expand(), "by the way")
+        self.assertIn("btw", store.cache)
+        store.get("sig")
+        self.assertEqual(list(store.cache), ["sig"])
+        self.assertEqual(store.cache_size, 12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""Tests for the SQLite snippet store"""
+
+import configparser
+import os
+import shutil
+import tempfile
+import unittest
+
+from sub.sqlite_store import SqliteSnippetStore
+
+INI = """[Settings]
+SoundSetting = 1
+TypeThreshold = 8
+
+[Strings]
+sig = Best regards.{n}John
+btw = by the way
+multi = first
+\tsecond
+empty =
+"""
+
+
+class SqliteSnippetStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "Input.db")
+        self.ini_path = os.path.join(self.directory, "Input.ini")
+        with open(self.ini_path, "w", encoding="utf-8") as f:
+            f.write(INI)
+
+    def test_import_and_lookups(self):
+        store = SqliteSnippetStore(self.path)
+        self.assertEqual(store.import_ini(self.ini_path), 4)
+        settings = store.load()
+        self.assertEqual(settings, {"soundsetting": "1", "typethreshold": "8"})
+        self.assertEqual(set(store.keys()), {"sig", "btw", "multi", "empty"})
+        self.assertEqual(store.get("multi"), "first\nsecond")
+        self.assertEqual(store.get_template("sig").expand(), "Best regards.\nJohn")
+        self.assertTrue(store.has_body("btw"))
+        self.assertFalse(store.has_body("empty"))
+        self.assertIsNone(store.get("missing"))
+        self.assertIn("btw", store)
+        self.assertEqual(len(store), 4)
+
+    def test_export_round_trip(self):
+        store = SqliteSnippetStore(self.path)
+        store.import_ini(self.ini_path)
+        exported = os.path.join(self.directory, "Exported.ini")
+        self.assertEqual(store.export_ini(exported), 4)
+        original = configparser.ConfigParser(interpolation=None)
+        original.read(self.ini_path, encoding="utf-8")
+        result = configparser.ConfigParser(interpolation=None)
+        result.read(exported, encoding="utf-8")
+        for section in ("Strings", "Settings"):
+            self.assertEqual(dict(result[section]), dict(original[section]))
+
+        copy = SqliteSnippetStore(os.path.join(self.directory, "Copy.db"))
+        copy.import_ini(exported)
+        copy.load()
+        self.assertEqual(copy.items(), store.items())
+
+    def test_transactions_and_staleness(self):
+        store = SqliteSnippetStore(self.path)
+        store.import_ini(self.ini_path)
+        store.load()
+        self.assertFalse(store.is_stale())
+        cached = store.get("btw")
+        with store.transaction() as transaction:
+            transaction.set("New", "N")
+            transaction.set("btw", "by the way!")
+            transaction.remove("sig")
+            transaction.set_setting("SoundSetting", 0)
+            self.assertEqual(len(transaction), 4)
+        self.assertTrue(store.is_stale())
+        # The cache keeps serving the loaded library until it is refreshed
+        self.assertEqual(store.get("btw"), cached)
+        added, removed, settings = store.refresh()
+        self.assertEqual((added, removed), (["new"], ["sig"]))
+        self.assertEqual(settings["soundsetting"], "0")
+        self.assertEqual(store.get("btw"), "by the way!")
+        self.assertFalse(store.is_stale())
+
+    def test_failed_block_discards_edits(self):
+        store = SqliteSnippetStore(self.path)
+        store.import_ini(self.ini_path)
+        with self.assertRaises(RuntimeError):
+            with store.transaction() as transaction:
+                transaction.set("new", "N")
+                raise RuntimeError("stop")
+        self.assertFalse(transaction)
+        store.load()
+        self.assertNotIn("new", store)
+
+    def test_changes_from_another_connection(self):
+        store = SqliteSnippetStore(self.path)
+        store.import_ini(self.ini_path)
+        store.load()
+        other = SqliteSnippetStore(self.path)
+        with other.transaction() as transaction:
+            transaction.set("other", "from elsewhere")
+        self.assertTrue(store.is_stale())
+        self.assertEqual(store.refresh()[0], ["other"])
+
+    def test_lru_is_bounded(self):
+        store = SqliteSnippetStore(self.path, cache_budget=12)
+        store.import_ini(self.ini_path)
+        store.load()
+        for key in ("btw", "multi", "sig"):
+            store.get(key)
+        self.assertLessEqual(store.cache_size, 12)
+        self.assertNotIn("sig", store.cache)  # larger than the whole budget
+        self.assertEqual(store.get("sig"), "Best regards.{n}John")
+
+
+if __name__ == "__main__":
+    unittest.main()
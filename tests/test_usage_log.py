@@ -0,0 +1,66 @@
+"""Tests for the usage log and its report"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from sub.usage_log import UsageLog, format_report, read_usage
+
+
+class UsageLogTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "Usage.log")
+
+    def test_records_are_buffered_until_flushed(self):
+        log = UsageLog(self.path)
+        log.record("btw", 10, 1500)
+        log.record("multi\nline", 3, 500)
+        self.assertFalse(os.path.exists(self.path))
+        log.flush()
+        with open(self.path, encoding="utf-8") as f:
+            lines = f.read().splitlines()
+        self.assertEqual([line.split("\t")[1:] for line in lines], [["1500", "10", "btw"], ["500", "3", "multi line"]])
+        log.flush()  # nothing new
+        log.enabled = False
+        log.record("sig", 1, 1)
+        self.assertEqual(log.buffer, [])
+
+    def test_writer_flushes_a_full_buffer(self):
+        log = UsageLog(self.path, flush_interval=60, max_buffer=3)
+        log.start()
+        for _ in range(3):
+            log.record("btw", 1, 1)
+        deadline = time.monotonic() + 5
+        while not os.path.exists(self.path) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(read_usage(self.path)["btw"][0], 3)
+
+    def test_read_usage_aggregates_and_skips_bad_lines(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.write("100\t1000\t10\tbtw\n"
+                    "300\t3000\t30\tbtw\n"
+                    "200\t500\t5\tsig\n"
+                    "garbage\n"
+                    "x\t1\t1\tbad\n"
+                    "400\t1\t1")  # cut short by a crash
+        self.assertEqual(read_usage(self.path), {"btw": [2, 300, 4000, 40], "sig": [1, 200, 500, 5]})
+        self.assertEqual(read_usage(os.path.join(self.directory, "missing.log")), {})
+
+    def test_format_report(self):
+        usage = {"btw": [3, 0, 6000, 30], "old": [1, 0, 1000, 5]}
+        report = format_report(usage, ["btw", "sig", "ddate"], top=5)
+        lines = report.splitlines()
+        self.assertEqual(lines[0], "4 expansions of 2 snippets recorded; 3 snippets in the library")
+        self.assertEqual(lines[4].split()[:5], ["btw", "3", "75.0%", "2.0", "10"])
+        self.assertTrue(lines[5].endswith("(removed)"))
+        self.assertEqual(lines[-2:], ["Never used (2):", "  ddate sig"])
+        self.assertIn("Top 1 snippets:", format_report(usage, [], top=1))
+        self.assertIn("0 expansions of 0 snippets", format_report({}, ["btw"]))
+
+
+if __name__ == "__main__":
+    unittest.main()